@@ -6,6 +6,9 @@ import logging
 from datetime import timedelta
 from routes import register_routes
 from websocket_manager import ws_manager
+from order_commands import recover
+from snapshot import restore, start_snapshots
+from archiver import start_archiver
 
 from dotenv import load_dotenv
 
@@ -50,6 +53,15 @@ logging.basicConfig(level=logging.INFO)
 # Register all modular route blueprints
 register_routes(app)
 
+# Bring MySQL up to date with the matching journal before taking orders,
+# then rebuild the books from the latest snapshot plus the journal tail
+recover()
+restore()
+start_snapshots()
+
+# Keep the orders table down to the live book
+start_archiver()
+
 # Initialize WebSocket manager
 ws_manager.init_app(app)
 
@@ -0,0 +1,95 @@
+# background archiver: moves terminal orders out of the hot `orders` table
+# into `orders_history`, so the table every book and match query filters
+# stays proportional to the live book rather than to all-time volume
+
+import logging
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+from db_pool import get_db_connection, retry_on_deadlock
+
+# Load environment variables from .env file
+load_dotenv()
+
+# FILLED / CANCELLED orders untouched for this long are archived (hours)
+ARCHIVE_AFTER_HOURS = float(os.getenv("ORDER_ARCHIVE_AFTER_HOURS", 24))
+# orders moved per transaction
+ARCHIVE_BATCH_SIZE = int(os.getenv("ORDER_ARCHIVE_BATCH_SIZE", 1000))
+# seconds between archiving runs, 0 disables the archiver
+ARCHIVE_INTERVAL = float(os.getenv("ORDER_ARCHIVE_INTERVAL", 300))
+# pause between batches so a large backlog does not hog the primary
+ARCHIVE_BATCH_PAUSE = 0.05
+
+ORDER_COLUMNS = "id, symbol, side, price, quantity, filled_quantity, status, created_at, updated_at, user_id"
+
+
+@retry_on_deadlock
+def archive_batch(after_hours=ARCHIVE_AFTER_HOURS, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move one batch of old terminal orders to orders_history; returns how many were moved"""
+    with get_db_connection() as db:
+        cursor = db.cursor()
+        try:
+            cursor.execute(
+                """
+                SELECT id FROM orders
+                WHERE status IN ('FILLED', 'CANCELLED')
+                  AND updated_at < NOW() - INTERVAL %s SECOND
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """,
+                (int(after_hours * 3600), batch_size),
+            )
+            order_ids = [row[0] for row in cursor.fetchall()]
+            if not order_ids:
+                db.rollback()
+                return 0
+
+            placeholders = ", ".join(["%s"] * len(order_ids))
+            cursor.execute(
+                f"""
+                INSERT IGNORE INTO orders_history ({ORDER_COLUMNS})
+                SELECT {ORDER_COLUMNS} FROM orders WHERE id IN ({placeholders})
+            """,
+                order_ids,
+            )
+            cursor.execute(f"DELETE FROM orders WHERE id IN ({placeholders})", order_ids)
+            db.commit()
+            return len(order_ids)
+        finally:
+            cursor.close()
+
+
+def archive_orders(after_hours=ARCHIVE_AFTER_HOURS, batch_size=ARCHIVE_BATCH_SIZE):
+    """Archive every eligible order, one batch per transaction; returns the total moved"""
+    total = 0
+    while True:
+        moved = archive_batch(after_hours, batch_size)
+        total += moved
+        if moved < batch_size:
+            break
+        time.sleep(ARCHIVE_BATCH_PAUSE)
+
+    if total:
+        logging.info(f"Archived {total} terminal orders to orders_history")
+    return total
+
+
+def archive_loop(interval=ARCHIVE_INTERVAL):
+    while True:
+        time.sleep(interval)
+        try:
+            archive_orders()
+        except Exception as e:
+            logging.error(f"Error archiving orders: {e}")
+
+
+def start_archiver(interval=ARCHIVE_INTERVAL):
+    """Start the background archiver thread"""
+    if interval > 0:
+        threading.Thread(target=archive_loop, args=(interval,), name="order-archiver", daemon=True).start()
+        logging.info(
+            f"Archiving orders terminal for {ARCHIVE_AFTER_HOURS:g}h every {interval:g}s"
+        )
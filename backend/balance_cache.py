@@ -0,0 +1,83 @@
+# in-process write-through cache of the balances table
+# reservation checks are answered from memory, so rejecting an order for
+# insufficient funds costs no round trip to MySQL
+
+from contextlib import contextmanager
+import threading
+
+
+class BalanceCache:
+    """
+    (available, reserved) per (user_id, asset), in balance units.
+
+    Every balance write goes to MySQL first and is mirrored here right after
+    (see helpers.adjust_balance / BalanceDeltas.apply). Writes are tracked per
+    connection: if a connection is given back without committing them, the
+    balances it touched are dropped and reloaded on next use. Entries are
+    only ever loaded with a locking read, and a load that raced with a write
+    to the same balance is not kept.
+    """
+
+    def __init__(self):
+        self.balances = {}
+        self.versions = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def get(self, user_id, asset):
+        """Cached (available, reserved), or None on a miss"""
+        return self.balances.get((user_id, asset))
+
+    def version(self, user_id, asset):
+        """Token to pass to `store` for a load started now"""
+        return self.versions.get((user_id, asset), 0)
+
+    def store(self, user_id, asset, balance, version):
+        """Cache a freshly loaded balance unless it was written since `version`"""
+        key = (user_id, asset)
+        with self.lock:
+            if self.versions.get(key, 0) == version:
+                self.balances[key] = balance
+
+    def apply(self, user_id, asset, available_change=0, reserved_change=0):
+        """Mirror a balance change just written to MySQL"""
+        key = (user_id, asset)
+        with self.lock:
+            self.versions[key] = self.versions.get(key, 0) + 1
+            balance = self.balances.get(key)
+            if balance is not None:
+                # Same clamp as the settlement upsert
+                self.balances[key] = (
+                    balance[0] + available_change,
+                    max(0, balance[1] + reserved_change),
+                )
+        for touched in getattr(self.local, "transactions", ()):
+            touched.add(key)
+
+    def invalidate(self, keys):
+        with self.lock:
+            for key in keys:
+                self.versions[key] = self.versions.get(key, 0) + 1
+                self.balances.pop(key, None)
+
+    @contextmanager
+    def transaction(self, connection):
+        """Track the balances written through `connection` while it is checked out"""
+        transactions = self.local.__dict__.setdefault("transactions", [])
+        touched = set()
+        transactions.append(touched)
+        try:
+            yield
+        except BaseException:
+            self.invalidate(touched)
+            raise
+        else:
+            # Uncommitted writes are rolled back when the connection is reset
+            if touched and connection.in_transaction:
+                self.invalidate(touched)
+        finally:
+            transactions.pop()
+
+
+# Global instance
+balance_cache = BalanceCache()
@@ -0,0 +1,72 @@
+"""
+Benchmark: parse time saved per order by prepared statements on create_order.
+
+Runs the statements of create_order (balance reservation UPDATE and order
+INSERT) N times as plain text and N times through the connection's prepared
+statements, rolling every order back, and prints the time per order of each.
+Run from the backend directory against a development database:
+
+    python -m benchmarks.prepared_statements --user-id 1 --orders 2000
+"""
+
+import argparse
+import time
+
+from db_pool import connection_pool
+import statements
+
+ORDER = ("BTCUSD", "BUY", "0.01", "0.0001")  # symbol, side, price, quantity
+
+
+def run(connection, user_id, orders, prepared):
+    cursor = connection.cursor()
+    started = time.perf_counter()
+    for _ in range(orders):
+        symbol, side, price, quantity = ORDER
+        statements.execute(
+            cursor, prepared, "adjust_balance", ("-0.000001", "0.000001", user_id, "USD", "0.000001")
+        )
+        statements.execute(cursor, prepared, "insert_order", (user_id, symbol, side, price, quantity))
+        connection.rollback()
+    elapsed = time.perf_counter() - started
+    cursor.close()
+    return elapsed / orders
+
+
+def session_status(connection, name):
+    cursor = connection.cursor()
+    cursor.execute("SHOW SESSION STATUS LIKE %s", (name,))
+    value = int(cursor.fetchone()[1])
+    cursor.close()
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--user-id", type=int, required=True, help="user with a USD balance")
+    parser.add_argument("--orders", type=int, default=2000)
+    args = parser.parse_args()
+
+    connection = connection_pool.get_connection()
+    try:
+        # Warm up both paths (and prepare the statements once)
+        run(connection, args.user_id, 50, None)
+        prepared = statements.prepared(connection)
+        run(connection, args.user_id, 50, prepared)
+
+        text = run(connection, args.user_id, args.orders, None)
+        prepares = session_status(connection, "Com_stmt_prepare")
+        with_prepared = run(connection, args.user_id, args.orders, prepared)
+        prepares = session_status(connection, "Com_stmt_prepare") - prepares
+    finally:
+        connection_pool.release(connection)
+
+    print(f"orders per run:            {args.orders}")
+    print(f"text protocol:             {text * 1e6:8.1f} us/order")
+    print(f"prepared statements:       {with_prepared * 1e6:8.1f} us/order")
+    print(f"saved per order:           {(text - with_prepared) * 1e6:8.1f} us ({(1 - with_prepared / text) * 100:.1f}%)")
+    print(f"statements re-prepared:    {prepares}")
+
+
+if __name__ == "__main__":
+    main()
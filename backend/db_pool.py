@@ -1,43 +1,365 @@
 # for reusing existing connections / limiting total connections
 # leading to better performance
 
-import mysql.connector.pooling
+import mysql.connector
+from mysql.connector.constants import ClientFlag
+from collections import deque
 from contextlib import contextmanager
+import functools
 import logging
 import os
+import random
+import threading
+import time
 from dotenv import load_dotenv
 
+from balance_cache import balance_cache
+import statements
+
 # Load environment variables from .env file
 load_dotenv()
 
-pool_config = {
+connection_config = {
     'user': os.getenv('DB_USER'),
     'password': os.getenv('DB_PASSWORD'),
     'host': os.getenv('DB_HOST', 'localhost'),
+    'port': int(os.getenv('DB_PORT', 3306)),
     'database': os.getenv('DB_NAME', 'orderbook_db'),
-    'pool_name': 'orderbook_pool',
-    'pool_size': 10, # number of connections in the pool - depends on the needs, can be adjusted for scalability
-    'pool_reset_session': True,
-    'autocommit': False
+    'autocommit': False,
+    # rowcount reports matched rather than changed rows, so conditional
+    # balance updates can be checked even when a value ends up unchanged
+    'client_flags': [ClientFlag.FOUND_ROWS],
 }
 
-try:
-    connection_pool = mysql.connector.pooling.MySQLConnectionPool(**pool_config)
-except mysql.connector.Error as err:
-    logging.error(f"Error creating connection pool: {err}")
-    raise
+# connections kept open - size it from the pool stats (see ConnectionPool.stats)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+# extra connections opened during bursts, closed again when given back
+DB_POOL_MAX_OVERFLOW = int(os.getenv('DB_POOL_MAX_OVERFLOW', 10))
+# how long a checkout waits for a free connection before failing (seconds)
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+# how many checkouts may wait at once; more fail right away
+DB_POOL_MAX_WAITERS = int(os.getenv('DB_POOL_MAX_WAITERS', 100))
+# connections older than this are replaced on checkout (seconds, 0 = never)
+DB_POOL_RECYCLE = float(os.getenv('DB_POOL_RECYCLE', 1800))
+# ping a connection on checkout and replace it if the server went away
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+
+# number of recent checkouts the latency percentiles are computed over
+POOL_STATS_WINDOW = 1000
+
+
+class ConnectionPool:
+    """
+    Bounded MySQL connection pool.
+
+    Up to `size` connections are kept open and `max_overflow` more are opened
+    during bursts. When all are in use a checkout queues for up to `timeout`
+    seconds (at most `max_waiters` at a time) instead of failing right away.
+    Checkout wait and latency, in-use and overflow counts are tracked for
+    sizing.
+    """
+
+    def __init__(self, name, config, size=DB_POOL_SIZE, max_overflow=DB_POOL_MAX_OVERFLOW,
+                 timeout=DB_POOL_TIMEOUT, max_waiters=DB_POOL_MAX_WAITERS,
+                 recycle=DB_POOL_RECYCLE, pre_ping=DB_POOL_PRE_PING):
+        self.name = name
+        self.config = config
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.max_waiters = max_waiters
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+
+        self.condition = threading.Condition()
+        self.idle = []  # (connection, opened_at), most recently used last
+        self.opened_at = {}
+        self.opened = 0
+        self.in_use = 0
+        self.waiting = 0
+
+        self.checkouts = 0
+        self.timeouts = 0
+        self.peak_in_use = 0
+        self.wait_times = deque(maxlen=POOL_STATS_WINDOW)
+        self.checkout_times = deque(maxlen=POOL_STATS_WINDOW)
+
+    def _connect(self):
+        connection = mysql.connector.connect(**self.config)
+        self.opened_at[connection] = time.monotonic()
+        return connection
+
+    def _discard(self, connection):
+        self.opened_at.pop(connection, None)
+        statements.forget(connection)
+        try:
+            connection.close()
+        except mysql.connector.Error:
+            pass
+
+    def _checkout_slot(self):
+        """Wait for an idle connection or room to open one; returns the idle connection or None"""
+        deadline = time.monotonic() + self.timeout
+        with self.condition:
+            while True:
+                if self.idle:
+                    return self.idle.pop()[0]
+                if self.opened < self.size + self.max_overflow:
+                    self.opened += 1
+                    return None
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self.waiting >= self.max_waiters:
+                    self.timeouts += 1
+                    raise mysql.connector.errors.PoolError(
+                        f"Pool {self.name} exhausted: {self.opened} connections in use, "
+                        f"{self.waiting} checkouts waiting"
+                    )
+                self.waiting += 1
+                try:
+                    self.condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+
+    def get_connection(self):
+        """Check a connection out, waiting up to `timeout` for one to be free"""
+        started = time.monotonic()
+        connection = self._checkout_slot()
+        waited = time.monotonic() - started
+
+        try:
+            if connection is not None and self.recycle and started - self.opened_at[connection] > self.recycle:
+                self._discard(connection)
+                connection = None
+            if connection is not None and self.pre_ping:
+                try:
+                    connection.ping(reconnect=False)
+                except mysql.connector.Error:
+                    logging.warning(f"Replacing dead connection in pool {self.name}")
+                    self._discard(connection)
+                    connection = None
+            if connection is None:
+                connection = self._connect()
+        except Exception:
+            # The slot this checkout held is free again
+            with self.condition:
+                self.opened -= 1
+                self.condition.notify()
+            raise
+
+        with self.condition:
+            self.in_use += 1
+            self.checkouts += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.wait_times.append(waited)
+            self.checkout_times.append(time.monotonic() - started)
+        return connection
+
+    def release(self, connection):
+        """Give a connection back, rolling back whatever it left uncommitted"""
+        keep = True
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except mysql.connector.Error:
+            keep = False
+
+        with self.condition:
+            self.in_use -= 1
+            if keep and self.opened <= self.size:
+                self.idle.append((connection, self.opened_at[connection]))
+            else:
+                # Overflow connections only live through a burst
+                self.opened -= 1
+                self._discard(connection)
+            self.condition.notify()
+
+    def stats(self):
+        """Pool usage and checkout timings (milliseconds) for sizing the pool"""
+        with self.condition:
+            wait_times = sorted(self.wait_times)
+            checkout_times = sorted(self.checkout_times)
+            stats = {
+                'name': self.name,
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'opened': self.opened,
+                'idle': len(self.idle),
+                'in_use': self.in_use,
+                'peak_in_use': self.peak_in_use,
+                'overflow_in_use': max(0, self.opened - self.size),
+                'waiting': self.waiting,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+            }
+
+        for label, samples in (('wait_ms', wait_times), ('checkout_ms', checkout_times)):
+            stats[label] = {
+                f'p{percentile}': round(samples[min(len(samples) - 1, len(samples) * percentile // 100)] * 1000, 3)
+                if samples else 0.0
+                for percentile in (50, 95, 99)
+            }
+            stats[label]['max'] = round(samples[-1] * 1000, 3) if samples else 0.0
+        return stats
+
+
+connection_pool = ConnectionPool('orderbook_pool', connection_config)
+
+# optional read replica for read-only endpoints; reads use the primary when unset
+replica_config = dict(
+    connection_config,
+    host=os.getenv('DB_REPLICA_HOST'),
+    port=int(os.getenv('DB_REPLICA_PORT', connection_config['port'])),
+    user=os.getenv('DB_REPLICA_USER', connection_config['user']),
+    password=os.getenv('DB_REPLICA_PASSWORD', connection_config['password']),
+)
+# reads fall back to the primary while the replica lags more than this (seconds)
+DB_REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', 5))
+# how often the replica's lag is re-checked (seconds)
+DB_REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_LAG_CHECK_INTERVAL', 1))
+# the "replica" is a standalone server kept fresh some other way: read from it
+# without replication status (otherwise a server not replicating is never used)
+DB_REPLICA_STANDALONE = os.getenv('DB_REPLICA_STANDALONE', 'false').lower() in ('1', 'true', 'yes')
+
+replica_pool = (
+    ConnectionPool('orderbook_replica_pool', replica_config)
+    if replica_config['host'] else None
+)
 
 @contextmanager
 def get_db_connection():
     connection = None
     try:
         connection = connection_pool.get_connection()
-        yield connection
+        with balance_cache.transaction(connection):
+            yield connection
     except mysql.connector.Error as err:
         if connection:
-            connection.rollback()
+            try:
+                connection.rollback()
+            except mysql.connector.Error:
+                pass
         logging.error(f"Database error: {err}")
         raise
     finally:
-        if connection and connection.is_connected():
-            connection.close()
\ No newline at end of file
+        if connection:
+            connection_pool.release(connection)
+
+
+class ReplicaLag:
+    """Replication lag of the replica, re-checked at most every `interval` seconds"""
+
+    def __init__(self, interval=DB_REPLICA_LAG_CHECK_INTERVAL, standalone=DB_REPLICA_STANDALONE):
+        self.interval = interval
+        self.standalone = standalone
+        self.lock = threading.Lock()
+        self.checked_at = None
+        self.lag = None
+
+    def _query(self, connection):
+        """
+        Seconds behind the source; None if the server does not replicate
+        (unless configured as standalone) or replication is broken
+        """
+        cursor = connection.cursor(dictionary=True)
+        try:
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except mysql.connector.Error:
+                # MySQL before 8.0.22
+                cursor.execute("SHOW SLAVE STATUS")
+            status = cursor.fetchone()
+        finally:
+            cursor.close()
+
+        if status is None:
+            # Not (or no longer) a replica: nothing says how fresh it is
+            return 0 if self.standalone else None
+        lag = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+        return None if lag is None else float(lag)
+
+    def get(self, connection):
+        now = time.monotonic()
+        with self.lock:
+            if self.checked_at is not None and now - self.checked_at < self.interval:
+                return self.lag
+        lag = self._query(connection)
+        with self.lock:
+            self.checked_at, self.lag = now, lag
+        return lag
+
+
+replica_lag = ReplicaLag()
+
+def _replica_connection(max_lag):
+    """A replica connection if one is configured and fresh enough, else None"""
+    if replica_pool is None or max_lag <= 0:
+        return None
+
+    try:
+        connection = replica_pool.get_connection()
+    except mysql.connector.Error as err:
+        logging.warning(f"Replica unavailable, reading from the primary: {err}")
+        return None
+
+    try:
+        lag = replica_lag.get(connection)
+    except mysql.connector.Error as err:
+        logging.warning(f"Could not check replica lag, reading from the primary: {err}")
+        lag = None
+    if lag is not None and lag <= max_lag:
+        return connection
+
+    replica_pool.release(connection)
+    return None
+
+@contextmanager
+def get_read_connection(max_lag=DB_REPLICA_MAX_LAG):
+    """
+    Connection for read-only queries. Served by the replica when one is
+    configured and lags at most `max_lag` seconds behind, otherwise by the
+    primary; pass max_lag=0 for reads that must be fresh.
+    """
+    connection = _replica_connection(max_lag)
+    if connection is None:
+        with get_db_connection() as connection:
+            yield connection
+        return
+
+    try:
+        yield connection
+    except mysql.connector.Error as err:
+        logging.error(f"Database error on replica: {err}")
+        raise
+    finally:
+        replica_pool.release(connection)
+
+# InnoDB errors after which the whole transaction can simply be run again
+RETRYABLE_ERRORS = (
+    1213,  # ER_LOCK_DEADLOCK: chosen as the deadlock victim, already rolled back
+    1205,  # ER_LOCK_WAIT_TIMEOUT
+)
+DB_RETRY_ATTEMPTS = int(os.getenv('DB_RETRY_ATTEMPTS', 5))
+DB_RETRY_BACKOFF = float(os.getenv('DB_RETRY_BACKOFF_MS', 20)) / 1000
+
+def retry_on_deadlock(transaction):
+    """
+    Decorator for a function that runs one whole transaction on its own
+    connection: re-run it after a deadlock or lock wait timeout, with
+    jittered exponential backoff, up to DB_RETRY_ATTEMPTS times.
+    """
+    @functools.wraps(transaction)
+    def wrapper(*args, **kwargs):
+        for attempt in range(1, DB_RETRY_ATTEMPTS + 1):
+            try:
+                return transaction(*args, **kwargs)
+            except mysql.connector.Error as err:
+                if err.errno not in RETRYABLE_ERRORS or attempt == DB_RETRY_ATTEMPTS:
+                    raise
+                delay = random.uniform(0, DB_RETRY_BACKOFF * 2 ** (attempt - 1))
+                logging.warning(
+                    f"{transaction.__name__} hit lock contention ({err.msg}), "
+                    f"retrying in {delay * 1000:.0f}ms (attempt {attempt}/{DB_RETRY_ATTEMPTS})"
+                )
+                time.sleep(delay)
+    return wrapper
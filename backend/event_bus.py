@@ -0,0 +1,42 @@
+# in-process publish/subscribe for state changes (e.g. an order book level
+# moved), so listeners such as the WebSocket layer are told right away
+# instead of polling MySQL.
+#
+# Events never leave the process: the matching engine (books, sequencer,
+# balance cache) lives in one process only, so the app must run with a
+# single worker (see the Procfile, `-w 1`).
+
+import logging
+import threading
+
+# data: {"symbol": ...}; published after a command changed the symbol's book
+ORDERBOOK_CHANGED = "ORDERBOOK_CHANGED"
+
+
+class EventBus:
+    """
+    Topic-based publish/subscribe. Handlers run synchronously on the
+    publishing thread, so they must be quick (hand the work off if not);
+    one failing handler does not stop the others.
+    """
+
+    def __init__(self):
+        self.handlers = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, topic, handler):
+        """Call handler(data) for every event on `topic`"""
+        with self.lock:
+            self.handlers.setdefault(topic, []).append(handler)
+
+    def publish(self, topic, data):
+        """Run the handlers of an event"""
+        for handler in self.handlers.get(topic, ()):
+            try:
+                handler(data)
+            except Exception as e:
+                logging.error(f"{topic} handler {handler.__name__} failed: {e}")
+
+
+# Global instance
+event_bus = EventBus()
@@ -0,0 +1,71 @@
+"""
+Fixed-point (scaled integer) representation of prices, quantities and balances.
+
+Inside the backend a price is an int number of ticks, a quantity an int number
+of lots and a balance amount an int number of balance units. The scales are
+those of the DECIMAL columns they are stored in, so converting a MySQL value
+is always exact and matching/settlement arithmetic never rounds. Conversions
+happen only at the edges: request bodies, MySQL parameters and rows, and
+response/WebSocket payloads.
+"""
+
+from decimal import Decimal, InvalidOperation
+
+PRICE_DECIMALS = 2  # orders.price DECIMAL(10,2): 1 tick = 0.01
+QUANTITY_DECIMALS = 4  # orders.quantity DECIMAL(10,4): 1 lot = 0.0001
+BALANCE_DECIMALS = 8  # balances.available/reserved DECIMAL(18,8)
+
+# lots -> balance units, and lots * ticks -> balance units
+LOT_UNITS = 10 ** (BALANCE_DECIMALS - QUANTITY_DECIMALS)
+NOTIONAL_UNITS = 10 ** (BALANCE_DECIMALS - QUANTITY_DECIMALS - PRICE_DECIMALS)
+
+
+def _to_scaled(value, decimals, name):
+    try:
+        amount = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError("Invalid numeric value provided")
+    if not amount.is_finite():
+        raise ValueError("Invalid numeric value provided")
+
+    scaled = amount.scaleb(decimals)
+    if scaled != scaled.to_integral_value():
+        raise ValueError(f"{name} supports at most {decimals} decimal places")
+    return int(scaled)
+
+
+def to_ticks(price):
+    """Price (JSON number, string or Decimal) -> int ticks"""
+    return _to_scaled(price, PRICE_DECIMALS, "Price")
+
+
+def to_lots(quantity):
+    """Quantity -> int lots"""
+    return _to_scaled(quantity, QUANTITY_DECIMALS, "Quantity")
+
+
+def to_units(amount):
+    """Balance amount -> int balance units"""
+    return _to_scaled(amount, BALANCE_DECIMALS, "Amount")
+
+
+def ticks_to_decimal(ticks):
+    return Decimal(ticks).scaleb(-PRICE_DECIMALS)
+
+
+def lots_to_decimal(lots):
+    return Decimal(lots).scaleb(-QUANTITY_DECIMALS)
+
+
+def units_to_decimal(units):
+    return Decimal(units).scaleb(-BALANCE_DECIMALS)
+
+
+def lots_to_units(lots):
+    """Quantity of an asset expressed as a balance amount"""
+    return lots * LOT_UNITS
+
+
+def notional_units(lots, ticks):
+    """Exact cost of `lots` at `ticks`, as a balance amount"""
+    return lots * ticks * NOTIONAL_UNITS
@@ -1,6 +1,20 @@
+import base64
+from datetime import datetime
+import json
 import mysql.connector
 import logging
 from flask_jwt_extended import get_jwt_identity
+from balance_cache import balance_cache
+from fixed_point import (
+    lots_to_decimal,
+    lots_to_units,
+    notional_units,
+    ticks_to_decimal,
+    to_units,
+    units_to_decimal,
+)
+from orderbook import RestingOrder, matching_engine
+import statements
 
 
 def get_base_asset(symbol):
@@ -13,6 +27,69 @@ def get_user_id_int():
     return int(get_jwt_identity())
 
 
+# Largest page a keyset-paginated endpoint returns
+MAX_PAGE_SIZE = 200
+
+
+def parse_page_args(args, default_limit):
+    """
+    Read `limit` and `cursor` of a keyset-paginated endpoint from the query
+    string. Returns (limit, after) where `after` is the (timestamp, id) of the
+    last row of the previous page, or None for the first page.
+    """
+    try:
+        limit = int(args.get("limit", default_limit))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    cursor = args.get("cursor")
+    if not cursor:
+        return limit, None
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return limit, (datetime.fromisoformat(timestamp), int(row_id))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def keyset_condition(time_column, id_column, after):
+    """SQL condition and params selecting the rows after `after` in (time, id) DESC order"""
+    if after is None:
+        return "TRUE", ()
+    return (
+        f"({time_column} < %s OR ({time_column} = %s AND {id_column} < %s))",
+        (after[0], after[0], after[1]),
+    )
+
+
+def next_page(rows, limit, time_column):
+    """
+    Trim rows fetched with LIMIT limit + 1 to one page; returns the page and
+    the cursor of the next one (None when this is the last page).
+    """
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    cursor = json.dumps([last[time_column].isoformat(), last["id"]])
+    return rows, base64.urlsafe_b64encode(cursor.encode()).decode()
+
+
+def depth_levels(rows):
+    """JSON rows of one side's (price ticks, remaining lots, order count) levels"""
+    return [
+        {
+            "price": float(ticks_to_decimal(price)),
+            "quantity": float(lots_to_decimal(size)),
+            "orders": count,
+        }
+        for price, size, count in rows
+    ]
+
+
 def get_user_balance(cursor, user_id, asset):
     """Get user balance for a specific asset"""
     cursor.execute(
@@ -22,305 +99,333 @@ def get_user_balance(cursor, user_id, asset):
     return cursor.fetchone()
 
 
-def update_balance(cursor, user_id, asset, available_change=0, reserved_change=0):
-    """Update user balance with specified changes"""
-    balance = get_user_balance(cursor, user_id, asset)
-    if not balance:
-        raise ValueError(f"{asset} balance not found for user {user_id}")
+def get_cached_balance(cursor, user_id, asset, prepared=None):
+    """
+    (available, reserved) in balance units, from the balance cache when
+    possible. A miss is loaded with a locking read, so the value cached is the
+    latest committed one. Returns None if the user has no such balance.
+    `prepared` are the connection's prepared statements, if the caller has them.
+    """
+    balance = balance_cache.get(user_id, asset)
+    if balance is not None:
+        return balance
 
-    new_available = float(balance["available"]) + available_change
-    new_reserved = float(balance["reserved"]) + reserved_change
+    version = balance_cache.version(user_id, asset)
+    rows = statements.execute(
+        cursor, prepared, "select_balance_for_update", (user_id, asset)
+    ).fetchall()
+    if not rows:
+        return None
+    row = rows[0]
 
-    if new_available < 0:
-        raise ValueError(f"Insufficient {asset} balance")
+    balance = (to_units(row["available"]), to_units(row["reserved"]))
+    balance_cache.store(user_id, asset, balance, version)
+    return balance
+
+
+def lock_balances(cursor, keys):
+    """
+    Lock the balance rows of several (user_id, asset) pairs with SELECT ...
+    FOR UPDATE, walking the unique (user_id, asset) index in order. Every
+    transaction that touches more than one balance locks them this way first,
+    so they all queue up in the same canonical order and cannot deadlock on
+    each other.
+    """
+    keys = sorted(set(keys))
+    if not keys:
+        return
 
     cursor.execute(
-        """UPDATE balances 
-           SET available = %s, reserved = %s, updated_at = NOW()
-           WHERE user_id = %s AND asset = %s""",
-        (new_available, new_reserved, user_id, asset),
+        f"""SELECT id FROM balances
+           WHERE (user_id, asset) IN ({", ".join(["(%s, %s)"] * len(keys))})
+           ORDER BY user_id, asset
+           FOR UPDATE""",
+        [value for key in keys for value in key],
     )
+    cursor.fetchall()
 
-    return new_available, new_reserved
 
+def adjust_balance(cursor, user_id, asset, available_change=0, reserved_change=0, prepared=None):
+    """
+    Apply increments (in balance units) to a user balance in a single
+    conditional UPDATE. The row is only changed if `available` stays
+    non-negative; returns whether it was (rowcount counts matched rows,
+    see db_pool). Applied changes are written through to the balance cache.
+    """
+    result = statements.execute(
+        cursor,
+        prepared,
+        "adjust_balance",
+        (
+            units_to_decimal(available_change),
+            units_to_decimal(reserved_change),
+            user_id,
+            asset,
+            units_to_decimal(-available_change),
+        ),
+    )
+    if result.rowcount <= 0:
+        return False
 
-def reserve_balance_for_order(cursor, user_id, side, symbol, quantity, price):
-    """Reserve balance for a new order"""
-    if side == "BUY":
-        total_cost = quantity * price
-        balance = get_user_balance(cursor, user_id, "USD")
+    balance_cache.apply(user_id, asset, available_change, reserved_change)
+    return True
 
-        if not balance or float(balance["available"]) < total_cost:
-            available = float(balance["available"]) if balance else 0
-            raise ValueError(
-                f"Insufficient USD balance. Required: ${total_cost:.2f}, Available: ${available:.2f}"
-            )
 
-        update_balance(cursor, user_id, "USD", -total_cost, total_cost)
+def update_balance(cursor, user_id, asset, available_change=0, reserved_change=0):
+    """Update user balance with specified changes"""
+    if not adjust_balance(cursor, user_id, asset, available_change, reserved_change):
+        # Cold path: find out why the conditional update did not apply
+        if not get_user_balance(cursor, user_id, asset):
+            raise ValueError(f"{asset} balance not found for user {user_id}")
+        raise ValueError(f"Insufficient {asset} balance")
 
-    elif side == "SELL":
-        base_asset = get_base_asset(symbol)
-        balance = get_user_balance(cursor, user_id, base_asset)
 
-        if not balance or float(balance["available"]) < quantity:
-            available = float(balance["available"]) if balance else 0
-            raise ValueError(
-                f"Insufficient {base_asset} balance. Required: {quantity}, Available: {available}"
-            )
+def get_order_reservation(side, symbol, quantity, price):
+    """
+    Asset and amount (in balance units) an order of `quantity` lots at
+    `price` ticks has to reserve: USD for buys, the base asset for sells.
+    """
+    if side == "BUY":
+        return "USD", notional_units(quantity, price)
+    return get_base_asset(symbol), lots_to_units(quantity)
 
-        update_balance(cursor, user_id, base_asset, -quantity, quantity)
 
+def insufficient_balance_message(asset, required, available):
+    """Error message for a reservation, amounts given in balance units"""
+    required = units_to_decimal(required)
+    available = units_to_decimal(available)
+    if asset == "USD":
+        return f"Insufficient USD balance. Required: ${required:.2f}, Available: ${available:.2f}"
+    return f"Insufficient {asset} balance. Required: {required.normalize():f}, Available: {available.normalize():f}"
 
-def release_balance_for_order(cursor, user_id, side, symbol, quantity, price):
-    """Release reserved balance when cancelling an order"""
-    if side == "BUY":
-        total_cost = quantity * price
-        update_balance(cursor, user_id, "USD", total_cost, -total_cost)
-    elif side == "SELL":
-        base_asset = get_base_asset(symbol)
-        update_balance(cursor, user_id, base_asset, quantity, -quantity)
+
+def reserve_balance_for_order(cursor, user_id, side, symbol, quantity, price, prepared=None):
+    """
+    Reserve balance for a new order (quantity in lots, price in ticks).
+    Checked against the balance cache first, so a rejection normally costs
+    no database I/O.
+    """
+    if side not in ["BUY", "SELL"]:
+        return
+
+    asset, amount = get_order_reservation(side, symbol, quantity, price)
+    balance = get_cached_balance(cursor, user_id, asset, prepared)
+    available = balance[0] if balance else 0
+    if amount <= available and adjust_balance(cursor, user_id, asset, -amount, amount, prepared):
+        return
+
+    if amount <= available:
+        # The cache was ahead of MySQL: reload it for the error message
+        balance_cache.invalidate([(user_id, asset)])
+        balance = get_cached_balance(cursor, user_id, asset, prepared)
+        available = balance[0] if balance else 0
+    raise ValueError(insufficient_balance_message(asset, amount, available))
 
 
-def process_trade_settlement(cursor, buy_order, sell_order, quantity, price):
+def reserve_balance_for_orders(cursor, user_id, orders):
     """
-    Process the balance transfers for a completed trade.
+    Reserve balance for several new orders of one user in a single pass:
+    one conditional UPDATE per asset for the orders' combined amount, checked
+    against the balance cache first.
+    `orders` is a list of (side, symbol, lots, ticks) tuples. If an asset
+    cannot cover all of its orders, they are accepted in submission order
+    while the available balance lasts. Returns an error message (or None)
+    per order.
     """
-    try:
-        # Determine which order is buy and which is sell
-        if buy_order["side"] == "BUY":
-            buyer_id = buy_order["user_id"]
-            seller_id = sell_order["user_id"]
-        else:
-            buyer_id = sell_order["user_id"]
-            seller_id = buy_order["user_id"]
+    reservations = [get_order_reservation(*order) for order in orders]
+    by_asset = {}
+    for index, (asset, amount) in enumerate(reservations):
+        by_asset.setdefault(asset, []).append(index)
+
+    errors = [None] * len(orders)
+    # Assets in canonical order, the same order lock_balances uses
+    for asset, indexes in sorted(by_asset.items()):
+        total = sum(reservations[index][1] for index in indexes)
+        balance = get_cached_balance(cursor, user_id, asset)
+        available = balance[0] if balance else 0
+        if total <= available:
+            if adjust_balance(cursor, user_id, asset, -total, total):
+                continue
+            balance_cache.invalidate([(user_id, asset)])
+            balance = get_cached_balance(cursor, user_id, asset)
+            available = balance[0] if balance else 0
 
-        total_cost = quantity * price
-        base_asset = buy_order["symbol"].replace("USD", "").replace("USDT", "")
+        # Not enough for everything: take orders while the balance lasts
+        accepted = 0
+        for index in indexes:
+            amount = reservations[index][1]
+            if accepted + amount <= available:
+                accepted += amount
+            else:
+                errors[index] = insufficient_balance_message(asset, amount, available - accepted)
 
-        # Buyer: Release reserved USD, receive base asset
-        # Get buyer's USD balance
-        cursor.execute(
-            "SELECT available, reserved FROM balances WHERE user_id = %s AND asset = 'USD'",
-            (buyer_id,),
-        )
-        buyer_usd = cursor.fetchone()
-
-        if buyer_usd:
-            # Release reserved USD (reduce reserved by total_cost)
-            new_reserved = max(0, float(buyer_usd["reserved"]) - total_cost)
-            cursor.execute(
-                """UPDATE balances 
-                   SET reserved = %s, updated_at = NOW()
-                   WHERE user_id = %s AND asset = 'USD'""",
-                (new_reserved, buyer_id),
-            )
+        if accepted > 0 and not adjust_balance(cursor, user_id, asset, -accepted, accepted):
+            for index in indexes:
+                errors[index] = errors[index] or f"Insufficient {asset} balance"
 
-        # Buyer: Add base asset to available balance
-        cursor.execute(
-            "SELECT available, reserved FROM balances WHERE user_id = %s AND asset = %s",
-            (buyer_id, base_asset),
-        )
-        buyer_asset = cursor.fetchone()
-
-        if buyer_asset:
-            new_available = float(buyer_asset["available"]) + quantity
-            cursor.execute(
-                """UPDATE balances 
-                   SET available = %s, updated_at = NOW()
-                   WHERE user_id = %s AND asset = %s""",
-                (new_available, buyer_id, base_asset),
-            )
-        else:
-            # Create new balance record for buyer
-            cursor.execute(
-                """INSERT INTO balances (user_id, asset, available, reserved, updated_at)
-                   VALUES (%s, %s, %s, 0, NOW())""",
-                (buyer_id, base_asset, quantity),
-            )
+    return errors
 
-        # Seller: Release reserved base asset, receive USD
-        # Get seller's base asset balance
-        cursor.execute(
-            "SELECT available, reserved FROM balances WHERE user_id = %s AND asset = %s",
-            (seller_id, base_asset),
-        )
-        seller_asset = cursor.fetchone()
-
-        if seller_asset:
-            # Release reserved base asset
-            new_reserved = max(0, float(seller_asset["reserved"]) - quantity)
-            cursor.execute(
-                """UPDATE balances 
-                   SET reserved = %s, updated_at = NOW()
-                   WHERE user_id = %s AND asset = %s""",
-                (new_reserved, seller_id, base_asset),
-            )
 
-        # Seller: Add USD to available balance
-        cursor.execute(
-            "SELECT available, reserved FROM balances WHERE user_id = %s AND asset = 'USD'",
-            (seller_id,),
-        )
-        seller_usd = cursor.fetchone()
-
-        if seller_usd:
-            new_available = float(seller_usd["available"]) + total_cost
-            cursor.execute(
-                """UPDATE balances 
-                   SET available = %s, updated_at = NOW()
-                   WHERE user_id = %s AND asset = 'USD'""",
-                (new_available, seller_id),
-            )
-        else:
-            # Create new USD balance for seller
-            cursor.execute(
-                """INSERT INTO balances (user_id, asset, available, reserved, updated_at)
-                   VALUES (%s, 'USD', %s, 0, NOW())""",
-                (seller_id, total_cost),
-            )
+def release_balance_for_order(cursor, user_id, side, symbol, quantity, price):
+    """Release reserved balance when cancelling an order (quantity in lots, price in ticks)"""
+    if side not in ["BUY", "SELL"]:
+        return
 
-        logging.info(
-            f"Trade settled: {quantity} {base_asset} @ ${price} between users {buyer_id} and {seller_id}"
-        )
+    asset, amount = get_order_reservation(side, symbol, quantity, price)
+    update_balance(cursor, user_id, asset, amount, -amount)
 
-    except Exception as e:
-        logging.error(f"Error in trade settlement: {e}")
-        raise
 
+class BalanceDeltas:
+    """Net balance changes per (user_id, asset) in balance units, accumulated across many fills"""
 
-def match_orders(cursor, new_order_id, db):
-    """
-    Match orders in the order book for the given new order.
-    Returns True if the order was fully filled, False otherwise.
-    """
-    try:
-        # Get the new order details
-        cursor.execute(
-            "SELECT * FROM orders WHERE id = %s AND status IN ('PENDING', 'PARTIAL')", (new_order_id,)
-        )
-        new_order = cursor.fetchone()
+    def __init__(self):
+        self.deltas = {}
 
-        if not new_order:
-            return False
+    def add(self, user_id, asset, available=0, reserved=0):
+        current = self.deltas.get((user_id, asset), (0, 0))
+        self.deltas[(user_id, asset)] = (current[0] + available, current[1] + reserved)
 
-        logging.info(
-            f"Matching order {new_order_id}: {new_order['side']} {new_order['quantity']} {new_order['symbol']} @ {new_order['price']}"
-        )
+    def apply(self, cursor):
+        """Lock the balances in canonical order, then apply every delta with a single multi-row upsert"""
+        if not self.deltas:
+            return
 
-        # Find matching orders (opposite side, same symbol, compatible price)
-        # For BUY orders, find SELL orders with price <= new_order_price
-        # For SELL orders, find BUY orders with price >= new_order_price
-        if new_order["side"] == "BUY":
-            match_sql = """
-                SELECT * FROM orders 
-                WHERE symbol = %s 
-                AND side = 'SELL' 
-                AND status IN ('PENDING', 'PARTIAL')
-                AND price <= %s
-                AND user_id != %s
-                ORDER BY price ASC, created_at ASC
-            """
-        else:  # SELL
-            match_sql = """
-                SELECT * FROM orders 
-                WHERE symbol = %s 
-                AND side = 'BUY' 
-                AND status IN ('PENDING', 'PARTIAL')
-                AND price >= %s
-                AND user_id != %s
-                ORDER BY price DESC, created_at ASC
-            """
+        rows = sorted(self.deltas.items())
+        lock_balances(cursor, self.deltas)
+        params = []
+        for (user_id, asset), (available, reserved) in rows:
+            params.extend((user_id, asset, units_to_decimal(available), units_to_decimal(reserved)))
 
         cursor.execute(
-            match_sql, (new_order["symbol"], new_order["price"], new_order["user_id"])
+            f"""INSERT INTO balances (user_id, asset, available, reserved, updated_at)
+               VALUES {", ".join(["(%s, %s, %s, %s, NOW())"] * len(rows))}
+               ON DUPLICATE KEY UPDATE
+                   available = available + VALUES(available),
+                   reserved = GREATEST(0, reserved + VALUES(reserved)),
+                   updated_at = NOW()""",
+            params,
         )
-        matching_orders = cursor.fetchall()
+        for (user_id, asset), (available, reserved) in rows:
+            balance_cache.apply(user_id, asset, available, reserved)
 
-        remaining_quantity = float(new_order["quantity"]) - float(
-            new_order["filled_quantity"]
+
+def process_trade_settlement(cursor, fills):
+    """
+    Process the balance transfers for all fills of one match.
+    Deltas are netted per (user_id, asset) and written in one statement, so
+    the number of round trips does not grow with the number of fills.
+    """
+    deltas = BalanceDeltas()
+    for fill in fills:
+        if fill.taker_side == "BUY":
+            buyer_id, seller_id = fill.taker_user_id, fill.maker_user_id
+            # The buyer reserved at their own limit; refund any price improvement
+            reserved_price = fill.taker_price
+        else:
+            buyer_id, seller_id = fill.maker_user_id, fill.taker_user_id
+            reserved_price = fill.price
+
+        total_cost = notional_units(fill.quantity, fill.price)
+        reserved_cost = notional_units(fill.quantity, reserved_price)
+        quantity = lots_to_units(fill.quantity)
+        base_asset = get_base_asset(fill.symbol)
+
+        # Buyer: release reserved USD, receive base asset
+        deltas.add(
+            buyer_id,
+            "USD",
+            available=reserved_cost - total_cost,
+            reserved=-reserved_cost,
         )
+        deltas.add(buyer_id, base_asset, available=quantity)
 
-        for match_order in matching_orders:
-            if remaining_quantity <= 0:
-                break
+        # Seller: release reserved base asset, receive USD
+        deltas.add(seller_id, base_asset, reserved=-quantity)
+        deltas.add(seller_id, "USD", available=total_cost)
 
-            match_remaining = float(match_order["quantity"]) - float(
-                match_order["filled_quantity"]
-            )
-            if match_remaining <= 0:
-                continue
+        logging.info(
+            f"Trade settled: {lots_to_decimal(fill.quantity)} {base_asset} @ ${ticks_to_decimal(fill.price)} between users {buyer_id} and {seller_id}"
+        )
 
-            # Calculate trade quantity (minimum of both remaining quantities)
-            trade_quantity = min(remaining_quantity, match_remaining)
-            # Use the existing order's price (price-time priority)
-            trade_price = float(match_order["price"])
-
-            logging.info(f"Executing trade: {trade_quantity} @ {trade_price}")
-
-            # Create transaction record
-            cursor.execute(
-                """
-                INSERT INTO transactions (
-                    buy_order_id, sell_order_id, symbol, quantity, price, executed_at
-                ) VALUES (%s, %s, %s, %s, %s, NOW())
-            """,
-                (
-                    (
-                        new_order["id"]
-                        if new_order["side"] == "BUY"
-                        else match_order["id"]
-                    ),
-                    (
-                        match_order["id"]
-                        if new_order["side"] == "BUY"
-                        else new_order["id"]
-                    ),
-                    new_order["symbol"],
-                    trade_quantity,
-                    trade_price,
-                ),
-            )
+    try:
+        deltas.apply(cursor)
+    except Exception as e:
+        logging.error(f"Error in trade settlement: {e}")
+        raise
 
-            # Update filled quantities
-            new_filled = float(new_order["filled_quantity"]) + trade_quantity
-            match_filled = float(match_order["filled_quantity"]) + trade_quantity
-
-            # Update new order
-            cursor.execute(
-                """
-                UPDATE orders 
-                SET filled_quantity = %s, 
-                    status = CASE WHEN filled_quantity >= quantity THEN 'FILLED' ELSE 'PARTIAL' END,
-                    updated_at = NOW()
-                WHERE id = %s
-            """,
-                (new_filled, new_order["id"]),
-            )
 
-            # Update matching order
-            cursor.execute(
-                """
-                UPDATE orders 
-                SET filled_quantity = %s,
-                    status = CASE WHEN filled_quantity >= quantity THEN 'FILLED' ELSE 'PARTIAL' END,
-                    updated_at = NOW()
-                WHERE id = %s
-            """,
-                (match_filled, match_order["id"]),
-            )
+def persist_fills(cursor, fills):
+    """
+    Write the fills produced by the in-memory matching engine to the database:
+    one multi-row INSERT for the transactions, one UPDATE for the filled
+    quantities of every order involved and one upsert for the balances.
+    """
+    if not fills:
+        return
 
-            # Process balance transfers
-            process_trade_settlement(
-                cursor, new_order, match_order, trade_quantity, trade_price
+    cursor.execute(
+        f"""
+        INSERT INTO transactions (
+            buy_order_id, sell_order_id, buyer_user_id, seller_user_id,
+            symbol, quantity, price, executed_at
+        ) VALUES {", ".join(["(%s, %s, %s, %s, %s, %s, %s, NOW())"] * len(fills))}
+    """,
+        [
+            value
+            for fill in fills
+            for value in (
+                fill.taker_id if fill.taker_side == "BUY" else fill.maker_id,
+                fill.maker_id if fill.taker_side == "BUY" else fill.taker_id,
+                fill.taker_user_id if fill.taker_side == "BUY" else fill.maker_user_id,
+                fill.maker_user_id if fill.taker_side == "BUY" else fill.taker_user_id,
+                fill.symbol,
+                lots_to_decimal(fill.quantity),
+                ticks_to_decimal(fill.price),
             )
+        ],
+    )
 
-            remaining_quantity -= trade_quantity
+    # Total filled per order; the taker appears in every fill
+    filled = {}
+    for fill in fills:
+        filled[fill.maker_id] = filled.get(fill.maker_id, 0) + fill.quantity
+        filled[fill.taker_id] = filled.get(fill.taker_id, 0) + fill.quantity
 
-            # Update the new_order data for next iteration
-            new_order["filled_quantity"] = new_filled
+    order_ids = list(filled)
+    cursor.execute(
+        f"""
+        UPDATE orders 
+        SET filled_quantity = filled_quantity + CASE id {" ".join(["WHEN %s THEN %s"] * len(order_ids))} END,
+            status = CASE WHEN filled_quantity >= quantity THEN 'FILLED' ELSE 'PARTIAL' END,
+            updated_at = NOW()
+        WHERE id IN ({", ".join(["%s"] * len(order_ids))})
+    """,
+        [value for order_id in order_ids for value in (order_id, lots_to_decimal(filled[order_id]))]
+        + order_ids,
+    )
 
-        return remaining_quantity <= 0
+    process_trade_settlement(cursor, fills)
 
-    except Exception as e:
-        logging.error(f"Error in order matching: {e}")
-        raise
+
+def match_orders(cursor, new_order_id, prepared=None):
+    """
+    Match orders in the order book for the given new order.
+    Matching runs against the resident in-memory book only; persisting the
+    resulting fills (see persist_fills) is left to the caller.
+    Returns the order row as it was before matching (None if the order is no
+    longer open) and the list of fills.
+    """
+    rows = statements.execute(cursor, prepared, "select_open_order", (new_order_id,)).fetchall()
+    if not rows:
+        return None, []
+    row = rows[0]
+
+    new_order = RestingOrder.from_row(row)
+    logging.info(
+        f"Matching order {new_order_id}: {row['side']} {row['quantity']} {row['symbol']} @ {row['price']}"
+    )
+
+    fills = matching_engine.submit(cursor, new_order)
+    for fill in fills:
+        logging.info(f"Executing trade: {lots_to_decimal(fill.quantity)} @ {ticks_to_decimal(fill.price)}")
+    return row, fills
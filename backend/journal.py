@@ -0,0 +1,237 @@
+# append-only write-ahead journal for the matching engine
+# order entry is acknowledged once its events are durable here, MySQL is
+# brought up to date right after (and replayed from here after a crash)
+# the log is split into segments; segments MySQL no longer needs are deleted
+
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+ORDER_ACCEPTED = "ORDER_ACCEPTED"
+FILL = "FILL"
+CANCEL = "CANCEL"
+AMEND = "AMEND"
+
+JOURNAL_PATH = os.getenv(
+    "JOURNAL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "matching.journal")
+)
+# how long the flusher waits to gather more appends into one fsync
+JOURNAL_FLUSH_INTERVAL = float(os.getenv("JOURNAL_FLUSH_INTERVAL_MS", 2)) / 1000
+# a new segment is started once the current one reaches this size
+JOURNAL_SEGMENT_SIZE = int(float(os.getenv("JOURNAL_SEGMENT_SIZE_MB", 64)) * 1024 * 1024)
+
+
+def _record_seq(line):
+    """Sequence number of a record line without decoding the whole record"""
+    # Records are written as {"seq":N,...}
+    return int(line[7:line.index(b",")])
+
+
+class Journal:
+    """
+    Sequence-numbered event log, one JSON record per line, kept in segment
+    files `<path>.<first seq>`. Appends are buffered and made durable by a
+    background flusher that writes and fsyncs everything pending in one go
+    (group commit), and rolls over to a new segment past `segment_size`.
+    """
+
+    def __init__(self, path, flush_interval=JOURNAL_FLUSH_INTERVAL, segment_size=JOURNAL_SEGMENT_SIZE):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.segment_size = segment_size
+        self.condition = threading.Condition()
+        self.pending = []
+        self.flusher = None
+        self.error = None
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._adopt_unsegmented()
+        segments = self.segments()
+        if not segments:
+            segments = [1]
+        self.last_seq = self._recover_tail(self._segment_path(segments[-1]), segments[-1])
+        self.durable_seq = self.last_seq
+        self.file = open(self._segment_path(segments[-1]), "ab")
+
+    def _segment_path(self, first_seq):
+        return f"{self.path}.{first_seq:012d}"
+
+    def segments(self):
+        """First sequence numbers of the segments on disk, oldest first"""
+        first_seqs = []
+        for segment in glob.glob(glob.escape(self.path) + ".*"):
+            suffix = segment[len(self.path) + 1:]
+            if suffix.isdigit():
+                first_seqs.append(int(suffix))
+        return sorted(first_seqs)
+
+    def _adopt_unsegmented(self):
+        """Turn a journal written before segments existed into the first segment"""
+        if not os.path.isfile(self.path):
+            return
+        first_seq = 1
+        with open(self.path, "rb") as f:
+            line = f.readline()
+            if line.endswith(b"\n"):
+                first_seq = _record_seq(line)
+        os.replace(self.path, self._segment_path(first_seq))
+
+    def _recover_tail(self, path, first_seq):
+        """Find the last sequence number, cutting off a torn final record"""
+        last_seq = first_seq - 1
+        good_offset = 0
+        if not os.path.exists(path):
+            return last_seq
+
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    last_seq = json.loads(line)["seq"]
+                except (ValueError, KeyError):
+                    break
+                good_offset += len(line)
+
+        if good_offset < os.path.getsize(path):
+            logging.warning(f"Truncating torn journal tail of {path} at offset {good_offset}")
+            with open(path, "r+b") as f:
+                f.truncate(good_offset)
+        return last_seq
+
+    def append(self, event_type, data):
+        """Buffer an event and return its sequence number (not yet durable)"""
+        with self.condition:
+            self.last_seq += 1
+            record = {"seq": self.last_seq, "type": event_type, "data": data}
+            self.pending.append(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+            if self.flusher is None:
+                self.flusher = threading.Thread(target=self._flush_loop, name="journal-flusher", daemon=True)
+                self.flusher.start()
+            self.condition.notify_all()
+            return self.last_seq
+
+    def wait_durable(self, seq):
+        """Block until every event up to `seq` has been fsynced"""
+        with self.condition:
+            while self.durable_seq < seq:
+                if self.error is not None:
+                    raise self.error
+                self.condition.wait()
+
+    def _flush_loop(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+
+            # Let concurrent appenders join this batch
+            time.sleep(self.flush_interval)
+
+            with self.condition:
+                batch, self.pending = self.pending, []
+                batch_seq = self.last_seq
+
+            try:
+                self.file.write(b"".join(batch))
+                self.file.flush()
+                os.fsync(self.file.fileno())
+            except OSError as e:
+                # Nothing can be acknowledged without the journal: fail every
+                # current and future waiter rather than lie about durability
+                logging.critical(f"Journal write failed, order entry halted: {e}")
+                with self.condition:
+                    self.error = e
+                    self.condition.notify_all()
+                return
+
+            with self.condition:
+                self.durable_seq = batch_seq
+                self.condition.notify_all()
+
+            if self.file.tell() >= self.segment_size:
+                self._roll(batch_seq + 1)
+
+    def _roll(self, first_seq):
+        """Continue in a new segment starting at `first_seq` (flusher thread only)"""
+        try:
+            new_file = open(self._segment_path(first_seq), "ab")
+        except OSError as e:
+            # Keep appending to the current segment; rolling is retried next flush
+            logging.error(f"Could not start journal segment {first_seq}: {e}")
+            return
+        old_file, self.file = self.file, new_file
+        old_file.close()
+
+    def _start_segment(self, segments, after_seq):
+        """Index in `segments` of the segment holding `after_seq + 1`"""
+        start = 0
+        for i, first_seq in enumerate(segments):
+            if first_seq <= after_seq + 1:
+                start = i
+        return start
+
+    def locate(self, after_seq):
+        """
+        Position (segment, byte offset) of the first durable event past
+        `after_seq`, for replay() to seek to later
+        """
+        segments = self.segments()
+        first_seq = segments[self._start_segment(segments, after_seq)]
+        offset = 0
+        with open(self._segment_path(first_seq), "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n") or _record_seq(line) > after_seq:
+                    break
+                offset += len(line)
+        return first_seq, offset
+
+    def replay(self, after_seq=0, position=None):
+        """
+        Yield (seq, event_type, data) for every durable event past `after_seq`,
+        starting from the segment that holds `after_seq + 1`, or from a
+        `position` returned by locate()
+        """
+        segments = self.segments()
+        offset = 0
+        if position is not None and position[0] in segments:
+            start = segments.index(position[0])
+            offset = position[1]
+        else:
+            start = self._start_segment(segments, after_seq)
+
+        for first_seq in segments[start:]:
+            try:
+                f = open(self._segment_path(first_seq), "rb")
+            except FileNotFoundError:
+                # Discarded meanwhile: every event in it was below the checkpoints
+                continue
+            with f:
+                f.seek(offset)
+                offset = 0
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # Torn or still being written
+                        return
+                    if _record_seq(line) <= after_seq:
+                        continue
+                    record = json.loads(line)
+                    yield record["seq"], record["type"], record["data"]
+
+    def discard_before(self, seq):
+        """Delete the segments holding only events up to `seq`; never the current one"""
+        segments = self.segments()
+        for first_seq, next_first_seq in zip(segments, segments[1:]):
+            if next_first_seq > seq + 1:
+                break
+            os.remove(self._segment_path(first_seq))
+            logging.info(f"Discarded journal segment {first_seq}..{next_first_seq - 1}")
+
+
+# Global instance
+journal = Journal(JOURNAL_PATH)
@@ -0,0 +1,213 @@
+"""
+Versioned schema migrations and query plan checks.
+
+Migrations are the numbered files in database/migrations
+(`NNN_description.sql`), applied in order and recorded in
+`schema_migrations`. A fresh database created from
+database/orderbook-schema.sql is already at the latest version.
+
+    python migrate.py            apply pending migrations
+    python migrate.py status     list applied and pending migrations
+    python migrate.py check      EXPLAIN the hot queries; fails on a full scan or an unexpected filesort
+
+Run `check` against a database with realistic data: on near-empty tables
+MySQL may rightly prefer a scan over any index.
+"""
+
+from datetime import datetime
+import logging
+import os
+import re
+import sys
+
+from db_pool import get_db_connection
+from helpers import keyset_condition
+import statements
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "database", "migrations")
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+# A page cursor for the keyset queries' sample parameters
+SAMPLE_AFTER = (datetime(2100, 1, 1), 0)
+_condition, _after = keyset_condition("created_at", "id", SAMPLE_AFTER)
+_txn_condition, _txn_after = keyset_condition("t.executed_at", "t.id", SAMPLE_AFTER)
+_party_condition, _party_after = keyset_condition("executed_at", "id", SAMPLE_AFTER)
+
+# Hot queries (the text the code runs, see statements.QUERIES) and sample
+# parameters; their plans must use an index and must not sort the rows they
+# read. Merging the short pages of a UNION is allowed to sort.
+HOT_QUERIES = [
+    ("load order book", statements.QUERIES["load_book"], ("BTCUSD",)),
+    ("open orders", statements.QUERIES["open_orders"], (1,)),
+    ("open orders of a symbol", statements.QUERIES["symbol_open_orders"], (1, "BTCUSD")),
+    ("symbols with resting orders", statements.QUERIES["book_symbols"], ()),
+    (
+        "user orders",
+        statements.QUERIES["user_orders"].format(condition=_condition),
+        (1, *_after, 51, 1, *_after, 51, 51),
+    ),
+    (
+        "recent transactions",
+        statements.QUERIES["transactions"].format(condition=_txn_condition),
+        (*_txn_after, 101),
+    ),
+    (
+        "user transactions",
+        statements.QUERIES["user_transactions"].format(condition=_party_condition),
+        (1, *_party_after, 101, 1, *_party_after, 101, 101),
+    ),
+]
+
+# Hot queries allowed to sort: GET /orders returns resting orders ordered
+# bids-then-asks by price, which no index can serve (the direction depends
+# on the side); the rows sorted are only the live book (or one symbol's),
+# read through an index
+SORTED_QUERIES = {"open orders", "open orders of a symbol"}
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """(version, name, path) of every migration file, in version order"""
+    migrations = []
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    return sorted(migrations)
+
+
+def split_statements(sql):
+    """Split a migration into statements (no procedures, so ';' ends each one)"""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [statement.strip() for statement in "\n".join(lines).split(";") if statement.strip()]
+
+
+def applied_versions(cursor):
+    cursor.execute(
+        """CREATE TABLE IF NOT EXISTS schema_migrations (
+               version INT NOT NULL,
+               name VARCHAR(100) NOT NULL,
+               applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+               PRIMARY KEY (version)
+           ) ENGINE=InnoDB"""
+    )
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def statements_done(cursor, version):
+    """How many statements of a migration already ran (a previous run failed midway)"""
+    cursor.execute(
+        """CREATE TABLE IF NOT EXISTS schema_migration_progress (
+               version INT NOT NULL,
+               statements INT NOT NULL,
+               PRIMARY KEY (version)
+           ) ENGINE=InnoDB"""
+    )
+    cursor.execute("SELECT statements FROM schema_migration_progress WHERE version = %s", (version,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def migrate():
+    """Apply every pending migration in order; returns how many were applied"""
+    applied = 0
+    with get_db_connection() as db:
+        cursor = db.cursor()
+        try:
+            done = applied_versions(cursor)
+            for version, name, path in load_migrations():
+                if version in done:
+                    continue
+
+                with open(path) as f:
+                    migration = split_statements(f.read())
+                done_statements = statements_done(cursor, version)
+                if done_statements:
+                    logging.info(f"Resuming migration {version:03d}_{name} at statement {done_statements + 1}")
+                else:
+                    logging.info(f"Applying migration {version:03d}_{name}")
+
+                # DDL commits implicitly and most of it cannot run twice (ADD
+                # INDEX, DROP FOREIGN KEY), so each statement's completion is
+                # committed right after it and a failed migration resumes with
+                # the statement that failed
+                for number, statement in enumerate(migration[done_statements:], done_statements + 1):
+                    cursor.execute(statement)
+                    cursor.execute(
+                        """INSERT INTO schema_migration_progress (version, statements) VALUES (%s, %s)
+                           ON DUPLICATE KEY UPDATE statements = VALUES(statements)""",
+                        (version, number),
+                    )
+                    db.commit()
+
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (version, name),
+                )
+                cursor.execute("DELETE FROM schema_migration_progress WHERE version = %s", (version,))
+                db.commit()
+                applied += 1
+        finally:
+            cursor.close()
+
+    logging.info(f"Schema up to date ({applied} migrations applied)")
+    return applied
+
+
+def status():
+    with get_db_connection() as db:
+        cursor = db.cursor()
+        try:
+            done = applied_versions(cursor)
+        finally:
+            cursor.close()
+
+    for version, name, _ in load_migrations():
+        print(f"{version:03d}_{name}: {'applied' if version in done else 'pending'}")
+
+
+def check_query_plans():
+    """EXPLAIN every hot query; returns a list of problems (empty if all plans are fine)"""
+    problems = []
+    with get_db_connection() as db:
+        cursor = db.cursor(dictionary=True)
+        try:
+            for name, sql, params in HOT_QUERIES:
+                cursor.execute("EXPLAIN " + sql, params)
+                for step in cursor.fetchall():
+                    if (step["table"] or "").startswith("<union"):
+                        # Merges pages already limited by their own index reads
+                        continue
+                    extra = step.get("Extra") or ""
+                    if step["type"] == "ALL":
+                        problems.append(f"{name}: full scan of {step['table']}")
+                    if "Using filesort" in extra and name not in SORTED_QUERIES:
+                        problems.append(f"{name}: filesort on {step['table']}")
+        finally:
+            cursor.close()
+    return problems
+
+
+def main(argv):
+    logging.basicConfig(level=logging.INFO)
+    command = argv[1] if len(argv) > 1 else "migrate"
+
+    if command == "migrate":
+        migrate()
+    elif command == "status":
+        status()
+    elif command == "check":
+        problems = check_query_plans()
+        for problem in problems:
+            print(f"FAIL {problem}")
+        if problems:
+            return 1
+        print(f"OK {len(HOT_QUERIES)} hot queries use indexes without sorting")
+    else:
+        print(__doc__)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,753 @@
+"""
+Order commands executed by the per-symbol matching sequencer.
+
+Each handler runs on the owner worker of the order's symbol (see sequencer.py)
+with its own pooled connection, so the checks it makes against an order's
+status and the book cannot race with a concurrent match on the same symbol.
+
+Every command writes its events to the journal (see journal.py) before it is
+acknowledged. The matching result of a SUBMIT is acknowledged as soon as its
+events are durable and written to MySQL right after; cancels and amends are
+validated against MySQL, journaled, then committed. Each commit also records
+the journal sequence number it covers in `journal_checkpoints`, so events
+that never reached MySQL (crash, lost connection) are replayed exactly once,
+either at startup or before the symbol's next command.
+
+A journaled command has happened, whether or not its MySQL commit went
+through: MySQL only catches up with it. The one thing a replay checks again
+is an amend's new reservation, as the balance may have been spent on another
+symbol meanwhile; if it is gone, the order is cancelled rather than amended.
+
+New orders get a narrower guarantee. The route reserves the balance and
+inserts the row in one MySQL commit before the SUBMIT journals
+ORDER_ACCEPTED, so a new order is acknowledged after that commit and the
+journal fsync, not after the fsync alone. The journal never holds an order
+MySQL lacks; MySQL can hold a PENDING order the journal lacks, if the
+process dies (or the SUBMIT fails) in between. Such an order is matched when
+its book is next loaded (see _open_book); snapshot restores check for it
+(see snapshot.restore). A SUBMIT's fills are written to MySQL after the
+acknowledgement, but before the symbol's next command runs.
+"""
+
+import logging
+
+from event_bus import event_bus, ORDERBOOK_CHANGED
+from db_pool import get_db_connection, retry_on_deadlock
+from fixed_point import lots_to_decimal, ticks_to_decimal, to_lots, to_ticks
+from helpers import (
+    BalanceDeltas,
+    adjust_balance,
+    get_order_reservation,
+    lock_balances,
+    reserve_balance_for_order,
+    release_balance_for_order,
+    persist_fills,
+    match_orders,
+)
+from journal import journal, ORDER_ACCEPTED, FILL, CANCEL, AMEND
+from orderbook import Fill, RestingOrder, matching_engine
+from sequencer import Acknowledge, sequencer, LOAD
+import statements
+
+# Symbols whose MySQL state fell behind the journal and must be caught up
+behind = set()
+# Per symbol: first journal seq whose events may not be in MySQL yet
+unsynced = {}
+
+
+class OrderCommandError(Exception):
+    """A command was rejected; carries the HTTP status the route should return"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def _load_open_order(cursor, order_id, user_id, symbol, action):
+    """Fetch an order and check it can still be changed by this user"""
+    cursor.execute(
+        "SELECT id, user_id, status, symbol, side, quantity, price, filled_quantity FROM orders WHERE id = %s",
+        (order_id,),
+    )
+    order = cursor.fetchone()
+
+    if not order:
+        raise OrderCommandError("Order not found", 404)
+
+    if int(order["user_id"]) != int(user_id):
+        raise OrderCommandError(f"You can only {action} your own orders", 403)
+
+    if order["symbol"] != symbol:
+        # The order moved to another symbol (and sequencer) after it was routed
+        raise OrderCommandError("Order was modified concurrently, please retry", 409)
+
+    if order["status"] not in ["PENDING", "PARTIAL"]:
+        past = "cancelled" if action == "delete" else "updated"
+        raise OrderCommandError(
+            f"Cannot {action} order with status '{order['status']}'. Only PENDING and PARTIAL orders can be {past}."
+        )
+
+    return order
+
+
+def _journal(symbol, events):
+    """Append (event_type, data) pairs and wait until they are durable; returns the last seq"""
+    # Marked before appending, so synced_seq() never passes these events
+    unsynced.setdefault(symbol, journal.last_seq + 1)
+    seq = None
+    for event_type, data in events:
+        seq = journal.append(event_type, data)
+    journal.wait_durable(seq)
+    return seq
+
+
+def _checkpoint(cursor, symbol, seq, prepared=None):
+    """Record that MySQL holds every journaled event of a symbol up to `seq`"""
+    statements.execute(cursor, prepared, "checkpoint", (symbol, seq))
+
+
+def _synced(symbol):
+    """MySQL now holds every journaled event of a symbol"""
+    if symbol not in behind:
+        unsynced.pop(symbol, None)
+
+
+def synced_seq():
+    """
+    Journal seq up to which MySQL holds every event of every symbol; the
+    segments before it are no longer needed (see snapshot.py)
+    """
+    # Read before `unsynced`: events appended after this have higher seqs
+    seq = journal.durable_seq
+    return min([seq] + [first_seq - 1 for first_seq in list(unsynced.values())])
+
+
+def _book_changed(symbol):
+    """Tell listeners (e.g. the WebSocket layer) that a symbol's book changed"""
+    event_bus.publish(ORDERBOOK_CHANGED, {"symbol": symbol})
+
+
+def _fell_behind(symbol, error):
+    """A journaled command did not reach MySQL: replay it before the next command"""
+    logging.error(f"MySQL fell behind the journal for {symbol}: {error}")
+    behind.add(symbol)
+    # The book will be rebuilt from MySQL once it has caught up
+    matching_engine.invalidate(symbol)
+
+
+def _apply_event(cursor, event_type, data):
+    """Bring MySQL in line with one journaled CANCEL or AMEND event"""
+    if event_type == CANCEL:
+        if data["remaining"] > 0:
+            release_balance_for_order(
+                cursor, data["user_id"], data["side"], data["symbol"], data["remaining"], data["price"]
+            )
+        cursor.execute(
+            "UPDATE orders SET status = 'CANCELLED', updated_at = NOW() WHERE id = %s AND user_id = %s",
+            (data["order_id"], data["user_id"]),
+        )
+
+    elif event_type == AMEND and data.get("in_place"):
+        # Quantity-only reduction: release the difference, keep the order's place
+        if data["released"] > 0:
+            release_balance_for_order(
+                cursor, data["user_id"], data["side"], data["symbol"], data["released"], data["price"]
+            )
+        cursor.execute(
+            """
+            UPDATE orders
+            SET quantity = %s,
+                status = CASE WHEN filled_quantity >= %s THEN 'FILLED' ELSE status END,
+                updated_at = NOW()
+            WHERE id = %s AND user_id = %s
+        """,
+            (
+                lots_to_decimal(data["new_quantity"]),
+                lots_to_decimal(data["new_quantity"]),
+                data["order_id"],
+                data["user_id"],
+            ),
+        )
+
+    elif event_type == AMEND:
+        # Releasing and reserving can touch two balances: lock them in order
+        old_asset, _ = get_order_reservation(data["side"], data["symbol"], 0, 0)
+        new_asset, _ = get_order_reservation(data["new_side"], data["new_symbol"], 0, 0)
+        lock_balances(cursor, [(data["user_id"], old_asset), (data["user_id"], new_asset)])
+        if data["old_unfilled"] > 0:
+            release_balance_for_order(
+                cursor, data["user_id"], data["side"], data["symbol"], data["old_unfilled"], data["price"]
+            )
+        if data["new_unfilled"] > 0:
+            reserve_balance_for_order(
+                cursor,
+                data["user_id"],
+                data["new_side"],
+                data["new_symbol"],
+                data["new_unfilled"],
+                data["new_price"],
+            )
+        _rewrite_amended(cursor, data)
+
+
+def _rewrite_amended(cursor, data):
+    """Write an AMEND event's new terms to its order row"""
+    cursor.execute(
+        """
+        UPDATE orders
+        SET symbol = %s, side = %s, price = %s, quantity = %s, updated_at = NOW()
+        WHERE id = %s AND user_id = %s
+    """,
+        (
+            data["new_symbol"],
+            data["new_side"],
+            ticks_to_decimal(data["new_price"]),
+            lots_to_decimal(data["new_quantity"]),
+            data["order_id"],
+            data["user_id"],
+        ),
+    )
+
+
+def _replay_amend(cursor, data):
+    """
+    Replay a journaled AMEND that is not in place. It was validated when it
+    was journaled, but commands on other symbols may have spent the balance
+    since, so the new reservation is only made if it is still available.
+    Otherwise the order is cancelled instead, and the CANCEL to journal for
+    it is returned (None if the amend applied).
+    """
+    old_asset, _ = get_order_reservation(data["side"], data["symbol"], 0, 0)
+    new_asset, _ = get_order_reservation(data["new_side"], data["new_symbol"], 0, 0)
+    lock_balances(cursor, [(data["user_id"], old_asset), (data["user_id"], new_asset)])
+    if data["old_unfilled"] > 0:
+        release_balance_for_order(
+            cursor, data["user_id"], data["side"], data["symbol"], data["old_unfilled"], data["price"]
+        )
+
+    if data["new_unfilled"] > 0:
+        asset, amount = get_order_reservation(
+            data["new_side"], data["new_symbol"], data["new_unfilled"], data["new_price"]
+        )
+        if not adjust_balance(cursor, data["user_id"], asset, -amount, amount):
+            logging.warning(
+                f"Replayed amend of order {data['order_id']} could not reserve {asset}, cancelling the order"
+            )
+            cursor.execute(
+                "UPDATE orders SET status = 'CANCELLED', updated_at = NOW() WHERE id = %s AND user_id = %s",
+                (data["order_id"], data["user_id"]),
+            )
+            # Journaled on the symbol the order moved to; nothing is reserved
+            # for it any more, so replaying this CANCEL only sets the status
+            return {
+                "order_id": data["order_id"],
+                "user_id": data["user_id"],
+                "symbol": data["new_symbol"],
+                "side": data["new_side"],
+                "price": data["new_price"],
+                "remaining": 0,
+            }
+
+    _rewrite_amended(cursor, data)
+    return None
+
+
+def replay_journal(cursor, symbol=None):
+    """
+    Apply journaled events MySQL has not seen yet, for one symbol or all of
+    them. ORDER_ACCEPTED needs no replay (the route inserts the row before
+    the order is submitted); consecutive fills of one taker are persisted
+    together, as they were when first matched.
+
+    Returns the CANCEL events of amends that could no longer be applied (to
+    journal once this transaction is committed) and the other symbols
+    replayed amends moved orders to.
+    """
+    cursor.execute("SELECT symbol, seq FROM journal_checkpoints")
+    checkpoints = {row["symbol"]: row["seq"] for row in cursor.fetchall()}
+
+    # One symbol starts reading at its checkpoint's segment; all symbols read
+    # every segment still kept (see synced_seq)
+    after_seq = checkpoints.get(symbol, 0) if symbol is not None else 0
+
+    replayed = {}
+    fills = []
+    cancels = []
+    moved_to = set()
+    for seq, event_type, data in journal.replay(after_seq):
+        if symbol is not None and data["symbol"] != symbol:
+            continue
+        if seq <= checkpoints.get(data["symbol"], 0):
+            continue
+
+        if fills and (event_type != FILL or data["taker_id"] != fills[-1].taker_id):
+            persist_fills(cursor, fills)
+            fills = []
+
+        if event_type == FILL:
+            fills.append(Fill(**data))
+        elif event_type in (CANCEL, AMEND):
+            try:
+                if event_type == AMEND and not data.get("in_place"):
+                    cancel = _replay_amend(cursor, data)
+                    if cancel is not None:
+                        cancels.append(cancel)
+                    elif data["new_symbol"] != data["symbol"]:
+                        moved_to.add(data["new_symbol"])
+                else:
+                    _apply_event(cursor, event_type, data)
+            except ValueError as e:
+                # e.g. a balance row gone since; one bad event must not block
+                # startup or the symbol
+                logging.error(f"Could not replay {event_type} event {seq}, skipped: {e}")
+        replayed[data["symbol"]] = seq
+
+    persist_fills(cursor, fills)
+    for replayed_symbol, seq in replayed.items():
+        _checkpoint(cursor, replayed_symbol, seq)
+        logging.info(f"Replayed journal for {replayed_symbol} up to seq {seq}")
+    return cancels, moved_to
+
+
+@retry_on_deadlock
+def _replay_transaction(symbol):
+    with get_db_connection() as db:
+        cursor = db.cursor(dictionary=True)
+        try:
+            result = replay_journal(cursor, symbol)
+            db.commit()
+            return result
+        finally:
+            cursor.close()
+
+
+def _replay(symbol=None):
+    """Replay missed journal events (all symbols or one) in one transaction"""
+    cancels, moved_to = _replay_transaction(symbol)
+
+    # Already applied to MySQL: journaled without marking anything unsynced.
+    # After the commit, so a retried transaction cannot leave a stray CANCEL
+    if cancels:
+        for cancel in cancels:
+            seq = journal.append(CANCEL, cancel)
+        journal.wait_durable(seq)
+
+    # Books that may now miss orders (or still hold cancelled ones) reload
+    for other in moved_to | {cancel["symbol"] for cancel in cancels}:
+        if other != symbol:
+            matching_engine.invalidate(other)
+
+
+def recover():
+    """Replay every journaled event MySQL missed; called once at startup"""
+    _replay()
+
+
+
+def _catch_up(symbol):
+    """Replay a symbol's missed events before running another command on it"""
+    if symbol not in behind:
+        return
+
+    _replay(symbol)
+    behind.discard(symbol)
+    _synced(symbol)
+
+
+@retry_on_deadlock
+def _write_fills(symbol, seq, fills):
+    with get_db_connection() as db:
+        cursor = db.cursor(dictionary=True)
+        try:
+            persist_fills(cursor, fills)
+            _checkpoint(cursor, symbol, seq, statements.prepared(db))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+def _persist_fills(symbol, seq, fills):
+    """
+    Deferred half of a SUBMIT: write its fills to MySQL. Lock contention is
+    retried; if it still fails the fills stay in the journal and are replayed
+    before the symbol's next command, never dropped.
+    """
+    try:
+        _write_fills(symbol, seq, fills)
+    except Exception as e:
+        _fell_behind(symbol, e)
+        raise
+    _synced(symbol)
+
+
+def _open_book(symbol):
+    """
+    Load a symbol's book if it is not in memory; returns it. A reloaded book
+    can be crossed by orders whose SUBMIT never ran (it failed or timed out,
+    or a replayed amend moved them): they are matched here, oldest first,
+    and their fills journaled and written like those of any SUBMIT.
+    """
+    book = matching_engine.books.get(symbol)
+    if book is not None:
+        return book
+
+    with get_db_connection() as db:
+        cursor = db.cursor(dictionary=True)
+        try:
+            book = matching_engine.get_book(cursor, symbol)
+        finally:
+            cursor.close()
+    if not book.crossed():
+        return book
+
+    fills = book.rematch()
+    if not fills:
+        # Only orders of the same user overlap
+        return book
+    try:
+        seq = _journal(symbol, [(FILL, fill._asdict()) for fill in fills])
+    except Exception:
+        matching_engine.invalidate(symbol)
+        raise
+    logging.warning(f"Matched {len(fills)} fills in the crossed {symbol} book")
+    _book_changed(symbol)
+    _persist_fills(symbol, seq, fills)
+    return book
+
+
+def load_book(symbol):
+    """LOAD: bring a symbol's book into memory on its owner worker; returns the book"""
+    _catch_up(symbol)
+    return _open_book(symbol)
+
+
+def find_book(symbol):
+    """
+    The in-memory book of a symbol, loaded on its owner worker if needed;
+    None when the symbol has no resting orders and no book, so probing made-up
+    symbols starts no worker and keeps no state
+    """
+    book = matching_engine.books.get(symbol)
+    if book is not None:
+        return book
+
+    with get_db_connection() as db:
+        cursor = db.cursor()
+        try:
+            cursor.execute(
+                "SELECT 1 FROM orders WHERE symbol = %s AND status IN ('PENDING', 'PARTIAL') LIMIT 1",
+                (symbol,),
+            )
+            if cursor.fetchone() is None:
+                return None
+        finally:
+            cursor.close()
+
+    # Loaded by the symbol's owner so it cannot race a match
+    return sequencer.execute(symbol, LOAD, load_book, symbol)
+
+
+def submit_orders(order_ids, symbol):
+    """
+    SUBMIT: match newly placed (or amended) orders against the book, in order.
+    Acknowledged with the number of fills once the orders and their fills
+    are in the journal; all the fills are written to MySQL afterwards, in
+    one transaction.
+    """
+    _catch_up(symbol)
+    _open_book(symbol)
+
+    events = []
+    fills = []
+    try:
+        with get_db_connection() as db:
+            cursor = db.cursor(dictionary=True)
+            try:
+                for order_id in order_ids:
+                    row, order_fills = match_orders(cursor, order_id, statements.prepared(db))
+                    if row is None:
+                        continue
+                    accepted = {
+                        "id": row["id"],
+                        "user_id": row["user_id"],
+                        "symbol": row["symbol"],
+                        "side": row["side"],
+                        "price": to_ticks(row["price"]),
+                        "quantity": to_lots(row["quantity"]),
+                        "filled_quantity": to_lots(row["filled_quantity"] or 0),
+                    }
+                    events.append((ORDER_ACCEPTED, accepted))
+                    events.extend((FILL, fill._asdict()) for fill in order_fills)
+                    fills.extend(order_fills)
+            finally:
+                cursor.close()
+
+        if not events:
+            return 0
+        seq = _journal(symbol, events)
+    except Exception:
+        # The book is ahead of everything durable; rebuild it from MySQL
+        matching_engine.invalidate(symbol)
+        raise
+
+    _book_changed(symbol)
+    logging.info(f"Order matching completed for orders {order_ids}")
+    if not fills:
+        # ORDER_ACCEPTED only: the routes inserted the rows beforehand
+        _synced(symbol)
+        return 0
+    return Acknowledge(len(fills), lambda: _persist_fills(symbol, seq, fills))
+
+
+def submit_order(order_id, symbol):
+    """SUBMIT for a single order"""
+    return submit_orders([order_id], symbol)
+
+
+def _commit_journaled(symbol, events, db, cursor):
+    """
+    Journal events already applied inside the open transaction, then commit.
+    Once journaled the command has happened: if the commit fails, MySQL is
+    caught up from the journal instead (right away if possible, else before
+    the symbol's next command) and the command still succeeds. Returns
+    whether MySQL holds the events yet.
+    """
+    seq = _journal(symbol, events)
+    try:
+        _checkpoint(cursor, symbol, seq)
+        db.commit()
+    except Exception as e:
+        try:
+            # Let go of the row locks the replay needs
+            db.rollback()
+        except Exception:
+            pass
+        _fell_behind(symbol, e)
+        try:
+            _catch_up(symbol)
+        except Exception as catch_up_error:
+            logging.error(f"Could not catch {symbol} up yet, retrying before its next command: {catch_up_error}")
+            return False
+        return True
+    _synced(symbol)
+    return True
+
+
+def _run_journaled(symbol, event_type, data, db, cursor):
+    """Apply an event inside the open transaction, journal it, then commit"""
+    _apply_event(cursor, event_type, data)
+    return _commit_journaled(symbol, [(event_type, data)], db, cursor)
+
+
+def cancel_order(order_id, user_id, symbol):
+    """CANCEL: release the unfilled reservation and take the order off the book"""
+    _catch_up(symbol)
+
+    with get_db_connection() as db:
+        cursor = db.cursor(dictionary=True)
+        try:
+            order = _load_open_order(cursor, order_id, user_id, symbol, "delete")
+
+            # Calculate remaining unfilled quantity to release
+            filled_quantity = to_lots(order.get("filled_quantity") or 0)
+            event = {
+                "order_id": order_id,
+                "user_id": user_id,
+                "symbol": symbol,
+                "side": order["side"],
+                "price": to_ticks(order["price"]),
+                "remaining": to_lots(order["quantity"]) - filled_quantity,
+            }
+
+            try:
+                _run_journaled(symbol, CANCEL, event, db, cursor)
+            except ValueError as e:
+                raise OrderCommandError(str(e), 500)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    # Take the order out of the in-memory book
+    matching_engine.cancel(symbol, order_id)
+    _book_changed(symbol)
+
+
+def cancel_orders(user_id, symbol, side=None):
+    """
+    CANCEL every open order of a user on this symbol (optionally one side only).
+    All orders are marked CANCELLED with one UPDATE and the reservations are
+    released with one aggregated balance upsert. Returns how many were cancelled.
+    """
+    _catch_up(symbol)
+
+    with get_db_connection() as db:
+        cursor = db.cursor(dictionary=True)
+        try:
+            sql = """
+                SELECT id, side, price, quantity, filled_quantity FROM orders
+                WHERE user_id = %s AND symbol = %s AND status IN ('PENDING', 'PARTIAL')
+            """
+            params = [user_id, symbol]
+            if side:
+                sql += " AND side = %s"
+                params.append(side)
+            cursor.execute(sql, params)
+            orders = cursor.fetchall()
+            if not orders:
+                return 0
+
+            events = []
+            deltas = BalanceDeltas()
+            for order in orders:
+                event = {
+                    "order_id": order["id"],
+                    "user_id": user_id,
+                    "symbol": symbol,
+                    "side": order["side"],
+                    "price": to_ticks(order["price"]),
+                    "remaining": to_lots(order["quantity"]) - to_lots(order["filled_quantity"] or 0),
+                }
+                events.append((CANCEL, event))
+                if event["remaining"] > 0:
+                    asset, amount = get_order_reservation(
+                        event["side"], symbol, event["remaining"], event["price"]
+                    )
+                    deltas.add(user_id, asset, available=amount, reserved=-amount)
+
+            deltas.apply(cursor)
+            cursor.execute(
+                f"""UPDATE orders SET status = 'CANCELLED', updated_at = NOW()
+                    WHERE id IN ({", ".join(["%s"] * len(orders))})""",
+                [order["id"] for order in orders],
+            )
+            _commit_journaled(symbol, events, db, cursor)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    # Take the orders out of the in-memory book
+    for order in orders:
+        matching_engine.cancel(symbol, order["id"])
+    _book_changed(symbol)
+    return len(orders)
+
+
+def _crosses_book(cursor, symbol, side, price):
+    """Whether an order at this price could trade against the current book"""
+    book = matching_engine.get_book(cursor, symbol)
+    if side == "BUY":
+        best_ask = book.best_price("SELL")
+        return best_ask is not None and price >= best_ask
+    best_bid = book.best_price("BUY")
+    return best_bid is not None and price <= best_bid
+
+
+def amend_order(order_id, user_id, symbol, new_symbol, new_side, new_price, new_quantity):
+    """
+    AMEND: rewrite an order and adjust its reservation.
+
+    Prices are in ticks and quantities in lots (see fixed_point).
+    A quantity-only reduction is done in place: one statement releases the
+    reservation delta and the order keeps its time priority. Any other change
+    swaps the whole reservation and moves the order to the back of its new
+    level. Returns True when the amended order may now cross and has to be
+    re-submitted on `new_symbol`'s sequencer.
+    """
+    _catch_up(symbol)
+    _open_book(symbol)
+
+    with get_db_connection() as db:
+        cursor = db.cursor(dictionary=True)
+        try:
+            order = _load_open_order(cursor, order_id, user_id, symbol, "update")
+
+            filled_quantity = to_lots(order.get("filled_quantity") or 0)
+
+            # For partial orders, new quantity must be at least filled_quantity
+            if order["status"] == "PARTIAL" and new_quantity < filled_quantity:
+                filled = lots_to_decimal(filled_quantity).normalize()
+                raise OrderCommandError(
+                    f"Cannot reduce quantity below filled amount. Already filled: {filled:f}, Minimum new quantity: {filled:f}"
+                )
+
+            old_unfilled = to_lots(order["quantity"]) - filled_quantity
+            in_place = (
+                new_symbol == symbol
+                and new_side == order["side"]
+                and new_price == to_ticks(order["price"])
+                and new_quantity <= to_lots(order["quantity"])
+            )
+
+            if in_place:
+                event = {
+                    "order_id": order_id,
+                    "user_id": user_id,
+                    "symbol": symbol,
+                    "side": order["side"],
+                    "price": new_price,
+                    "new_quantity": new_quantity,
+                    "released": old_unfilled - max(0, new_quantity - filled_quantity),
+                    "in_place": True,
+                }
+                _run_journaled(symbol, AMEND, event, db, cursor)
+                needs_match = False
+            else:
+                event = {
+                    "order_id": order_id,
+                    "user_id": user_id,
+                    "symbol": symbol,
+                    "side": order["side"],
+                    "price": to_ticks(order["price"]),
+                    "old_unfilled": old_unfilled,
+                    "new_symbol": new_symbol,
+                    "new_side": new_side,
+                    "new_price": new_price,
+                    "new_quantity": new_quantity,
+                    "new_unfilled": new_quantity - filled_quantity,
+                }
+                try:
+                    _apply_event(cursor, AMEND, event)
+                except ValueError as e:
+                    # Insufficient balance for the new reservation
+                    raise OrderCommandError(str(e))
+
+                events = [(AMEND, event)]
+                needs_match = new_symbol != symbol or _crosses_book(cursor, symbol, new_side, new_price)
+                if not needs_match and new_quantity > filled_quantity:
+                    # Nothing to match: rest it right here instead of a re-submit
+                    resting = RestingOrder(
+                        order_id, user_id, symbol, new_side, new_price, new_quantity, filled_quantity
+                    )
+                    events.append((ORDER_ACCEPTED, {slot: getattr(resting, slot) for slot in RestingOrder.__slots__}))
+                if not _commit_journaled(symbol, events, db, cursor):
+                    # The order row still has its old terms: it reaches its
+                    # new book once the symbol has caught up (see _replay)
+                    needs_match = False
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    book = matching_engine.books.get(symbol)
+    if in_place:
+        if book is not None:
+            book.resize(order_id, new_quantity)
+        _book_changed(symbol)
+        return False
+
+    # Pull the old version out of the in-memory book; it comes back either
+    # at the back of its new level here or through the re-submit
+    matching_engine.cancel(symbol, order_id)
+    if not needs_match and new_quantity > filled_quantity and book is not None:
+        book.add(resting)
+    _book_changed(symbol)
+    return needs_match
@@ -0,0 +1,380 @@
+"""
+In-memory price-time-priority order book.
+
+Each symbol keeps its resting orders in sorted price levels, and every level
+holds a FIFO queue of orders. Matching walks the opposite side from the best
+price outwards, so the cost of a match depends on the number of fills rather
+than on the depth of the book. The database stays the persistence target:
+books are loaded from the resting rows of the `orders` table the first time a
+symbol is touched and are kept in sync by the order routes afterwards.
+
+Alongside the queues every book keeps the total remaining quantity of each
+price level, updated as orders rest, fill and leave, so aggregated (L2) depth
+is read off the top levels without walking the orders. The levels changed
+since the last `take_changes` are tracked too, for incremental updates.
+"""
+
+from bisect import bisect_left, insort
+from collections import deque, namedtuple
+import logging
+import threading
+
+from fixed_point import to_lots, to_ticks
+import statements
+
+
+# A single execution between an incoming (taker) order and a resting (maker) order,
+# quantity in lots and prices in ticks
+Fill = namedtuple(
+    "Fill",
+    [
+        "symbol",
+        "taker_id",
+        "taker_user_id",
+        "taker_side",
+        "taker_price",
+        "maker_id",
+        "maker_user_id",
+        "quantity",
+        "price",
+    ],
+)
+
+
+class RestingOrder:
+    """
+    An order (or the unfilled part of one) sitting in the book.
+    Prices are int ticks and quantities int lots (see fixed_point.py).
+    """
+
+    __slots__ = ("id", "user_id", "symbol", "side", "price", "quantity", "filled_quantity")
+
+    def __init__(self, id, user_id, symbol, side, price, quantity, filled_quantity=0):
+        self.id = id
+        self.user_id = user_id
+        self.symbol = symbol
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+        self.filled_quantity = filled_quantity
+
+    @classmethod
+    def from_row(cls, row):
+        """Build a resting order from an `orders` row"""
+        return cls(
+            row["id"],
+            row["user_id"],
+            row["symbol"],
+            row["side"],
+            to_ticks(row["price"]),
+            to_lots(row["quantity"]),
+            to_lots(row["filled_quantity"] or 0),
+        )
+
+    @property
+    def remaining(self):
+        return self.quantity - self.filled_quantity
+
+
+class OrderBook:
+    """Resting orders for one symbol, bids and asks kept in price-time priority"""
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        # price -> deque of RestingOrder, plus a sorted list of the prices
+        self.levels = {"BUY": {}, "SELL": {}}
+        self.prices = {"BUY": [], "SELL": []}
+        # price -> total remaining lots resting at that price
+        self.sizes = {"BUY": {}, "SELL": {}}
+        self.orders = {}
+        # (side, price) of the levels changed since the last take_changes;
+        # marked after the level is updated, drained by another thread
+        self.changed = set()
+        self.changed_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.orders)
+
+    def __contains__(self, order_id):
+        return order_id in self.orders
+
+    def get(self, order_id):
+        return self.orders.get(order_id)
+
+    def add(self, order):
+        """Append an order to the back of the queue at its price level"""
+        levels = self.levels[order.side]
+        queue = levels.get(order.price)
+        if queue is None:
+            queue = levels[order.price] = deque()
+            self.sizes[order.side][order.price] = 0
+            insort(self.prices[order.side], order.price)
+        queue.append(order)
+        self.sizes[order.side][order.price] += order.remaining
+        self.orders[order.id] = order
+        self._mark(order.side, order.price)
+
+    def remove(self, order_id):
+        """Take an order out of the book, returning it (or None if not resting)"""
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return None
+
+        queue = self.levels[order.side][order.price]
+        queue.remove(order)
+        if queue:
+            self.sizes[order.side][order.price] -= order.remaining
+        else:
+            self._drop_level(order.side, order.price)
+        self._mark(order.side, order.price)
+        return order
+
+    def resize(self, order_id, quantity):
+        """
+        Change a resting order's quantity in place, keeping its time priority;
+        an order left with nothing to fill is removed. Returns the order or None.
+        """
+        order = self.orders.get(order_id)
+        if order is None:
+            return None
+
+        self.sizes[order.side][order.price] -= order.remaining
+        order.quantity = quantity
+        self.sizes[order.side][order.price] += order.remaining
+        self._mark(order.side, order.price)
+        if order.remaining <= 0:
+            self.remove(order_id)
+        return order
+
+    def fill(self, order_id, quantity):
+        """Apply an execution to a resting order, removing it once filled"""
+        order = self.orders.get(order_id)
+        if order is None:
+            return None
+
+        order.filled_quantity += quantity
+        self.sizes[order.side][order.price] -= quantity
+        self._mark(order.side, order.price)
+        if order.remaining <= 0:
+            self.remove(order_id)
+        return order
+
+    def _drop_level(self, side, price):
+        # Prices first: readers walk the price list, then look levels up
+        prices = self.prices[side]
+        del prices[bisect_left(prices, price)]
+        del self.levels[side][price]
+        del self.sizes[side][price]
+
+    def _mark(self, side, price):
+        with self.changed_lock:
+            self.changed.add((side, price))
+
+    def take_changes(self):
+        """
+        The levels changed since the previous call, as (side, price, remaining
+        lots, order count); a level that emptied has size and count 0.
+        """
+        with self.changed_lock:
+            changed, self.changed = self.changed, set()
+
+        changes = []
+        for side, price in sorted(changed):
+            queue = self.levels[side].get(price)
+            changes.append((side, price, self.sizes[side].get(price, 0) if queue else 0, len(queue or ())))
+        return changes
+
+    def best_price(self, side):
+        """Best resting price on a side (highest bid / lowest ask), or None"""
+        prices = self.prices[side]
+        if not prices:
+            return None
+        return prices[-1] if side == "BUY" else prices[0]
+
+    def crossed(self):
+        """Whether the best bid reaches the best ask, i.e. resting orders could trade"""
+        best_bid, best_ask = self.best_price("BUY"), self.best_price("SELL")
+        return best_bid is not None and best_ask is not None and best_bid >= best_ask
+
+    def rematch(self):
+        """
+        Match the resting orders against each other again, each one as the
+        taker against those added before it, as if they arrived in the order
+        they were added. For a book loaded with orders that were never
+        matched; returns the fills.
+        """
+        orders = list(self.orders.values())
+        for order in orders:
+            self.remove(order.id)
+
+        fills = []
+        for order in orders:
+            fills.extend(self.match(order))
+            if order.remaining > 0:
+                self.add(order)
+        return fills
+
+    def depth(self, levels=None):
+        """
+        Aggregated depth: the best `levels` price levels of each side (all of
+        them if None), best first, as (price, remaining lots, order count).
+
+        May be called off the owner worker. Its reads never block matching;
+        a level that empties while they run is skipped.
+        """
+        depth = {}
+        for side in ("BUY", "SELL"):
+            prices = self.prices[side]
+            if levels is not None:
+                prices = prices[-levels:][::-1] if side == "BUY" else prices[:levels]
+            else:
+                prices = prices[::-1] if side == "BUY" else list(prices)
+
+            rows = []
+            for price in prices:
+                queue = self.levels[side].get(price)
+                size = self.sizes[side].get(price)
+                if queue and size:
+                    rows.append((price, size, len(queue)))
+            depth[side] = rows
+        return depth
+
+    def _crosses(self, side, limit, price):
+        """Whether a resting price on the opposite side is marketable for `limit`"""
+        return price <= limit if side == "BUY" else price >= limit
+
+    def match(self, order):
+        """
+        Match an incoming order against the opposite side of the book.
+        Fills are applied to both orders in memory and returned in execution
+        order. Fully filled makers are removed from the book; the incoming
+        order is NOT rested here, see `MatchingEngine.submit`.
+        """
+        fills = []
+        opposite = "SELL" if order.side == "BUY" else "BUY"
+        levels = self.levels[opposite]
+        prices = self.prices[opposite]
+
+        # Best asks are at the front of the sorted list, best bids at the back
+        i = 0
+        while order.remaining > 0 and i < len(prices):
+            price = prices[i] if opposite == "SELL" else prices[-1 - i]
+            if not self._crosses(order.side, order.price, price):
+                break
+
+            queue = levels[price]
+            j = 0
+            while order.remaining > 0 and j < len(queue):
+                maker = queue[j]
+                # Never trade against our own resting orders
+                if maker.user_id == order.user_id:
+                    j += 1
+                    continue
+
+                trade_quantity = min(order.remaining, maker.remaining)
+                order.filled_quantity += trade_quantity
+                maker.filled_quantity += trade_quantity
+                self.sizes[opposite][price] -= trade_quantity
+
+                fills.append(
+                    Fill(
+                        symbol=self.symbol,
+                        taker_id=order.id,
+                        taker_user_id=order.user_id,
+                        taker_side=order.side,
+                        taker_price=order.price,
+                        maker_id=maker.id,
+                        maker_user_id=maker.user_id,
+                        quantity=trade_quantity,
+                        # Trades execute at the resting order's price
+                        price=maker.price,
+                    )
+                )
+
+                if maker.remaining <= 0:
+                    del queue[j]
+                    del self.orders[maker.id]
+                else:
+                    j += 1
+
+            if queue:
+                # Only our own orders (or nothing we could fill) left here
+                i += 1
+            else:
+                self._drop_level(opposite, price)
+            self._mark(opposite, price)
+
+        return fills
+
+
+class MatchingEngine:
+    """
+    Registry of per-symbol order books, loaded lazily from the database.
+    Each book is owned by a single sequencer worker (see sequencer.py), so
+    only the registry itself is locked; matching on a book is not.
+    """
+
+    def __init__(self):
+        self.books = {}
+        self.lock = threading.Lock()
+
+    def load_book(self, cursor, symbol):
+        """Build a symbol's book from its resting rows in the `orders` table"""
+        # Sorted here rather than by MySQL, so the read is a plain range of
+        # the (symbol, side, status, ...) index
+        cursor.execute(statements.QUERIES["load_book"], (symbol,))
+        book = OrderBook(symbol)
+        for row in sorted(cursor.fetchall(), key=lambda row: (row["created_at"], row["id"])):
+            order = RestingOrder.from_row(row)
+            if order.remaining > 0:
+                book.add(order)
+
+        logging.info(f"Loaded {symbol} order book with {len(book)} resting orders")
+        return book
+
+    def get_book(self, cursor, symbol):
+        """Return the book for a symbol, loading it on first use"""
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.load_book(cursor, symbol)
+            with self.lock:
+                book = self.books.setdefault(symbol, book)
+        return book
+
+    def install(self, book):
+        """Register a book rebuilt elsewhere (e.g. from a snapshot)"""
+        with self.lock:
+            self.books[book.symbol] = book
+
+    def submit(self, cursor, order):
+        """
+        Match an order and rest whatever is left of it.
+        Returns the list of fills produced.
+        """
+        book = self.get_book(cursor, order.symbol)
+        # An order being re-matched (e.g. after an update) must not match itself
+        book.remove(order.id)
+        fills = book.match(order)
+        if order.remaining > 0:
+            book.add(order)
+        return fills
+
+    def cancel(self, symbol, order_id):
+        """Remove an order from its book; returns the removed order or None"""
+        book = self.books.get(symbol)
+        if book is None:
+            return None
+        return book.remove(order_id)
+
+    def invalidate(self, symbol):
+        """
+        Drop a symbol's book so it is reloaded from the database on next use.
+        Called whenever a database transaction touching the book is rolled back.
+        """
+        with self.lock:
+            if self.books.pop(symbol, None) is not None:
+                logging.warning(f"Invalidated in-memory order book for {symbol}")
+
+
+# Global instance
+matching_engine = MatchingEngine()
@@ -7,6 +7,8 @@ from .auth_routes import auth_bp
 from .order_routes import order_bp
 from .user_routes import user_bp
 from .transaction_routes import transaction_bp
+from .metrics_routes import metrics_bp
+from .orderbook_routes import orderbook_bp
 
 def register_routes(app):
     """Register all route blueprints with the Flask app."""
@@ -14,3 +16,5 @@ def register_routes(app):
     app.register_blueprint(order_bp, url_prefix='/api')
     app.register_blueprint(user_bp, url_prefix='/api')
     app.register_blueprint(transaction_bp, url_prefix='/api')
+    app.register_blueprint(metrics_bp, url_prefix='/api')
+    app.register_blueprint(orderbook_bp, url_prefix='/api')
@@ -0,0 +1,19 @@
+"""
+Operational metrics routes, used to size the backend's resources.
+"""
+
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required
+from db_pool import connection_pool, replica_pool
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route("/metrics/db-pool", methods=["GET"])
+@jwt_required()
+def get_db_pool_metrics():
+    """Get connection pool usage and checkout wait/latency percentiles."""
+    pools = [connection_pool.stats()]
+    if replica_pool is not None:
+        pools.append(replica_pool.stats())
+    return jsonify({"success": True, "pools": pools})
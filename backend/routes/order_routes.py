@@ -3,49 +3,201 @@ Order-related routes for creating, reading, updating, and deleting orders.
 """
 
 from flask import Blueprint, Response, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from db_pool import get_db_connection
+from flask_jwt_extended import jwt_required
+from db_pool import get_db_connection, get_read_connection, retry_on_deadlock
 import mysql.connector
 import logging
+import os
+
+from fixed_point import lots_to_decimal, ticks_to_decimal, to_lots, to_ticks
+
+from archiver import ORDER_COLUMNS
 
 # Import helper functions
 from helpers import (
     get_user_id_int,
+    keyset_condition,
+    next_page,
+    parse_page_args,
     reserve_balance_for_order,
-    release_balance_for_order,
-    match_orders,
+    reserve_balance_for_orders,
 )
-
-# Import WebSocket manager for broadcasting updates
-from websocket_manager import ws_manager
+from order_commands import (
+    OrderCommandError,
+    submit_order,
+    submit_orders,
+    cancel_order,
+    cancel_orders,
+    amend_order,
+)
+from sequencer import sequencer, SUBMIT, CANCEL, AMEND, COMMAND_TIMEOUT
+import statements
 
 order_bp = Blueprint('orders', __name__)
 
+# Maximum number of orders accepted by one POST /orders/batch
+MAX_BATCH_ORDERS = int(os.getenv("MAX_BATCH_ORDERS", 50))
+
+# Default page size of GET /user/orders
+USER_ORDERS_PAGE_SIZE = 50
+
+
+def normalize_symbol(symbol):
+    """Symbols are stored and matched upper-case, whatever the client sent."""
+    return str(symbol).upper()
+
+
+def parse_new_order(data):
+    """
+    Validate a new order payload; returns (symbol, side, quantity, price) with
+    the quantity in lots and the price in ticks, or raises ValueError.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Order must be a JSON object")
+
+    # Validate required fields
+    required_fields = ["symbol", "side", "quantity"]
+    for field in required_fields:
+        if field not in data:
+            raise ValueError(f"Missing required field: {field}")
+
+    # Get and validate data
+    symbol = normalize_symbol(data["symbol"])
+    side = str(data["side"]).upper()
+    quantity = to_lots(data["quantity"])
+    price = to_ticks(data.get("price", 0))
+    order_type = data.get("order_type", "LIMIT")
+
+    # Validate values
+    if quantity <= 0:
+        raise ValueError("Quantity must be greater than 0")
+    if order_type != "MARKET" and price <= 0:
+        raise ValueError("Price must be greater than 0 for non-market orders")
+    if side not in ["BUY", "SELL"]:
+        raise ValueError("Side must be either 'BUY' or 'SELL'")
+
+    return symbol, side, quantity, price
+
+
+def order_response(order_id, user_id, symbol, side, quantity, price):
+    """JSON body of a newly created order, converted back from lots and ticks."""
+    return {
+        "id": order_id,
+        "user_id": user_id,
+        "symbol": symbol,
+        "side": side,
+        "price": float(ticks_to_decimal(price)),
+        "quantity": float(lots_to_decimal(quantity)),
+        "status": "PENDING",
+        "filled_quantity": 0.0,
+    }
+
+
+@retry_on_deadlock
+def insert_order(user_id, symbol, side, quantity, price):
+    """Reserve balance for a new order and insert it in one transaction; returns its id."""
+    with get_db_connection() as db:
+        cursor = db.cursor(dictionary=True)
+        try:
+            prepared = statements.prepared(db)
+
+            # Reserve balance for the order (raises ValueError if insufficient)
+            reserve_balance_for_order(cursor, user_id, side, symbol, quantity, price, prepared)
+
+            # Insert order
+            result = prepared.execute(
+                "insert_order",
+                (user_id, symbol, side, ticks_to_decimal(price), lots_to_decimal(quantity)),
+            )
+
+            db.commit()
+            return result.lastrowid
+        finally:
+            cursor.close()
+
+
+@retry_on_deadlock
+def insert_orders(user_id, parsed):
+    """
+    Reserve balances for a batch of parsed orders and insert the accepted ones
+    in one transaction. Returns a list of (order, error) pairs in `parsed`
+    order and the ids of the accepted orders, in the same order.
+    """
+    with get_db_connection() as db:
+        cursor = db.cursor(dictionary=True)
+        try:
+            # Taken before the INSERT: rows other transactions commit from now
+            # on stay invisible to the id read-back below
+            db.start_transaction(consistent_snapshot=True)
+
+            # Reserve balances for every order in one pass
+            errors = reserve_balance_for_orders(
+                cursor,
+                user_id,
+                [(side, symbol, quantity, price) for _, symbol, side, quantity, price in parsed],
+            )
+            accepted = [order for order, error in zip(parsed, errors) if not error]
+
+            # Insert all accepted orders with one multi-row INSERT
+            order_ids = []
+            if accepted:
+                cursor.execute(
+                    f"""
+                    INSERT INTO orders (
+                        user_id, symbol, side, price, quantity, 
+                        status, filled_quantity, created_at, updated_at
+                    ) VALUES {", ".join(["(%s, %s, %s, %s, %s, 'PENDING', 0.0, NOW(), NOW())"] * len(accepted))}
+                """,
+                    [
+                        value
+                        for _, symbol, side, quantity, price in accepted
+                        for value in (
+                            user_id, symbol, side, ticks_to_decimal(price), lots_to_decimal(quantity)
+                        )
+                    ],
+                )
+                # lastrowid is the first row's id; the others need not follow
+                # it one by one (auto_increment_increment, lock mode), so read
+                # them back: ids grow in row order within one statement
+                cursor.execute(
+                    "SELECT id FROM orders WHERE user_id = %s AND id >= %s ORDER BY id LIMIT %s",
+                    (user_id, cursor.lastrowid, len(accepted)),
+                )
+                order_ids = [row["id"] for row in cursor.fetchall()]
+
+            db.commit()
+            return list(zip(parsed, errors)), order_ids
+        finally:
+            cursor.close()
+
+
+def get_order_symbol(order_id):
+    """Look up which symbol (and so which sequencer) an order belongs to."""
+    with get_db_connection() as db:
+        cursor = db.cursor(dictionary=True)
+        cursor.execute("SELECT symbol FROM orders WHERE id = %s", (order_id,))
+        order = cursor.fetchone()
+        cursor.close()
+    return order["symbol"] if order else None
+
 
 @order_bp.route("/orders", methods=["GET"])
 @jwt_required()
 def get_orders():
-    """Get all active orders in the orderbook."""
+    """Get all active orders in the orderbook, or only those of ?symbol=."""
     try:
         current_user_id = get_user_id_int()
+        symbol = request.args.get("symbol")
 
-        with get_db_connection() as db:
+        with get_read_connection() as db:
             cursor = db.cursor(dictionary=True)
-            cursor.execute(
-                """
-                SELECT id, user_id, symbol, side, price, quantity, status, 
-                       filled_quantity, created_at, updated_at,
-                       CASE WHEN user_id = %s THEN true ELSE false END as is_own_order
-                FROM orders 
-                WHERE status IN ('PENDING', 'PARTIAL')
-                ORDER BY 
-                    symbol ASC,
-                    CASE WHEN side = 'BUY' THEN price END DESC,
-                    CASE WHEN side = 'SELL' THEN price END ASC,
-                    created_at ASC
-            """,
-                (current_user_id,),
-            )
+            if symbol:
+                cursor.execute(
+                    statements.QUERIES["symbol_open_orders"],
+                    (current_user_id, normalize_symbol(symbol)),
+                )
+            else:
+                cursor.execute(statements.QUERIES["open_orders"], (current_user_id,))
             orders = cursor.fetchall()
             cursor.close()
 
@@ -59,26 +211,31 @@ def get_orders():
 @order_bp.route("/user/orders", methods=["GET"])
 @jwt_required()
 def get_user_orders():
-    """Get current user's orders."""
+    """
+    Get current user's orders, live and archived, newest first.
+    Paginated with ?limit= and the ?cursor= returned as next_cursor.
+    """
     try:
         user_id = get_user_id_int()
 
+        try:
+            limit, after = parse_page_args(request.args, USER_ORDERS_PAGE_SIZE)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        condition, params = keyset_condition("created_at", "id", after)
+
         with get_db_connection() as db:
             cursor = db.cursor(dictionary=True)
+            # Each table is read as one range of its (user_id, created_at)
+            # index; only the two short pages are merged
             cursor.execute(
-                """
-                SELECT id, symbol, side, price, quantity, status, 
-                       filled_quantity, created_at, updated_at
-                FROM orders 
-                WHERE user_id = %s 
-                ORDER BY created_at DESC
-            """,
-                (user_id,),
+                statements.QUERIES["user_orders"].format(condition=condition),
+                (user_id, *params, limit + 1, user_id, *params, limit + 1, limit + 1),
             )
-            orders = cursor.fetchall()
+            orders, next_cursor = next_page(cursor.fetchall(), limit, "created_at")
             cursor.close()
 
-            return jsonify({"success": True, "orders": orders})
+            return jsonify({"success": True, "orders": orders, "next_cursor": next_cursor})
 
     except mysql.connector.Error as err:
         logging.error(f"Error fetching user orders: {err}")
@@ -92,117 +249,156 @@ def create_order():
     try:
         user_id = get_user_id_int()
 
-        # Validate required fields
-        required_fields = ["symbol", "side", "quantity"]
-        for field in required_fields:
-            if field not in request.json:
-                return jsonify({"error": f"Missing required field: {field}"}), 400
-
-        # Get and validate data
-        symbol = request.json["symbol"]
-        side = request.json["side"].upper()
-        quantity = float(request.json["quantity"])
-        price = float(request.json.get("price", 0))
-        order_type = request.json.get("order_type", "LIMIT")
-
-        # Validate values
-        if quantity <= 0:
-            return jsonify({"error": "Quantity must be greater than 0"}), 400
-        if order_type != "MARKET" and price <= 0:
+        try:
+            symbol, side, quantity, price = parse_new_order(request.json)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        try:
+            order_id = insert_order(user_id, symbol, side, quantity, price)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        order = order_response(order_id, user_id, symbol, side, quantity, price)
+
+        # Match the new order on its symbol's sequencer
+        try:
+            sequencer.execute(symbol, SUBMIT, submit_order, order_id, symbol)
+        except Exception as match_error:
+            # The order is stored with its reservation but not matched yet:
+            # the SUBMIT is still queued, or the book was dropped and matches
+            # it on reload (see order_commands._open_book)
+            logging.error(f"Error during order matching: {match_error}")
             return (
                 jsonify(
-                    {"error": "Price must be greater than 0 for non-market orders"}
+                    {
+                        "success": True,
+                        "message": "Order created, matching is pending",
+                        "order": order,
+                        "match_pending": True,
+                    }
                 ),
-                400,
+                202,
             )
-        if side not in ["BUY", "SELL"]:
-            return jsonify({"error": "Side must be either 'BUY' or 'SELL'"}), 400
-
-        with get_db_connection() as db:
-            cursor = db.cursor(dictionary=True)
 
-            # Reserve balance for the order
-            try:
-                reserve_balance_for_order(
-                    cursor, user_id, side, symbol, quantity, price
-                )
-            except ValueError as e:
-                cursor.close()
-                return jsonify({"error": str(e)}), 400
+        return (
+            jsonify(
+                {
+                    "success": True,
+                    "message": "Order created successfully",
+                    "order": order,
+                    "match_pending": False,
+                }
+            ),
+            201,
+        )
 
-            # Insert order
-            cursor.execute(
-                """
-                INSERT INTO orders (
-                    user_id, symbol, side, price, quantity, 
-                    status, filled_quantity, created_at, updated_at
-                ) VALUES (%s, %s, %s, %s, %s, 'PENDING', 0.0, NOW(), NOW())
-            """,
-                (user_id, symbol, side, price, quantity),
-            )
+    except ValueError as e:
+        return jsonify({"error": "Invalid numeric value provided"}), 400
+    except mysql.connector.Error as err:
+        logging.error(f"Error creating order: {err}")
+        return jsonify({"error": "Database error"}), 500
+    except Exception as e:
+        logging.error(f"Unexpected error: {e}")
+        return jsonify({"error": "Internal server error"}), 500
 
-            db.commit()
-            order_id = cursor.lastrowid
 
-            # Attempt to match the new order
-            try:
-                match_orders(cursor, order_id, db)
-                db.commit()
-                logging.info(f"Order matching completed for order {order_id}")
-            except Exception as match_error:
-                logging.error(f"Error during order matching: {match_error}")
-                db.rollback()
-                db.commit()
+@order_bp.route("/orders/batch", methods=["POST"])
+@jwt_required()
+def create_orders_batch():
+    """Create several orders at once, e.g. a market maker refreshing its quotes."""
+    try:
+        user_id = get_user_id_int()
 
-            cursor.close()
+        if not isinstance(request.json, dict):
+            return jsonify({"error": "Request body must be a JSON object"}), 400
+        payload = request.json.get("orders")
+        if not isinstance(payload, list) or not payload:
+            return jsonify({"error": "Field 'orders' must be a non-empty list"}), 400
+        if len(payload) > MAX_BATCH_ORDERS:
+            return (
+                jsonify({"error": f"A batch can hold at most {MAX_BATCH_ORDERS} orders"}),
+                400,
+            )
 
-            # Broadcast orderbook update via WebSocket
+        # Per-order results, in request order
+        results = [None] * len(payload)
+        parsed = []
+        for index, data in enumerate(payload):
             try:
-                ws_manager.broadcast_orderbook_change()
-                logging.info("Broadcasted orderbook update after order creation")
-            except Exception as ws_error:
-                logging.error(f"WebSocket broadcast error: {ws_error}")
+                parsed.append((index,) + parse_new_order(data))
+            except ValueError as e:
+                results[index] = {"success": False, "error": str(e)}
 
-            return (
-                jsonify(
-                    {
-                        "success": True,
-                        "message": "Order created successfully",
-                        "order": {
-                            "id": order_id,
-                            "user_id": user_id,
-                            "symbol": symbol,
-                            "side": side,
-                            "price": price,
-                            "quantity": quantity,
-                            "status": "PENDING",
-                            "filled_quantity": 0.0,
-                        },
-                    }
-                ),
-                201,
-            )
+        accepted = []
+        outcomes, inserted_ids = insert_orders(user_id, parsed)
+        for order, error in outcomes:
+            if error:
+                results[order[0]] = {"success": False, "error": error}
+            else:
+                accepted.append(order)
+
+        # Match in request order, one SUBMIT per symbol
+        order_ids = {}
+        for order_id, (index, symbol, side, quantity, price) in zip(inserted_ids, accepted):
+            order_ids.setdefault(symbol, []).append(order_id)
+            results[index] = {
+                "success": True,
+                "order": order_response(order_id, user_id, symbol, side, quantity, price),
+            }
+
+        futures = {
+            symbol: sequencer.dispatch(symbol, SUBMIT, submit_orders, ids, symbol)
+            for symbol, ids in order_ids.items()
+        }
+        pending = set()
+        for symbol, future in futures.items():
+            try:
+                future.result(timeout=COMMAND_TIMEOUT)
+            except Exception as match_error:
+                logging.error(f"Error during batch order matching on {symbol}: {match_error}")
+                pending.add(symbol)
+        for index, symbol, *_ in accepted:
+            results[index]["match_pending"] = symbol in pending
+
+        message = f"{len(accepted)} of {len(payload)} orders created"
+        if pending:
+            message += f", matching is pending for {', '.join(sorted(pending))}"
+        return (
+            jsonify(
+                {
+                    "success": bool(accepted),
+                    "message": message,
+                    "results": results,
+                }
+            ),
+            (202 if pending else 201) if accepted else 400,
+        )
 
-    except ValueError as e:
-        return jsonify({"error": "Invalid numeric value provided"}), 400
     except mysql.connector.Error as err:
-        logging.error(f"Error creating order: {err}")
+        logging.error(f"Error creating batch orders: {err}")
         return jsonify({"error": "Database error"}), 500
     except Exception as e:
-        logging.error(f"Unexpected error: {e}")
+        logging.error(f"Unexpected error creating batch orders: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
 
 @order_bp.route("/orders/<int:order_id>", methods=["GET"])
 @jwt_required()
 def get_order(order_id):
-    """Get a specific order by ID."""
+    """Get a specific order by ID, whether live or archived."""
     try:
         with get_db_connection() as db:
             cursor = db.cursor(dictionary=True)
             sql = "SELECT * FROM orders WHERE id = %s"
             cursor.execute(sql, (order_id,))
             order = cursor.fetchone()
+            if not order:
+                cursor.execute(
+                    f"SELECT {ORDER_COLUMNS} FROM orders_history WHERE id = %s",
+                    (order_id,),
+                )
+                order = cursor.fetchone()
             cursor.close()
 
         if order:
@@ -221,82 +417,116 @@ def delete_order(order_id):
     try:
         user_id = get_user_id_int()
 
-        with get_db_connection() as db:
-            cursor = db.cursor(dictionary=True)
+        symbol = get_order_symbol(order_id)
+        if symbol is None:
+            return jsonify({"error": "Order not found"}), 404
+
+        # Ownership and status are checked again by the symbol's sequencer
+        try:
+            sequencer.execute(symbol, CANCEL, cancel_order, order_id, user_id, symbol)
+        except OrderCommandError as e:
+            return jsonify({"error": e.message}), e.status_code
+
+        return (
+            jsonify(
+                {
+                    "success": True,
+                    "message": "Order cancelled and balances released successfully",
+                }
+            ),
+            200,
+        )
 
-            # Get order details
-            cursor.execute(
-                "SELECT id, user_id, status, symbol, side, quantity, price, filled_quantity FROM orders WHERE id = %s",
-                (order_id,),
-            )
-            order = cursor.fetchone()
+    except mysql.connector.Error as err:
+        logging.error(f"Error deleting order: {err}")
+        return jsonify({"error": "Database error"}), 500
+    except Exception as e:
+        logging.error(f"Unexpected error deleting order: {e}")
+        return jsonify({"error": "Internal server error"}), 500
 
-            if not order:
-                cursor.close()
-                return jsonify({"error": "Order not found"}), 404
 
-            if order["user_id"] != user_id:
-                cursor.close()
-                return jsonify({"error": "You can only delete your own orders"}), 403
+@order_bp.route("/orders", methods=["DELETE"])
+@jwt_required()
+def delete_orders():
+    """Cancel all of the current user's open orders, optionally by symbol and/or side."""
+    try:
+        user_id = get_user_id_int()
 
-            if order["status"] not in ["PENDING", "PARTIAL"]:
-                cursor.close()
-                return (
-                    jsonify(
-                        {
-                            "error": f"Cannot delete order with status '{order['status']}'. Only PENDING and PARTIAL orders can be cancelled."
-                        }
-                    ),
-                    400,
-                )
+        symbol = request.args.get("symbol")
+        if symbol:
+            symbol = normalize_symbol(symbol)
+        side = request.args.get("side")
+        if side:
+            side = side.upper()
+            if side not in ["BUY", "SELL"]:
+                return jsonify({"error": "Side must be either 'BUY' or 'SELL'"}), 400
 
-            # Calculate remaining unfilled quantity and release reserved balances
-            filled_quantity = float(order.get("filled_quantity", 0))
-            remaining_quantity = float(order["quantity"]) - filled_quantity
-
-            if remaining_quantity > 0:
-                try:
-                    release_balance_for_order(
-                        cursor,
-                        user_id,
-                        order["side"],
-                        order["symbol"],
-                        remaining_quantity,
-                        float(order["price"]),
-                    )
-                except ValueError as e:
-                    cursor.close()
-                    return jsonify({"error": str(e)}), 500
-
-            # Mark order as CANCELLED
-            cursor.execute(
-                "UPDATE orders SET status = 'CANCELLED', updated_at = NOW() WHERE id = %s AND user_id = %s",
-                (order_id, user_id),
-            )
-            db.commit()
+        # Only symbols the user has open orders on get a mass CANCEL
+        with get_db_connection() as db:
+            cursor = db.cursor()
+            sql = """
+                SELECT DISTINCT symbol FROM orders
+                WHERE user_id = %s AND status IN ('PENDING', 'PARTIAL')
+            """
+            params = [user_id]
+            if symbol:
+                sql += " AND symbol = %s"
+                params.append(symbol)
+            if side:
+                sql += " AND side = %s"
+                params.append(side)
+            cursor.execute(sql, params)
+            symbols = [row[0] for row in cursor.fetchall()]
             cursor.close()
 
-            # Broadcast orderbook update via WebSocket
+        # One mass CANCEL per symbol, run on the symbols' sequencers in parallel
+        futures = {
+            symbol: sequencer.dispatch(symbol, CANCEL, cancel_orders, user_id, symbol, side)
+            for symbol in symbols
+        }
+
+        # Symbols are cancelled independently: report each one, so orders
+        # already cancelled on some symbols are not hidden by a failed one
+        cancelled = 0
+        results = {}
+        for symbol, future in futures.items():
             try:
-                ws_manager.broadcast_orderbook_change()
-            except Exception as ws_error:
-                logging.error(f"WebSocket broadcast error: {ws_error}")
-
-            return (
-                jsonify(
-                    {
-                        "success": True,
-                        "message": "Order cancelled and balances released successfully",
-                    }
-                ),
-                200,
-            )
+                count = future.result(timeout=COMMAND_TIMEOUT)
+            except OrderCommandError as e:
+                results[symbol] = {"success": False, "error": e.message}
+                continue
+            except Exception as e:
+                logging.error(f"Error cancelling {symbol} orders of user {user_id}: {e}")
+                results[symbol] = {"success": False, "error": "Internal server error"}
+                continue
+            cancelled += count
+            results[symbol] = {"success": True, "cancelled": count}
+
+        failed = [symbol for symbol, result in results.items() if not result["success"]]
+        if not failed:
+            status_code = 200
+            message = f"{cancelled} orders cancelled and balances released successfully"
+        else:
+            status_code = 207 if len(failed) < len(results) else 500
+            message = f"{cancelled} orders cancelled; cancelling failed for {', '.join(failed)}"
+
+        return (
+            jsonify(
+                {
+                    "success": not failed,
+                    "cancelled": cancelled,
+                    "results": results,
+                    "message": message,
+                }
+            ),
+            status_code,
+        )
 
     except mysql.connector.Error as err:
-        logging.error(f"Error deleting order: {err}")
+        logging.error(f"Error cancelling orders: {err}")
         return jsonify({"error": "Database error"}), 500
     except Exception as e:
-        logging.error(f"Unexpected error deleting order: {e}")
+        logging.error(f"Unexpected error cancelling orders: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
 
@@ -305,7 +535,7 @@ def delete_order(order_id):
 def update_order(order_id):
     """Update an existing order."""
     try:
-        user_id = get_jwt_identity()
+        user_id = get_user_id_int()
 
         # Validate required fields
         required_fields = ["symbol", "side", "price", "quantity"]
@@ -314,10 +544,13 @@ def update_order(order_id):
                 return jsonify({"error": f"Missing required field: {field}"}), 400
 
         # Get new order data
-        new_symbol = request.json["symbol"]
+        new_symbol = normalize_symbol(request.json["symbol"])
         new_side = request.json["side"].upper()
-        new_price = float(request.json["price"])
-        new_quantity = float(request.json["quantity"])
+        try:
+            new_price = to_ticks(request.json["price"])
+            new_quantity = to_lots(request.json["quantity"])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
         # Validate new values
         if new_quantity <= 0:
@@ -327,110 +560,48 @@ def update_order(order_id):
         if new_side not in ["BUY", "SELL"]:
             return jsonify({"error": "Side must be either 'BUY' or 'SELL'"}), 400
 
-        with get_db_connection() as db:
-            cursor = db.cursor(dictionary=True)
+        symbol = get_order_symbol(order_id)
+        if symbol is None:
+            return jsonify({"error": "Order not found"}), 404
 
-            # Check if the order exists and belongs to the user
-            check_sql = "SELECT id, user_id, status, symbol, side, price, quantity, filled_quantity FROM orders WHERE id = %s"
-            cursor.execute(check_sql, (order_id,))
-            order = cursor.fetchone()
-
-            if not order:
-                cursor.close()
-                return jsonify({"error": "Order not found"}), 404
-
-            if int(order["user_id"]) != int(user_id):
-                cursor.close()
-                return jsonify({"error": "You can only update your own orders"}), 403
-
-            if order["status"] not in ["PENDING", "PARTIAL"]:
-                cursor.close()
-                return (
-                    jsonify(
-                        {
-                            "error": f"Cannot update order with status '{order['status']}'. Only PENDING and PARTIAL orders can be updated."
-                        }
-                    ),
-                    400,
-                )
-
-            filled_quantity = float(order.get("filled_quantity", 0))
-
-            # For partial orders, new quantity must be at least filled_quantity
-            if order["status"] == "PARTIAL" and new_quantity < filled_quantity:
-                cursor.close()
-                return (
-                    jsonify(
-                        {
-                            "error": f"Cannot reduce quantity below filled amount. Already filled: {filled_quantity}, Minimum new quantity: {filled_quantity}"
-                        }
-                    ),
-                    400,
-                )
-
-            # Release old balance reservations for unfilled portion
-            old_unfilled_quantity = float(order["quantity"]) - filled_quantity
-            if old_unfilled_quantity > 0:
-                try:
-                    release_balance_for_order(
-                        cursor,
-                        int(user_id),
-                        order["side"],
-                        order["symbol"],
-                        old_unfilled_quantity,
-                        float(order["price"]),
-                    )
-                except ValueError as e:
-                    cursor.close()
-                    return jsonify({"error": str(e)}), 500
-
-            # Reserve new balance for unfilled portion
-            new_unfilled_quantity = new_quantity - filled_quantity
-            if new_unfilled_quantity > 0:
-                try:
-                    reserve_balance_for_order(
-                        cursor, int(user_id), new_side, new_symbol, new_unfilled_quantity, new_price
-                    )
-                except ValueError as e:
-                    cursor.close()
-                    return jsonify({"error": str(e)}), 400
-
-            # Update the order
-            update_sql = """
-                UPDATE orders 
-                SET symbol = %s, side = %s, price = %s, quantity = %s, updated_at = NOW()
-                WHERE id = %s AND user_id = %s
-            """
-            cursor.execute(
-                update_sql,
-                (new_symbol, new_side, new_price, new_quantity, order_id, int(user_id)),
+        # Rewrite the order on its current symbol's sequencer...
+        try:
+            needs_match = sequencer.execute(
+                symbol, AMEND, amend_order,
+                order_id, user_id, symbol, new_symbol, new_side, new_price, new_quantity,
             )
-            db.commit()
+        except OrderCommandError as e:
+            return jsonify({"error": e.message}), e.status_code
 
-            if cursor.rowcount > 0:
-                # Try to match the updated order with existing orders
-                try:
-                    match_orders(cursor, order_id, db)
-                    db.commit()
-                    logging.info(f"Order matching completed for updated order {order_id}")
-                except Exception as match_error:
-                    logging.error(f"Error during order matching for updated order: {match_error}")
-                    db.rollback()
-                    db.commit()
-                
-                cursor.close()
+        # ...then, if it can now cross, match it on its new symbol's sequencer
+        if needs_match:
+            try:
+                sequencer.execute(new_symbol, SUBMIT, submit_order, order_id, new_symbol)
+                logging.info(f"Order matching completed for updated order {order_id}")
+            except Exception as match_error:
+                # Amended but not matched yet: matched when its book is next loaded
+                logging.error(f"Error during order matching for updated order: {match_error}")
                 return (
                     jsonify(
                         {
                             "success": True,
-                            "message": "Order updated successfully with balance adjustments",
+                            "message": "Order updated, matching is pending",
+                            "match_pending": True,
                         }
                     ),
-                    200,
+                    202,
                 )
-            else:
-                cursor.close()
-                return jsonify({"error": "Failed to update order"}), 500
+
+        return (
+            jsonify(
+                {
+                    "success": True,
+                    "message": "Order updated successfully with balance adjustments",
+                    "match_pending": False,
+                }
+            ),
+            200,
+        )
 
     except ValueError as e:
         return jsonify({"error": "Invalid numeric value provided"}), 400
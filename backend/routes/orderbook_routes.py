@@ -0,0 +1,81 @@
+"""
+Market data routes serving aggregated order book depth.
+"""
+
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required
+import mysql.connector
+import logging
+import re
+
+from db_pool import get_read_connection
+from helpers import depth_levels
+from order_commands import find_book
+import statements
+
+orderbook_bp = Blueprint('orderbook', __name__)
+
+# Price levels per side returned by default, and at most
+DEFAULT_DEPTH = 20
+MAX_DEPTH = 500
+
+SYMBOL_PATTERN = re.compile(r"^[A-Z0-9]{1,10}$")
+
+
+@orderbook_bp.route("/orderbook", methods=["GET"])
+@jwt_required()
+def get_symbols():
+    """List the symbols that have resting orders."""
+    try:
+        with get_read_connection() as db:
+            cursor = db.cursor()
+            cursor.execute(statements.QUERIES["book_symbols"])
+            symbols = [row[0] for row in cursor.fetchall()]
+            cursor.close()
+
+        return jsonify({"success": True, "symbols": symbols})
+
+    except mysql.connector.Error as err:
+        logging.error(f"Error listing order book symbols: {err}")
+        return jsonify({"error": "Database error"}), 500
+
+
+@orderbook_bp.route("/orderbook/<symbol>", methods=["GET"])
+@jwt_required()
+def get_orderbook(symbol):
+    """
+    Get a symbol's price levels (L2 depth), best first, up to ?depth= levels
+    per side. Served from the in-memory book's running level totals.
+    """
+    symbol = symbol.upper()
+    if not SYMBOL_PATTERN.match(symbol):
+        return jsonify({"error": "Invalid symbol"}), 400
+
+    try:
+        depth = int(request.args.get("depth", DEFAULT_DEPTH))
+    except ValueError:
+        return jsonify({"error": "depth must be an integer"}), 400
+    if not 1 <= depth <= MAX_DEPTH:
+        return jsonify({"error": f"depth must be between 1 and {MAX_DEPTH}"}), 400
+
+    try:
+        book = find_book(symbol)
+        if book is None:
+            return jsonify({"error": "Unknown symbol"}), 404
+        levels = book.depth(depth)
+
+        return jsonify(
+            {
+                "success": True,
+                "symbol": symbol,
+                "bids": depth_levels(levels["BUY"]),
+                "asks": depth_levels(levels["SELL"]),
+            }
+        )
+
+    except mysql.connector.Error as err:
+        logging.error(f"Error loading {symbol} order book: {err}")
+        return jsonify({"error": "Database error"}), 500
+    except Exception as e:
+        logging.error(f"Unexpected error: {e}")
+        return jsonify({"error": "Internal server error"}), 500
@@ -2,41 +2,46 @@
 Transaction-related routes for viewing transaction history.
 """
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required
-from db_pool import get_db_connection
+from db_pool import get_read_connection
 import mysql.connector
 import logging
 
 # Import helper functions
-from helpers import get_user_id_int
+from helpers import get_user_id_int, keyset_condition, next_page, parse_page_args
+import statements
 
 transaction_bp = Blueprint('transactions', __name__)
 
+# Default page size of the transaction history endpoints
+TRANSACTIONS_PAGE_SIZE = 100
+
 
 @transaction_bp.route("/transactions", methods=["GET"])
 @jwt_required()
 def get_transactions():
-    """Get all recent transactions (public transaction history)."""
+    """
+    Get recent transactions (public transaction history), newest first.
+    Paginated with ?limit= and the ?cursor= returned as next_cursor.
+    """
     try:
-        with get_db_connection() as db:
+        try:
+            limit, after = parse_page_args(request.args, TRANSACTIONS_PAGE_SIZE)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        condition, params = keyset_condition("t.executed_at", "t.id", after)
+
+        with get_read_connection() as db:
             cursor = db.cursor(dictionary=True)
             cursor.execute(
-                """
-                SELECT t.*, 
-                       bo.user_id as buyer_id,
-                       so.user_id as seller_id
-                FROM transactions t
-                LEFT JOIN orders bo ON t.buy_order_id = bo.id
-                LEFT JOIN orders so ON t.sell_order_id = so.id
-                ORDER BY t.executed_at DESC
-                LIMIT 100
-            """
+                statements.QUERIES["transactions"].format(condition=condition),
+                (*params, limit + 1),
             )
-            transactions = cursor.fetchall()
+            transactions, next_cursor = next_page(cursor.fetchall(), limit, "executed_at")
             cursor.close()
 
-            return jsonify({"success": True, "transactions": transactions})
+            return jsonify({"success": True, "transactions": transactions, "next_cursor": next_cursor})
 
     except mysql.connector.Error as err:
         logging.error(f"Error fetching transactions: {err}")
@@ -46,35 +51,31 @@ def get_transactions():
 @transaction_bp.route("/user/transactions", methods=["GET"])
 @jwt_required()
 def get_user_transactions():
-    """Get current user's transaction history."""
+    """
+    Get current user's transaction history, newest first.
+    Paginated with ?limit= and the ?cursor= returned as next_cursor.
+    """
     try:
         user_id = get_user_id_int()
 
-        with get_db_connection() as db:
+        try:
+            limit, after = parse_page_args(request.args, TRANSACTIONS_PAGE_SIZE)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        condition, params = keyset_condition("executed_at", "id", after)
+
+        with get_read_connection() as db:
             cursor = db.cursor(dictionary=True)
+            # One range read of each party index; the matching engine never
+            # trades a user against themselves, so no trade is in both
             cursor.execute(
-                """
-                SELECT t.*, 
-                       bo.user_id as buyer_id,
-                       so.user_id as seller_id,
-                       CASE 
-                           WHEN bo.user_id = %s THEN 'BUY'
-                           WHEN so.user_id = %s THEN 'SELL'
-                           ELSE 'UNKNOWN'
-                       END as user_side
-                FROM transactions t
-                LEFT JOIN orders bo ON t.buy_order_id = bo.id
-                LEFT JOIN orders so ON t.sell_order_id = so.id
-                WHERE bo.user_id = %s OR so.user_id = %s
-                ORDER BY t.executed_at DESC
-                LIMIT 100
-            """,
-                (user_id, user_id, user_id, user_id),
+                statements.QUERIES["user_transactions"].format(condition=condition),
+                (user_id, *params, limit + 1, user_id, *params, limit + 1, limit + 1),
             )
-            transactions = cursor.fetchall()
+            transactions, next_cursor = next_page(cursor.fetchall(), limit, "executed_at")
             cursor.close()
 
-            return jsonify({"success": True, "transactions": transactions})
+            return jsonify({"success": True, "transactions": transactions, "next_cursor": next_cursor})
 
     except mysql.connector.Error as err:
         logging.error(f"Error fetching user transactions: {err}")
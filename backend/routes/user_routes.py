@@ -4,6 +4,7 @@ User-related routes for balance management and user data.
 
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from balance_cache import balance_cache
 from db_pool import get_db_connection
 import mysql.connector
 import logging
@@ -101,6 +102,7 @@ def update_user_balance(asset):
                        VALUES (%s, %s, %s, %s, NOW())""",
                     (int(user_id), asset.upper(), available, reserved),
                 )
+            balance_cache.invalidate([(int(user_id), asset.upper())])
 
             db.commit()
             cursor.close()
@@ -0,0 +1,103 @@
+"""
+Single-writer matching sequencer.
+
+Every symbol gets one owner worker that consumes submit, cancel and amend
+commands from its own inbound queue, one at a time and in arrival order.
+HTTP handlers enqueue a command and wait on the returned future. Because only
+the owner ever touches a symbol's book and its resting rows, matching needs no
+locks and is deterministic, while different symbols proceed in parallel.
+
+Threads and queues here are the standard library ones, which eventlet
+monkey-patches into greenlets when running under the gunicorn eventlet worker.
+"""
+
+from collections import namedtuple
+from concurrent.futures import Future
+import logging
+import os
+import queue
+import threading
+
+SUBMIT = "SUBMIT"
+CANCEL = "CANCEL"
+AMEND = "AMEND"
+LOAD = "LOAD"
+
+# How long an HTTP handler waits for its command to be executed
+COMMAND_TIMEOUT = float(os.getenv("SEQUENCER_COMMAND_TIMEOUT", 10))
+
+Command = namedtuple("Command", ["kind", "handler", "args", "future"])
+
+
+class Acknowledge:
+    """
+    Returned by a handler to reply to the caller right away and finish the
+    rest of its work (`then`) on the owner worker before the next command.
+    """
+
+    def __init__(self, result, then):
+        self.result = result
+        self.then = then
+
+
+class MatchingSequencer:
+    def __init__(self):
+        self.queues = {}
+        self.lock = threading.Lock()
+
+    def _queue_for(self, symbol):
+        """Return the inbound queue for a symbol, starting its owner worker on first use"""
+        inbound = self.queues.get(symbol)
+        if inbound is not None:
+            return inbound
+
+        with self.lock:
+            inbound = self.queues.get(symbol)
+            if inbound is None:
+                inbound = self.queues[symbol] = queue.Queue()
+                worker = threading.Thread(
+                    target=self._run,
+                    args=(symbol, inbound),
+                    name=f"sequencer-{symbol}",
+                    daemon=True,
+                )
+                worker.start()
+                logging.info(f"Started matching sequencer for {symbol}")
+            return inbound
+
+    def _run(self, symbol, inbound):
+        """Owner loop: execute the symbol's commands strictly one after another"""
+        while True:
+            command = inbound.get()
+            if not command.future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = command.handler(*command.args)
+            except BaseException as e:
+                logging.debug(f"{command.kind} command on {symbol} failed: {e}")
+                command.future.set_exception(e)
+                continue
+
+            if not isinstance(result, Acknowledge):
+                command.future.set_result(result)
+                continue
+
+            command.future.set_result(result.result)
+            try:
+                result.then()
+            except Exception as e:
+                logging.error(f"Deferred work of {command.kind} command on {symbol} failed: {e}")
+
+    def dispatch(self, symbol, kind, handler, *args):
+        """Queue `handler(*args)` on the symbol's owner worker; returns a Future"""
+        future = Future()
+        self._queue_for(symbol).put(Command(kind, handler, args, future))
+        return future
+
+    def execute(self, symbol, kind, handler, *args):
+        """Dispatch a command and wait for its result (re-raising its error)"""
+        return self.dispatch(symbol, kind, handler, *args).result(timeout=COMMAND_TIMEOUT)
+
+
+# Global instance
+sequencer = MatchingSequencer()
@@ -0,0 +1,229 @@
+# periodic binary snapshots of the resting orders
+# restart loads the latest snapshot and replays only the journal tail past it
+# instead of rebuilding every book from the orders table
+# balances are not snapshotted: order entry reserves them outside the journal,
+# so only MySQL (brought up to date by recover()) has them right
+
+from collections import namedtuple
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from dotenv import load_dotenv
+
+from db_pool import get_db_connection
+from fixed_point import to_lots, to_ticks
+from journal import journal, JOURNAL_PATH, ORDER_ACCEPTED, FILL, CANCEL, AMEND
+from order_commands import synced_seq
+from orderbook import OrderBook, RestingOrder, matching_engine
+import statements
+
+# Load environment variables from .env file
+load_dotenv()
+
+SNAPSHOT_PATH = os.getenv(
+    "SNAPSHOT_PATH", os.path.join(os.path.dirname(JOURNAL_PATH), "orderbook.snapshot")
+)
+# seconds between snapshots, 0 disables them
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", 300))
+
+# File layout (little-endian, fixed-size records so it can be read in place):
+#   header, then one record per symbol and resting order
+# prices in ticks, quantities in lots (see fixed_point)
+MAGIC = b"OBSNAP03"
+# magic, taken_at, journal seq every symbol is covered up to, journal segment
+# and byte offset of the next event, symbols, orders
+HEADER = struct.Struct("<8sdqqqII")
+SYMBOL = struct.Struct("<16sq")  # symbol, journal seq the snapshot covers
+ORDER = struct.Struct("<qq16s1sqqq")  # id, user_id, symbol, side, price, quantity, filled_quantity
+
+Snapshot = namedtuple("Snapshot", ["taken_at", "covered_seq", "position", "seqs", "orders"])
+
+
+def _text(raw):
+    return raw.rstrip(b"\0").decode()
+
+
+def take_snapshot(path=SNAPSHOT_PATH):
+    """
+    Write a snapshot from one consistent read of MySQL. InnoDB serves the
+    read from its MVCC snapshot, so matching carries on meanwhile, and the
+    `journal_checkpoints` rows read alongside say exactly which journal
+    events each symbol's part of the snapshot already contains.
+
+    Once written, the journal segments older than every event MySQL might
+    still be missing are deleted: the read below contains all of them.
+    """
+    covered_seq = synced_seq()
+    with get_db_connection() as db:
+        cursor = db.cursor()
+        try:
+            db.start_transaction(consistent_snapshot=True, readonly=True)
+            cursor.execute("SELECT symbol, seq FROM journal_checkpoints")
+            seqs = dict(cursor.fetchall())
+            cursor.execute(
+                """
+                SELECT id, user_id, symbol, side, price, quantity, filled_quantity
+                FROM orders
+                WHERE status IN ('PENDING', 'PARTIAL')
+                ORDER BY symbol ASC, created_at ASC, id ASC
+            """
+            )
+            orders = cursor.fetchall()
+            db.commit()
+        finally:
+            cursor.close()
+
+    for order in orders:
+        seqs.setdefault(order[2], 0)
+    segment, offset = journal.locate(covered_seq)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, time.time(), covered_seq, segment, offset, len(seqs), len(orders)))
+        for symbol, seq in seqs.items():
+            f.write(SYMBOL.pack(symbol.encode(), seq))
+        for id, user_id, symbol, side, price, quantity, filled in orders:
+            f.write(
+                ORDER.pack(
+                    id,
+                    user_id,
+                    symbol.encode(),
+                    side[0].encode(),
+                    to_ticks(price),
+                    to_lots(quantity),
+                    to_lots(filled or 0),
+                )
+            )
+        f.flush()
+        os.fsync(f.fileno())
+    # Readers only ever see a complete snapshot
+    os.replace(tmp_path, path)
+
+    logging.info(f"Snapshot written: {len(seqs)} symbols, {len(orders)} orders, journal seq {covered_seq}")
+    journal.discard_before(covered_seq)
+
+
+def load_snapshot(path=SNAPSHOT_PATH):
+    """Read a snapshot through a memory map; returns None if there is none"""
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        magic, taken_at, covered_seq, segment, journal_offset, n_symbols, n_orders = HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            logging.warning(f"Ignoring {path}: not an order book snapshot of this version")
+            return None
+
+        offset = HEADER.size
+        seqs = {}
+        for _ in range(n_symbols):
+            symbol, seq = SYMBOL.unpack_from(view, offset)
+            seqs[_text(symbol)] = seq
+            offset += SYMBOL.size
+
+        orders = []
+        for id, user_id, symbol, side, price, quantity, filled in ORDER.iter_unpack(
+            view[offset:offset + n_orders * ORDER.size]
+        ):
+            side = "BUY" if side == b"B" else "SELL"
+            orders.append(RestingOrder(id, user_id, _text(symbol), side, price, quantity, filled))
+
+    return Snapshot(taken_at, covered_seq, (segment, journal_offset), seqs, orders)
+
+
+def _apply_event(books, event_type, data):
+    """Replay one journaled event onto the restored books"""
+    if event_type == ORDER_ACCEPTED:
+        book = books[data["symbol"]]
+        # Already resting if the snapshot was taken after it was inserted
+        if data["id"] not in book:
+            book.add(RestingOrder(**data))
+
+    elif event_type == FILL:
+        book = books[data["symbol"]]
+        for order_id in (data["maker_id"], data["taker_id"]):
+            book.fill(order_id, data["quantity"])
+
+    elif event_type == AMEND and data.get("in_place"):
+        books[data["symbol"]].resize(data["order_id"], data["new_quantity"])
+
+    elif event_type in (CANCEL, AMEND):
+        # An amended order comes back through a following ORDER_ACCEPTED
+        books[data["symbol"]].remove(data["order_id"])
+
+
+def _resting(orders):
+    """id -> (side, price, remaining) of the orders with something left to fill"""
+    return {order.id: (order.side, order.price, order.remaining) for order in orders if order.remaining > 0}
+
+
+def _agrees(cursor, book):
+    """Whether a restored book holds exactly the resting rows MySQL has for its symbol"""
+    cursor.execute(statements.QUERIES["load_book"], (book.symbol,))
+    rows = [RestingOrder.from_row(row) for row in cursor.fetchall()]
+    return _resting(book.orders.values()) == _resting(rows)
+
+
+def restore(path=SNAPSHOT_PATH):
+    """
+    Rebuild the books from the latest snapshot plus the journal tail past it.
+    Symbols the snapshot does not know about keep loading lazily from MySQL.
+
+    Called after recover(), so MySQL holds every journaled event. It can also
+    hold orders the journal lacks: inserted (or moved to a new symbol by an
+    amend) but never submitted. A book that disagrees with MySQL's resting
+    rows is not installed; it loads lazily instead, which matches them.
+    """
+    snapshot = load_snapshot(path)
+    if snapshot is None:
+        logging.info("No order book snapshot found, books will load from MySQL")
+        return
+
+    books = {symbol: OrderBook(symbol) for symbol in snapshot.seqs}
+    for order in snapshot.orders:
+        if order.remaining > 0:
+            books[order.symbol].add(order)
+
+    # Every event up to covered_seq is in the snapshot: seek straight past it
+    replayed = 0
+    for seq, event_type, data in journal.replay(snapshot.covered_seq, snapshot.position):
+        if data["symbol"] in books and seq > snapshot.seqs[data["symbol"]]:
+            _apply_event(books, event_type, data)
+            replayed += 1
+
+    installed = 0
+    with get_db_connection() as db:
+        cursor = db.cursor(dictionary=True)
+        try:
+            for book in books.values():
+                if _agrees(cursor, book):
+                    matching_engine.install(book)
+                    installed += 1
+                else:
+                    logging.warning(f"Restored {book.symbol} book differs from MySQL, loading it from MySQL")
+        finally:
+            cursor.close()
+
+    logging.info(
+        f"Restored {installed} of {len(books)} order books from snapshot taken at "
+        f"{time.ctime(snapshot.taken_at)} and {replayed} journal events"
+    )
+
+
+def snapshot_loop(interval=SNAPSHOT_INTERVAL):
+    while True:
+        time.sleep(interval)
+        try:
+            take_snapshot()
+        except Exception as e:
+            logging.error(f"Error taking order book snapshot: {e}")
+
+
+def start_snapshots(interval=SNAPSHOT_INTERVAL):
+    """Start the background snapshot thread"""
+    if interval > 0:
+        threading.Thread(target=snapshot_loop, args=(interval,), name="snapshots", daemon=True).start()
+        logging.info(f"Taking order book snapshots every {interval:g}s")
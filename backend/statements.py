@@ -0,0 +1,160 @@
+# server-side prepared statements for the hot, fixed-text SQL
+# each pooled connection prepares a statement the first time it runs it and
+# re-executes it from then on, so MySQL parses it once per connection
+
+import threading
+
+# The text of each statement must stay this exact object: the connector only
+# skips re-preparing when it is handed the very same string again
+STATEMENTS = {
+    "select_balance_for_update": (
+        "SELECT available, reserved FROM balances WHERE user_id = %s AND asset = %s FOR UPDATE"
+    ),
+    "adjust_balance": """UPDATE balances
+           SET available = available + %s, reserved = reserved + %s, updated_at = NOW()
+           WHERE user_id = %s AND asset = %s AND available >= %s""",
+    "insert_order": """
+                INSERT INTO orders (
+                    user_id, symbol, side, price, quantity,
+                    status, filled_quantity, created_at, updated_at
+                ) VALUES (%s, %s, %s, %s, %s, 'PENDING', 0.0, NOW(), NOW())
+            """,
+    "select_open_order": """SELECT id, user_id, symbol, side, price, quantity, filled_quantity
+           FROM orders WHERE id = %s AND status IN ('PENDING', 'PARTIAL')""",
+    "checkpoint": """INSERT INTO journal_checkpoints (symbol, seq) VALUES (%s, %s)
+           ON DUPLICATE KEY UPDATE seq = GREATEST(seq, VALUES(seq))""",
+}
+
+
+# The hot reads, kept here so migrate.py's plan check EXPLAINs the exact text
+# the code runs. Not prepared: the keyset ones are templates whose
+# {condition} comes from helpers.keyset_condition.
+QUERIES = {
+    "load_book": """
+            SELECT id, user_id, symbol, side, price, quantity, filled_quantity, created_at
+            FROM orders
+            WHERE symbol = %s AND status IN ('PENDING', 'PARTIAL')
+        """,
+    "open_orders": """
+                SELECT id, user_id, symbol, side, price, quantity, status,
+                       filled_quantity, created_at, updated_at,
+                       CASE WHEN user_id = %s THEN true ELSE false END as is_own_order
+                FROM orders
+                WHERE status IN ('PENDING', 'PARTIAL')
+                ORDER BY
+                    symbol ASC,
+                    CASE WHEN side = 'BUY' THEN price END DESC,
+                    CASE WHEN side = 'SELL' THEN price END ASC,
+                    created_at ASC
+            """,
+    "symbol_open_orders": """
+                SELECT id, user_id, symbol, side, price, quantity, status,
+                       filled_quantity, created_at, updated_at,
+                       CASE WHEN user_id = %s THEN true ELSE false END as is_own_order
+                FROM orders
+                WHERE symbol = %s AND status IN ('PENDING', 'PARTIAL')
+                ORDER BY
+                    CASE WHEN side = 'BUY' THEN price END DESC,
+                    CASE WHEN side = 'SELL' THEN price END ASC,
+                    created_at ASC
+            """,
+    "book_symbols": """
+                SELECT DISTINCT symbol FROM orders
+                WHERE status IN ('PENDING', 'PARTIAL')
+                ORDER BY symbol
+            """,
+    "user_orders": """
+                (SELECT id, symbol, side, price, quantity, status,
+                        filled_quantity, created_at, updated_at
+                 FROM orders
+                 WHERE user_id = %s AND {condition}
+                 ORDER BY created_at DESC, id DESC
+                 LIMIT %s)
+                UNION ALL
+                (SELECT id, symbol, side, price, quantity, status,
+                        filled_quantity, created_at, updated_at
+                 FROM orders_history
+                 WHERE user_id = %s AND {condition}
+                 ORDER BY created_at DESC, id DESC
+                 LIMIT %s)
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s
+            """,
+    "transactions": """
+                SELECT t.*,
+                       t.buyer_user_id as buyer_id,
+                       t.seller_user_id as seller_id
+                FROM transactions t
+                WHERE {condition}
+                ORDER BY t.executed_at DESC, t.id DESC
+                LIMIT %s
+            """,
+    "user_transactions": """
+                (SELECT t.*, t.buyer_user_id as buyer_id, t.seller_user_id as seller_id,
+                        'BUY' as user_side
+                 FROM transactions t
+                 WHERE t.buyer_user_id = %s AND {condition}
+                 ORDER BY executed_at DESC, id DESC
+                 LIMIT %s)
+                UNION ALL
+                (SELECT t.*, t.buyer_user_id as buyer_id, t.seller_user_id as seller_id,
+                        'SELL' as user_side
+                 FROM transactions t
+                 WHERE t.seller_user_id = %s AND {condition}
+                 ORDER BY executed_at DESC, id DESC
+                 LIMIT %s)
+                ORDER BY executed_at DESC, id DESC
+                LIMIT %s
+            """,
+}
+
+
+class PreparedStatements:
+    """
+    The prepared statements of one connection: one prepared cursor per
+    statement, each holding its statement prepared for the connection's
+    lifetime. Results are returned as dictionaries; selects must be fetched
+    completely before the connection runs anything else.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursors = {}
+
+    def execute(self, name, params):
+        """Execute a registered statement; returns its cursor"""
+        cursor = self.cursors.get(name)
+        if cursor is None:
+            cursor = self.cursors[name] = self.connection.cursor(prepared=True, dictionary=True)
+        cursor.execute(STATEMENTS[name], params)
+        return cursor
+
+
+_registries = {}
+_lock = threading.Lock()
+
+
+def prepared(connection):
+    """The prepared statements of a pooled connection"""
+    with _lock:
+        statements = _registries.get(connection)
+        if statements is None:
+            statements = _registries[connection] = PreparedStatements(connection)
+        return statements
+
+
+def forget(connection):
+    """Drop a connection's statements when the pool closes it"""
+    with _lock:
+        _registries.pop(connection, None)
+
+
+def execute(cursor, statements, name, params):
+    """
+    Run a registered statement through `statements` when the caller has them,
+    or as plain text on `cursor`. Returns the cursor holding the result.
+    """
+    if statements is None:
+        cursor.execute(STATEMENTS[name], params)
+        return cursor
+    return statements.execute(name, params)
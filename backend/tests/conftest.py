@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# The backend modules import each other by their flat names
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# journal.py opens its journal on import; keep it out of backend/data
+os.environ.setdefault("JOURNAL_PATH", os.path.join(tempfile.mkdtemp(), "matching.journal"))
@@ -0,0 +1,64 @@
+import pytest
+
+from balance_cache import BalanceCache
+
+
+class FakeConnection:
+    in_transaction = False
+
+
+@pytest.fixture
+def cache():
+    cache = BalanceCache()
+    cache.balances[(1, "USD")] = (100, 0)
+    return cache
+
+
+def test_apply_mirrors_a_write_and_clamps_reserved(cache):
+    cache.apply(1, "USD", -40, 40)
+    assert cache.get(1, "USD") == (60, 40)
+
+    cache.apply(1, "USD", 10, -50)
+    assert cache.get(1, "USD") == (70, 0)
+
+
+def test_committed_writes_are_kept(cache):
+    with cache.transaction(FakeConnection()):
+        cache.apply(1, "USD", -40, 40)
+
+    assert cache.get(1, "USD") == (60, 40)
+
+
+def test_writes_of_a_failed_transaction_are_dropped(cache):
+    cache.balances[(2, "USD")] = (5, 0)
+
+    with pytest.raises(ValueError):
+        with cache.transaction(FakeConnection()):
+            cache.apply(1, "USD", -40, 40)
+            raise ValueError("Insufficient BTC balance")
+
+    assert cache.get(1, "USD") is None
+    assert cache.get(2, "USD") == (5, 0)
+
+
+def test_writes_left_uncommitted_are_dropped(cache):
+    connection = FakeConnection()
+    connection.in_transaction = True
+
+    with cache.transaction(connection):
+        cache.apply(1, "USD", -40, 40)
+
+    assert cache.get(1, "USD") is None
+
+
+def test_load_that_raced_with_a_write_is_not_kept(cache):
+    cache.invalidate([(1, "USD")])
+    version = cache.version(1, "USD")
+
+    # Written by another transaction while the load was in flight
+    cache.apply(1, "USD", -40, 40)
+    cache.store(1, "USD", (100, 0), version)
+    assert cache.get(1, "USD") is None
+
+    cache.store(1, "USD", (60, 40), cache.version(1, "USD"))
+    assert cache.get(1, "USD") == (60, 40)
@@ -0,0 +1,165 @@
+import threading
+import time
+
+import mysql.connector
+import pytest
+
+import db_pool
+from db_pool import ConnectionPool, retry_on_deadlock
+
+
+class FakeConnection:
+    in_transaction = False
+
+    def __init__(self):
+        self.closed = False
+
+    def ping(self, reconnect=False):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def make_pool(monkeypatch):
+    def connect(self):
+        connection = FakeConnection()
+        self.opened_at[connection] = time.monotonic()
+        return connection
+
+    monkeypatch.setattr(ConnectionPool, "_connect", connect)
+
+    def make_pool(**kwargs):
+        return ConnectionPool("test", {}, recycle=0, **kwargs)
+
+    return make_pool
+
+
+def test_idle_connections_are_reused(make_pool):
+    pool = make_pool(size=2, max_overflow=0)
+
+    connection = pool.get_connection()
+    pool.release(connection)
+
+    assert pool.get_connection() is connection
+    assert pool.stats()["opened"] == 1
+
+
+def test_overflow_connections_are_closed_when_given_back(make_pool):
+    pool = make_pool(size=1, max_overflow=1)
+
+    kept = pool.get_connection()
+    overflow = pool.get_connection()
+    assert pool.stats()["overflow_in_use"] == 1
+
+    pool.release(overflow)
+    pool.release(kept)
+
+    stats = pool.stats()
+    assert overflow.closed and not kept.closed
+    assert (stats["opened"], stats["idle"], stats["in_use"]) == (1, 1, 0)
+    assert stats["peak_in_use"] == 2
+
+
+def test_checkout_waits_for_a_connection_to_be_given_back(make_pool):
+    pool = make_pool(size=1, max_overflow=0, timeout=5)
+    connection = pool.get_connection()
+
+    def give_back():
+        while pool.stats()["waiting"] == 0:
+            time.sleep(0.001)
+        pool.release(connection)
+
+    threading.Thread(target=give_back).start()
+
+    assert pool.get_connection() is connection
+    assert pool.stats()["wait_ms"]["p99"] > 0
+
+
+def test_checkout_times_out_when_the_pool_is_exhausted(make_pool):
+    pool = make_pool(size=1, max_overflow=0, timeout=0.01)
+    pool.get_connection()
+
+    with pytest.raises(mysql.connector.errors.PoolError, match="exhausted"):
+        pool.get_connection()
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_too_many_waiters_fail_right_away(make_pool):
+    pool = make_pool(size=1, max_overflow=0, timeout=5, max_waiters=0)
+    pool.get_connection()
+
+    started = time.monotonic()
+    with pytest.raises(mysql.connector.errors.PoolError):
+        pool.get_connection()
+    assert time.monotonic() - started < 1
+
+
+def test_failed_connect_frees_its_slot(make_pool, monkeypatch):
+    pool = make_pool(size=1, max_overflow=0, timeout=0.01)
+
+    def refuse(self):
+        raise mysql.connector.errors.InterfaceError("connection refused")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(ConnectionPool, "_connect", refuse)
+        with pytest.raises(mysql.connector.errors.InterfaceError):
+            pool.get_connection()
+
+    assert pool.stats()["opened"] == 0
+    pool.get_connection()
+
+
+def lock_error(errno):
+    return mysql.connector.errors.DatabaseError(msg="lock contention", errno=errno)
+
+
+def test_deadlocked_transaction_is_retried(monkeypatch):
+    monkeypatch.setattr(db_pool.time, "sleep", lambda delay: None)
+    attempts = []
+
+    @retry_on_deadlock
+    def transaction(value):
+        attempts.append(value)
+        if len(attempts) < 3:
+            raise lock_error(1213 if len(attempts) == 1 else 1205)
+        return value * 2
+
+    assert transaction(21) == 42
+    assert attempts == [21, 21, 21]
+
+
+def test_retries_are_bounded(monkeypatch):
+    delays = []
+    monkeypatch.setattr(db_pool.time, "sleep", delays.append)
+    attempts = []
+
+    @retry_on_deadlock
+    def transaction():
+        attempts.append(1)
+        raise lock_error(1213)
+
+    with pytest.raises(mysql.connector.Error):
+        transaction()
+    assert len(attempts) == db_pool.DB_RETRY_ATTEMPTS
+    # Jittered, below an exponentially growing bound
+    assert len(delays) == db_pool.DB_RETRY_ATTEMPTS - 1
+    for attempt, delay in enumerate(delays):
+        assert 0 <= delay <= db_pool.DB_RETRY_BACKOFF * 2 ** attempt
+
+
+def test_other_errors_are_not_retried():
+    attempts = []
+
+    @retry_on_deadlock
+    def transaction():
+        attempts.append(1)
+        raise mysql.connector.errors.IntegrityError(msg="duplicate", errno=1062)
+
+    with pytest.raises(mysql.connector.errors.IntegrityError):
+        transaction()
+    assert attempts == [1]
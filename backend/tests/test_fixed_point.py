@@ -0,0 +1,49 @@
+from decimal import Decimal
+
+import pytest
+
+from fixed_point import (
+    lots_to_decimal,
+    lots_to_units,
+    notional_units,
+    ticks_to_decimal,
+    to_lots,
+    to_ticks,
+    to_units,
+    units_to_decimal,
+)
+
+
+@pytest.mark.parametrize("price", [101.25, "101.25", Decimal("101.25"), "101.250"])
+def test_to_ticks_accepts_numbers_strings_and_decimals(price):
+    assert to_ticks(price) == 10125
+
+
+def test_to_lots_is_exact_for_float_input():
+    # 0.1 + 0.2 style binary noise must not leak into the lot count
+    assert to_lots(0.3) == 3000
+    assert to_lots(1.0001) == 10001
+
+
+@pytest.mark.parametrize("convert, value", [(to_ticks, "1.001"), (to_lots, "0.00001"), (to_units, "1e-9")])
+def test_too_many_decimal_places_is_rejected_not_rounded(convert, value):
+    with pytest.raises(ValueError, match="decimal places"):
+        convert(value)
+
+
+@pytest.mark.parametrize("value", ["abc", "NaN", "Infinity", None])
+def test_invalid_numbers_are_rejected(value):
+    with pytest.raises(ValueError):
+        to_ticks(value)
+
+
+def test_round_trip_to_decimal():
+    assert ticks_to_decimal(to_ticks("65000.01")) == Decimal("65000.01")
+    assert lots_to_decimal(to_lots("0.0001")) == Decimal("0.0001")
+    assert units_to_decimal(to_units("0.00000001")) == Decimal("0.00000001")
+
+
+def test_balance_amounts():
+    # 1.5 BTC, and 1.5 BTC at 65000.01 USD
+    assert units_to_decimal(lots_to_units(to_lots("1.5"))) == Decimal("1.5")
+    assert units_to_decimal(notional_units(to_lots("1.5"), to_ticks("65000.01"))) == Decimal("97500.015")
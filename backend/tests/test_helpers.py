@@ -0,0 +1,200 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+import helpers
+from balance_cache import balance_cache
+from fixed_point import to_lots, to_ticks, to_units
+from orderbook import Fill
+
+
+class RecordingCursor:
+    """Records the statements run on it; every statement matches `matched` rows"""
+
+    def __init__(self, matched=1):
+        self.executed = []
+        self.matched = matched
+        self.rowcount = 0
+
+    def execute(self, sql, params=()):
+        self.executed.append((" ".join(sql.split()), list(params)))
+        self.rowcount = self.matched
+
+    def fetchall(self):
+        return []
+
+
+@pytest.fixture(autouse=True)
+def empty_balance_cache():
+    balance_cache.balances.clear()
+    yield
+    balance_cache.balances.clear()
+
+
+def upserted(cursor):
+    """(user_id, asset) -> (available, reserved) of the settlement upsert"""
+    sql, params = cursor.executed[-1]
+    assert sql.startswith("INSERT INTO balances")
+    rows = [params[i:i + 4] for i in range(0, len(params), 4)]
+    return {(user_id, asset): (available, reserved) for user_id, asset, available, reserved in rows}
+
+
+def fill(taker_side, taker_price, price, quantity="1"):
+    """A BTCUSD fill between taker user 1 and maker user 2"""
+    return Fill("BTCUSD", 10, 1, taker_side, to_ticks(taker_price), 20, 2, to_lots(quantity), to_ticks(price))
+
+
+def test_balances_are_locked_in_canonical_order():
+    cursor = RecordingCursor()
+
+    helpers.lock_balances(cursor, [(2, "USD"), (1, "USD"), (2, "BTC"), (1, "USD")])
+
+    sql, params = cursor.executed[0]
+    assert sql.endswith("ORDER BY user_id, asset FOR UPDATE")
+    assert params == [1, "USD", 2, "BTC", 2, "USD"]
+
+
+def test_nothing_to_lock_runs_no_statement():
+    cursor = RecordingCursor()
+
+    helpers.lock_balances(cursor, [])
+
+    assert cursor.executed == []
+
+
+def test_balance_deltas_are_netted_into_one_upsert():
+    cursor = RecordingCursor()
+    balance_cache.balances[(1, "USD")] = (to_units("50"), to_units("100"))
+    deltas = helpers.BalanceDeltas()
+    deltas.add(2, "BTC", available=to_units("1"))
+    deltas.add(1, "USD", available=to_units("5"), reserved=-to_units("30"))
+    deltas.add(1, "USD", available=to_units("5"), reserved=-to_units("30"))
+
+    deltas.apply(cursor)
+
+    # One locking read and one upsert, in canonical order
+    assert len(cursor.executed) == 2
+    assert cursor.executed[0][1] == [1, "USD", 2, "BTC"]
+    assert list(upserted(cursor).items()) == [
+        ((1, "USD"), (Decimal("10"), Decimal("-60"))),
+        ((2, "BTC"), (Decimal("1"), Decimal("0"))),
+    ]
+    assert balance_cache.get(1, "USD") == (to_units("60"), to_units("40"))
+
+
+def test_nothing_to_settle_runs_no_statement():
+    cursor = RecordingCursor()
+
+    helpers.BalanceDeltas().apply(cursor)
+
+    assert cursor.executed == []
+
+
+def test_buying_taker_is_refunded_its_price_improvement():
+    cursor = RecordingCursor()
+
+    # Reserved 1 BTC at its 110 limit, bought at the resting 100
+    helpers.process_trade_settlement(cursor, [fill("BUY", "110", "100")])
+
+    assert upserted(cursor) == {
+        (1, "BTC"): (Decimal("1"), Decimal("0")),
+        (1, "USD"): (Decimal("10"), Decimal("-110")),
+        (2, "BTC"): (Decimal("0"), Decimal("-1")),
+        (2, "USD"): (Decimal("100"), Decimal("0")),
+    }
+
+
+def test_selling_taker_gets_the_resting_buy_price():
+    cursor = RecordingCursor()
+
+    # Sold with a 90 limit into a resting buy at 100, which reserved at 100
+    helpers.process_trade_settlement(cursor, [fill("SELL", "90", "100"), fill("SELL", "90", "100", "0.5")])
+
+    assert upserted(cursor) == {
+        (1, "BTC"): (Decimal("0"), Decimal("-1.5")),
+        (1, "USD"): (Decimal("150"), Decimal("0")),
+        (2, "BTC"): (Decimal("1.5"), Decimal("0")),
+        (2, "USD"): (Decimal("0"), Decimal("-150")),
+    }
+
+
+def test_adjust_balance_writes_through_when_the_row_matched():
+    cursor = RecordingCursor(matched=1)
+    balance_cache.balances[(1, "USD")] = (to_units("100"), to_units("0"))
+
+    assert helpers.adjust_balance(cursor, 1, "USD", -to_units("40"), to_units("40"))
+
+    sql, params = cursor.executed[0]
+    assert sql.endswith("WHERE user_id = %s AND asset = %s AND available >= %s")
+    assert params == [Decimal("-40"), Decimal("40"), 1, "USD", Decimal("40")]
+    assert balance_cache.get(1, "USD") == (to_units("60"), to_units("40"))
+
+
+def test_adjust_balance_leaves_the_cache_alone_when_nothing_matched():
+    cursor = RecordingCursor(matched=0)
+    balance_cache.balances[(1, "USD")] = (to_units("100"), to_units("0"))
+
+    assert not helpers.adjust_balance(cursor, 1, "USD", -to_units("400"), to_units("400"))
+    assert balance_cache.get(1, "USD") == (to_units("100"), to_units("0"))
+
+
+def test_update_balance_says_why_it_did_not_apply():
+    class Cursor(RecordingCursor):
+        row = None
+
+        def fetchone(self):
+            return self.row
+
+    cursor = Cursor(matched=0)
+    with pytest.raises(ValueError, match="USD balance not found for user 1"):
+        helpers.update_balance(cursor, 1, "USD", -to_units("1"))
+
+    cursor.row = {"available": Decimal("0"), "reserved": Decimal("0")}
+    with pytest.raises(ValueError, match="Insufficient USD balance"):
+        helpers.update_balance(cursor, 1, "USD", -to_units("1"))
+
+
+def test_reservation_rejected_from_the_cache_costs_no_statement():
+    cursor = RecordingCursor()
+    balance_cache.balances[(1, "USD")] = (to_units("50"), to_units("0"))
+
+    with pytest.raises(ValueError, match=r"Required: \$100.00, Available: \$50.00"):
+        helpers.reserve_balance_for_order(cursor, 1, "BUY", "BTCUSD", to_lots("1"), to_ticks("100"))
+    assert cursor.executed == []
+
+
+def test_page_cursor_round_trips():
+    rows = [{"id": id, "created_at": datetime(2026, 1, 1, 0, 0, 10 - id)} for id in (9, 8, 7)]
+
+    page, cursor = helpers.next_page(rows, 2, "created_at")
+    limit, after = helpers.parse_page_args({"limit": "2", "cursor": cursor}, 50)
+
+    assert [row["id"] for row in page] == [9, 8]
+    assert (limit, after) == (2, (datetime(2026, 1, 1, 0, 0, 2), 8))
+    assert helpers.keyset_condition("created_at", "id", after) == (
+        "(created_at < %s OR (created_at = %s AND id < %s))",
+        (after[0], after[0], 8),
+    )
+
+
+def test_last_page_has_no_cursor():
+    rows = [{"id": 1, "created_at": datetime(2026, 1, 1)}]
+
+    assert helpers.next_page(rows, 1, "created_at") == (rows, None)
+    assert helpers.parse_page_args({}, 50) == (50, None)
+    assert helpers.keyset_condition("created_at", "id", None) == ("TRUE", ())
+
+
+@pytest.mark.parametrize(
+    "args, message",
+    [
+        ({"limit": "ten"}, "limit must be an integer"),
+        ({"limit": "0"}, "limit must be between 1 and 200"),
+        ({"limit": "201"}, "limit must be between 1 and 200"),
+        ({"cursor": "not-a-cursor"}, "Invalid cursor"),
+    ],
+)
+def test_bad_page_args_are_rejected(args, message):
+    with pytest.raises(ValueError, match=message):
+        helpers.parse_page_args(args, 50)
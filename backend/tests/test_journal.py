@@ -0,0 +1,98 @@
+import os
+
+import pytest
+
+from journal import CANCEL, FILL, ORDER_ACCEPTED, Journal
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "matching.journal")
+
+
+def append_all(journal, count):
+    seq = None
+    for i in range(count):
+        seq = journal.append(FILL if i % 2 else ORDER_ACCEPTED, {"symbol": "BTCUSD", "n": i})
+    journal.wait_durable(seq)
+    return seq
+
+
+def test_append_then_replay_in_order(path):
+    journal = Journal(path, flush_interval=0)
+
+    assert append_all(journal, 3) == 3
+    events = list(journal.replay())
+
+    assert [seq for seq, _, _ in events] == [1, 2, 3]
+    assert events[0] == (1, ORDER_ACCEPTED, {"symbol": "BTCUSD", "n": 0})
+    assert [seq for seq, _, _ in journal.replay(after_seq=2)] == [3]
+
+
+def test_sequence_continues_after_reopening(path):
+    append_all(Journal(path, flush_interval=0), 2)
+
+    journal = Journal(path, flush_interval=0)
+
+    assert journal.last_seq == 2
+    assert journal.append(CANCEL, {"symbol": "BTCUSD"}) == 3
+
+
+def test_rolls_over_to_new_segments(path):
+    journal = Journal(path, flush_interval=0, segment_size=1)
+
+    for _ in range(4):
+        append_all(journal, 1)
+
+    # Each batch rolls over; the segment after the last one may be open already
+    assert journal.segments()[:4] == [1, 2, 3, 4]
+    assert [seq for seq, _, _ in journal.replay()] == [1, 2, 3, 4]
+    assert [seq for seq, _, _ in journal.replay(after_seq=2)] == [3, 4]
+
+
+def test_torn_tail_is_cut_off(path):
+    append_all(Journal(path, flush_interval=0), 2)
+    segment = f"{path}.{1:012d}"
+    with open(segment, "ab") as f:
+        f.write(b'{"seq":3,"type":"FILL","da')
+
+    journal = Journal(path, flush_interval=0)
+
+    assert journal.last_seq == 2
+    assert [seq for seq, _, _ in journal.replay()] == [1, 2]
+    assert append_all(journal, 1) == 3
+    assert [seq for seq, _, _ in journal.replay()] == [1, 2, 3]
+
+
+def test_unsegmented_journal_is_adopted(path):
+    with open(path, "wb") as f:
+        f.write(b'{"seq":7,"type":"FILL","data":{"symbol":"BTCUSD"}}\n')
+
+    journal = Journal(path, flush_interval=0)
+
+    assert not os.path.exists(path)
+    assert journal.segments() == [7]
+    assert journal.last_seq == 7
+
+
+def test_locate_seeks_to_the_same_events_as_replay(path):
+    journal = Journal(path, flush_interval=0, segment_size=200)
+    append_all(journal, 10)
+
+    for after_seq in (0, 3, 9, 10):
+        position = journal.locate(after_seq)
+        assert list(journal.replay(after_seq, position)) == list(journal.replay(after_seq))
+
+
+def test_discard_keeps_later_and_current_segments(path):
+    journal = Journal(path, flush_interval=0, segment_size=1)
+    for _ in range(4):
+        append_all(journal, 1)
+
+    journal.discard_before(2)
+
+    assert journal.segments()[:2] == [3, 4]
+    assert [seq for seq, _, _ in journal.replay()] == [3, 4]
+
+    journal.discard_before(100)
+    assert len(journal.segments()) == 1
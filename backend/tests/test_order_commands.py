@@ -0,0 +1,123 @@
+from decimal import Decimal
+
+import pytest
+
+import order_commands
+from balance_cache import balance_cache
+from fixed_point import to_lots, to_ticks
+
+
+class BalancesCursor:
+    """
+    Stands in for a MySQL cursor over the balances and orders tables: runs
+    the conditional balance UPDATE like MySQL would and records the rest.
+    """
+
+    def __init__(self, balances):
+        # (user_id, asset) -> [available, reserved] as Decimals
+        self.balances = balances
+        self.executed = []
+        self.rowcount = 0
+
+    def execute(self, sql, params=()):
+        self.executed.append((" ".join(sql.split()), params))
+        self.rowcount = 0
+        if sql.lstrip().startswith("UPDATE balances"):
+            available, reserved, user_id, asset, needed = params
+            balance = self.balances.get((user_id, asset))
+            if balance is not None and balance[0] >= needed:
+                balance[0] += available
+                balance[1] += reserved
+                self.rowcount = 1
+
+    def fetchall(self):
+        return []
+
+    def statements(self, prefix):
+        return [sql for sql, _ in self.executed if sql.startswith(prefix)]
+
+
+@pytest.fixture(autouse=True)
+def empty_balance_cache():
+    balance_cache.balances.clear()
+    yield
+    balance_cache.balances.clear()
+
+
+def amend(new_quantity):
+    """A journaled BUY amend of 1 BTCUSD @ 100 to `new_quantity` @ 110 on ETHUSD"""
+    return {
+        "order_id": 7,
+        "user_id": 1,
+        "symbol": "BTCUSD",
+        "side": "BUY",
+        "price": to_ticks("100"),
+        "old_unfilled": to_lots("1"),
+        "new_symbol": "ETHUSD",
+        "new_side": "BUY",
+        "new_price": to_ticks("110"),
+        "new_quantity": to_lots(new_quantity),
+        "new_unfilled": to_lots(new_quantity),
+    }
+
+
+def test_replayed_amend_reserves_when_funds_are_there():
+    cursor = BalancesCursor({(1, "USD"): [Decimal("20"), Decimal("100")]})
+
+    assert order_commands._replay_amend(cursor, amend("1")) is None
+
+    # 100 released, 110 reserved
+    assert cursor.balances[(1, "USD")] == [Decimal("10"), Decimal("110")]
+    assert len(cursor.statements("UPDATE orders SET symbol")) == 1
+
+
+def test_replayed_amend_without_funds_cancels_instead():
+    # The 20 USD left over were spent on another symbol before the replay
+    cursor = BalancesCursor({(1, "USD"): [Decimal("0"), Decimal("100")]})
+
+    cancel = order_commands._replay_amend(cursor, amend("2"))
+
+    # The old reservation is released and nothing is reserved in its place
+    assert cursor.balances[(1, "USD")] == [Decimal("100"), Decimal("0")]
+    assert cursor.statements("UPDATE orders SET status = 'CANCELLED'")
+    assert not cursor.statements("UPDATE orders SET symbol")
+    assert cancel == {
+        "order_id": 7,
+        "user_id": 1,
+        "symbol": "ETHUSD",
+        "side": "BUY",
+        "price": to_ticks("110"),
+        "remaining": 0,
+    }
+
+
+def test_replayed_compensating_cancel_releases_nothing():
+    cursor = BalancesCursor({(1, "USD"): [Decimal("0"), Decimal("100")]})
+    cancel = order_commands._replay_amend(cursor, amend("2"))
+
+    # Replaying the CANCEL again (e.g. on the symbol it was journaled for)
+    order_commands._apply_event(cursor, order_commands.CANCEL, cancel)
+
+    assert cursor.balances[(1, "USD")] == [Decimal("100"), Decimal("0")]
+    assert cursor.statements("UPDATE orders SET status = 'CANCELLED'")
+
+
+
+def test_replayed_in_place_amend_releases_only_the_difference():
+    cursor = BalancesCursor({(1, "USD"): [Decimal("0"), Decimal("200")]})
+    event = {
+        "order_id": 7,
+        "user_id": 1,
+        "symbol": "BTCUSD",
+        "side": "BUY",
+        "price": to_ticks("100"),
+        "new_quantity": to_lots("1.5"),
+        "released": to_lots("0.5"),
+        "in_place": True,
+    }
+
+    order_commands._apply_event(cursor, order_commands.AMEND, event)
+
+    assert cursor.balances[(1, "USD")] == [Decimal("50"), Decimal("150")]
+    assert len(cursor.statements("UPDATE balances")) == 1
+    assert cursor.statements("UPDATE orders SET quantity")
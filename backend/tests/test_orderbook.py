@@ -0,0 +1,152 @@
+from orderbook import OrderBook, RestingOrder
+
+
+def order(id, side, price, quantity, user_id=None, filled=0):
+    return RestingOrder(id, user_id if user_id is not None else id, "BTCUSD", side, price, quantity, filled)
+
+
+def book_with(*orders):
+    book = OrderBook("BTCUSD")
+    for resting in orders:
+        book.add(resting)
+    book.take_changes()
+    return book
+
+
+def test_match_walks_best_price_then_time():
+    book = book_with(
+        order(1, "SELL", 10100, 5),
+        order(2, "SELL", 10000, 5),
+        order(3, "SELL", 10000, 5),
+    )
+
+    fills = book.match(order(4, "BUY", 10100, 12))
+
+    assert [(fill.maker_id, fill.quantity, fill.price) for fill in fills] == [
+        (2, 5, 10000),
+        (3, 5, 10000),
+        (1, 2, 10100),
+    ]
+    assert 2 not in book and 3 not in book
+    assert book.get(1).remaining == 3
+    assert book.best_price("SELL") == 10100
+
+
+def test_match_stops_at_limit_price():
+    book = book_with(order(1, "BUY", 9900, 5), order(2, "BUY", 9800, 5))
+
+    fills = book.match(order(3, "SELL", 9900, 8))
+
+    assert [(fill.maker_id, fill.quantity) for fill in fills] == [(1, 5)]
+    assert book.best_price("BUY") == 9800
+
+
+def test_match_skips_own_orders():
+    book = book_with(order(1, "SELL", 10000, 5, user_id=7), order(2, "SELL", 10000, 5, user_id=8))
+
+    fills = book.match(order(3, "BUY", 10000, 5, user_id=7))
+
+    assert [fill.maker_id for fill in fills] == [2]
+    assert 1 in book
+
+
+def test_sizes_follow_add_fill_resize_and_remove():
+    book = book_with(order(1, "BUY", 10000, 5), order(2, "BUY", 10000, 3, filled=1))
+    assert book.depth() == {"BUY": [(10000, 7, 2)], "SELL": []}
+
+    book.fill(1, 2)
+    assert book.depth()["BUY"] == [(10000, 5, 2)]
+
+    book.resize(2, 4)
+    assert book.depth()["BUY"] == [(10000, 6, 2)]
+
+    book.remove(1)
+    assert book.depth()["BUY"] == [(10000, 3, 1)]
+
+    book.fill(2, 3)
+    assert book.depth()["BUY"] == []
+    assert 10000 not in book.sizes["BUY"]
+
+
+def test_sizes_follow_match():
+    book = book_with(order(1, "SELL", 10000, 5), order(2, "SELL", 10100, 5))
+
+    book.match(order(3, "BUY", 10100, 7))
+
+    assert book.depth() == {"BUY": [], "SELL": [(10100, 3, 1)]}
+
+
+def test_depth_is_best_first_and_limited():
+    book = book_with(
+        order(1, "BUY", 9800, 1),
+        order(2, "BUY", 9900, 1),
+        order(3, "SELL", 10100, 1),
+        order(4, "SELL", 10000, 1),
+    )
+
+    assert book.depth() == {
+        "BUY": [(9900, 1, 1), (9800, 1, 1)],
+        "SELL": [(10000, 1, 1), (10100, 1, 1)],
+    }
+    assert book.depth(1) == {"BUY": [(9900, 1, 1)], "SELL": [(10000, 1, 1)]}
+
+
+def test_take_changes_reports_changed_levels_once():
+    book = OrderBook("BTCUSD")
+    book.add(order(1, "BUY", 10000, 5))
+    book.add(order(2, "BUY", 10000, 3))
+    book.add(order(3, "SELL", 10100, 2))
+
+    assert book.take_changes() == [("BUY", 10000, 8, 2), ("SELL", 10100, 2, 1)]
+    assert book.take_changes() == []
+
+
+def test_take_changes_reports_emptied_level_as_zero():
+    book = book_with(order(1, "SELL", 10000, 5), order(2, "SELL", 10100, 5))
+
+    book.match(order(3, "BUY", 10100, 6))
+
+    assert book.take_changes() == [("SELL", 10000, 0, 0), ("SELL", 10100, 4, 1)]
+
+
+def test_crossed_book_is_rematched_in_arrival_order():
+    # Loaded from rows whose SUBMIT never ran: the bid at 10100 came last
+    book = book_with(
+        order(1, "SELL", 10000, 5),
+        order(2, "BUY", 9900, 5),
+        order(3, "BUY", 10100, 3),
+    )
+    assert book.crossed()
+
+    fills = book.rematch()
+
+    assert [(fill.taker_id, fill.maker_id, fill.quantity, fill.price) for fill in fills] == [(3, 1, 3, 10000)]
+    assert not book.crossed()
+    assert 3 not in book
+    assert book.get(1).remaining == 2
+    assert book.depth() == {"BUY": [(9900, 5, 1)], "SELL": [(10000, 2, 1)]}
+
+
+def test_book_crossed_only_by_one_user_stays_as_is():
+    book = book_with(order(1, "SELL", 10000, 5, user_id=9), order(2, "BUY", 10100, 5, user_id=9))
+
+    assert book.crossed()
+    assert book.rematch() == []
+    assert len(book) == 2
+
+
+def test_resized_order_keeps_its_place_in_the_queue():
+    book = book_with(order(1, "SELL", 10000, 5), order(2, "SELL", 10000, 5))
+
+    book.resize(1, 3)
+    fills = book.match(order(3, "BUY", 10000, 4))
+
+    assert [(fill.maker_id, fill.quantity) for fill in fills] == [(1, 3), (2, 1)]
+
+
+def test_resizing_down_to_the_filled_quantity_removes_the_order():
+    book = book_with(order(1, "SELL", 10000, 5, filled=2), order(2, "SELL", 10000, 5))
+
+    assert book.resize(1, 2).remaining == 0
+    assert 1 not in book
+    assert book.depth()["SELL"] == [(10000, 5, 1)]
@@ -0,0 +1,78 @@
+import threading
+from concurrent.futures import TimeoutError
+
+import pytest
+
+import sequencer
+from sequencer import SUBMIT, Acknowledge, MatchingSequencer
+
+
+def test_commands_run_one_at_a_time_in_arrival_order():
+    owner = MatchingSequencer()
+    gate = threading.Event()
+    ran = []
+
+    def handler(n):
+        if n == 0:
+            gate.wait(5)
+        ran.append((n, threading.current_thread().name))
+        return n
+
+    futures = [owner.dispatch("BTCUSD", SUBMIT, handler, n) for n in range(5)]
+    gate.set()
+
+    assert [future.result(5) for future in futures] == [0, 1, 2, 3, 4]
+    assert ran == [(n, "sequencer-BTCUSD") for n in range(5)]
+
+
+def test_symbols_have_their_own_owner():
+    owner = MatchingSequencer()
+    gate = threading.Event()
+
+    blocked = owner.dispatch("BTCUSD", SUBMIT, gate.wait, 5)
+
+    # ETHUSD is not held up behind the blocked BTCUSD command
+    assert owner.execute("ETHUSD", SUBMIT, threading.current_thread).name == "sequencer-ETHUSD"
+    assert not blocked.done()
+    gate.set()
+    assert blocked.result(5)
+
+
+def test_acknowledged_result_is_returned_before_then_runs():
+    owner = MatchingSequencer()
+    release = threading.Event()
+    done = []
+
+    def then():
+        release.wait(5)
+        done.append("then")
+
+    future = owner.dispatch("BTCUSD", SUBMIT, lambda: Acknowledge("accepted", then))
+    assert future.result(5) == "accepted"
+    assert done == []
+
+    # The next command waits for the deferred work
+    following = owner.dispatch("BTCUSD", SUBMIT, lambda: list(done))
+    release.set()
+    assert following.result(5) == ["then"]
+
+
+def test_handler_errors_reach_the_caller():
+    owner = MatchingSequencer()
+
+    def handler():
+        raise ValueError("Insufficient balance")
+
+    with pytest.raises(ValueError, match="Insufficient balance"):
+        owner.execute("BTCUSD", SUBMIT, handler)
+    assert owner.execute("BTCUSD", SUBMIT, lambda: "still running") == "still running"
+
+
+def test_execute_times_out(monkeypatch):
+    monkeypatch.setattr(sequencer, "COMMAND_TIMEOUT", 0.01)
+    owner = MatchingSequencer()
+    gate = threading.Event()
+
+    with pytest.raises(TimeoutError):
+        owner.execute("BTCUSD", SUBMIT, gate.wait, 5)
+    gate.set()
@@ -0,0 +1,170 @@
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+import snapshot
+from fixed_point import to_lots, to_ticks
+from journal import AMEND, FILL, ORDER_ACCEPTED, Journal
+from orderbook import RestingOrder, matching_engine
+
+
+class FakeCursor:
+    """Answers the queries take_snapshot and restore make from `db`"""
+
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    def execute(self, sql, params=()):
+        if "FROM journal_checkpoints" in sql:
+            self.result = list(self.db["checkpoints"].items())
+        elif "WHERE symbol = %s" in sql:
+            self.result = [dict(row) for row in self.db["orders"] if row["symbol"] == params[0]]
+        else:
+            self.result = [
+                (row["id"], row["user_id"], row["symbol"], row["side"], row["price"], row["quantity"], row["filled_quantity"])
+                for row in self.db["orders"]
+            ]
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self.db)
+
+    def start_transaction(self, **kwargs):
+        pass
+
+    def commit(self):
+        pass
+
+
+def row(id, side, price, quantity, filled="0"):
+    return {
+        "id": id,
+        "user_id": id,
+        "symbol": "BTCUSD",
+        "side": side,
+        "price": Decimal(price),
+        "quantity": Decimal(quantity),
+        "filled_quantity": Decimal(filled),
+        "created_at": datetime(2026, 1, 1, 0, 0, id),
+    }
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    db = {"checkpoints": {"BTCUSD": 1}, "orders": [row(1, "SELL", "100", "2")]}
+
+    @contextmanager
+    def get_db_connection():
+        yield FakeConnection(db)
+
+    journal = Journal(str(tmp_path / "matching.journal"), flush_interval=0)
+    journal.wait_durable(journal.append(ORDER_ACCEPTED, accepted(row(1, "SELL", "100", "2"))))
+
+    monkeypatch.setattr(snapshot, "get_db_connection", get_db_connection)
+    monkeypatch.setattr(snapshot, "journal", journal)
+    monkeypatch.setattr(snapshot, "synced_seq", lambda: journal.durable_seq)
+    matching_engine.books.clear()
+    yield db
+    matching_engine.books.clear()
+
+
+def accepted(order_row):
+    """The ORDER_ACCEPTED event data of an order row"""
+    order = RestingOrder.from_row(order_row)
+    return {slot: getattr(order, slot) for slot in RestingOrder.__slots__}
+
+
+def append(event_type, data):
+    snapshot.journal.wait_durable(snapshot.journal.append(event_type, data))
+
+
+def fill(taker_id, maker_id, quantity):
+    return {
+        "symbol": "BTCUSD",
+        "taker_id": taker_id,
+        "taker_user_id": taker_id,
+        "taker_side": "BUY",
+        "taker_price": to_ticks("100"),
+        "maker_id": maker_id,
+        "maker_user_id": maker_id,
+        "quantity": quantity,
+        "price": to_ticks("100"),
+    }
+
+
+def test_snapshot_round_trip_replays_the_journal_tail(db, tmp_path):
+    path = str(tmp_path / "orderbook.snapshot")
+    snapshot.take_snapshot(path)
+
+    # After the snapshot: a buy of 0.5 takes from the resting sell
+    append(ORDER_ACCEPTED, accepted(row(2, "BUY", "100", "0.5")))
+    append(FILL, fill(2, 1, to_lots("0.5")))
+    db["orders"] = [row(1, "SELL", "100", "2", filled="0.5")]
+
+    loaded = snapshot.load_snapshot(path)
+    assert loaded.covered_seq == 1
+    assert loaded.seqs == {"BTCUSD": 1}
+    assert [(order.id, order.side, order.price, order.quantity) for order in loaded.orders] == [
+        (1, "SELL", to_ticks("100"), to_lots("2"))
+    ]
+
+    snapshot.restore(path)
+
+    book = matching_engine.books["BTCUSD"]
+    assert list(book.orders) == [1]
+    assert book.get(1).remaining == to_lots("1.5")
+
+
+def test_restore_drops_a_book_missing_an_order_mysql_has(db, tmp_path):
+    path = str(tmp_path / "orderbook.snapshot")
+    snapshot.take_snapshot(path)
+
+    # Inserted and committed, but the process died before its SUBMIT
+    db["orders"].append(row(2, "BUY", "90", "1"))
+
+    snapshot.restore(path)
+
+    # Left to load (and match) lazily from MySQL
+    assert "BTCUSD" not in matching_engine.books
+
+
+def test_in_place_amend_keeps_the_order_ahead_of_later_ones(db, tmp_path):
+    db["orders"].append(row(2, "SELL", "100", "1"))
+    append(ORDER_ACCEPTED, accepted(row(2, "SELL", "100", "1")))
+    path = str(tmp_path / "orderbook.snapshot")
+    snapshot.take_snapshot(path)
+
+    # Order 1 is reduced from 2 to 1 without losing its place
+    append(
+        AMEND,
+        {
+            "order_id": 1,
+            "user_id": 1,
+            "symbol": "BTCUSD",
+            "side": "SELL",
+            "price": to_ticks("100"),
+            "new_quantity": to_lots("1"),
+            "released": to_lots("1"),
+            "in_place": True,
+        },
+    )
+    db["orders"][0] = row(1, "SELL", "100", "1")
+
+    snapshot.restore(path)
+
+    book = matching_engine.books["BTCUSD"]
+    assert [order.id for order in book.levels["SELL"][to_ticks("100")]] == [1, 2]
+    assert book.get(1).remaining == to_lots("1")
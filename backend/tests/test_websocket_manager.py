@@ -0,0 +1,107 @@
+import json
+
+import pytest
+from socketio import packet
+
+import websocket_manager
+from websocket_manager import (
+    MAX_SUBSCRIBE_SYMBOLS,
+    Frame,
+    FrameJSON,
+    encode_update,
+    parse_format,
+    parse_symbols,
+)
+
+
+def encode_event(event, data):
+    """Encode an event packet the way python-socketio does, with FrameJSON"""
+    original = packet.Packet.json
+    packet.Packet.json = FrameJSON
+    try:
+        return packet.Packet(packet.EVENT, data=[event, data], namespace="/").encode()
+    finally:
+        packet.Packet.json = original
+
+
+def test_frame_is_spliced_into_event_packet():
+    message = {"type": "delta", "symbol": "BTCUSD", "seq": 7, "changes": []}
+    frame = encode_update(message)["json"]
+
+    encoded = encode_event("orderbook_update", frame)
+
+    assert encoded == '2["orderbook_update",' + frame + "]"
+    assert json.loads(encoded[1:]) == ["orderbook_update", message]
+
+
+def test_plain_payload_is_encoded_as_usual():
+    encoded = encode_event("orderbook_error", {"error": "Unknown symbol: XYZ"})
+
+    assert json.loads(encoded[1:]) == ["orderbook_error", {"error": "Unknown symbol: XYZ"}]
+
+
+def test_frame_is_a_string():
+    # A frame must not be taken for binary data and sent as an attachment
+    assert not packet.Packet(packet.EVENT).data_is_binary(["orderbook_update", Frame("{}")])
+
+
+def test_encode_update_json_frame_is_compact():
+    frames = encode_update({"type": "delta", "symbol": "BTCUSD", "seq": 1, "changes": []})
+
+    assert frames["json"] == '{"type":"delta","symbol":"BTCUSD","seq":1,"changes":[]}'
+    assert isinstance(frames["json"], Frame)
+
+
+def test_encode_update_msgpack_frame_when_available(monkeypatch):
+    class FakeMsgpack:
+        @staticmethod
+        def packb(message):
+            return b"packed:" + json.dumps(message).encode()
+
+    monkeypatch.setattr(websocket_manager, "msgpack", FakeMsgpack)
+
+    frames = encode_update({"seq": 1})
+
+    assert frames["msgpack"] == b'packed:{"seq": 1}'
+
+
+def test_parse_symbols_normalises_and_deduplicates():
+    assert parse_symbols({"symbols": ["ethusd", "BTCUSD", "ETHUSD"]}) == ["BTCUSD", "ETHUSD"]
+
+
+@pytest.mark.parametrize("data", [None, {}, {"symbols": []}, "BTCUSD"])
+def test_parse_symbols_none_listed(data):
+    assert parse_symbols(data) is None
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"symbols": "BTCUSD"},
+        {"symbols": ["BTC-USD"]},
+        {"symbols": ["A" * 11]},
+        {"symbols": [f"S{i}" for i in range(MAX_SUBSCRIBE_SYMBOLS + 1)]},
+    ],
+)
+def test_parse_symbols_rejects_invalid(data):
+    with pytest.raises(ValueError):
+        parse_symbols(data)
+
+
+def test_parse_format_defaults_to_json():
+    assert parse_format(None) == "json"
+    assert parse_format({"symbols": ["BTCUSD"]}) == "json"
+
+
+def test_parse_format_rejects_unknown_format():
+    with pytest.raises(ValueError, match="format must be one of"):
+        parse_format({"format": "xml"})
+
+
+def test_parse_format_msgpack_needs_the_package(monkeypatch):
+    monkeypatch.setattr(websocket_manager, "msgpack", None)
+    with pytest.raises(ValueError, match="not available"):
+        parse_format({"format": "msgpack"})
+
+    monkeypatch.setattr(websocket_manager, "msgpack", object())
+    assert parse_format({"format": "msgpack"}) == "msgpack"
@@ -1,143 +1,337 @@
 """
 Simple WebSocket Manager for Trading Platform
+
+The `orderbook_update` channel carries aggregated price levels, read from the
+in-memory books. A subscriber first gets one snapshot per symbol, then only
+the levels that changed, each message with the symbol's next sequence number:
+
+    {"type": "snapshot", "symbol": "BTCUSD", "seq": 41,
+     "bids": [{"price": 65000.0, "quantity": 1.5, "orders": 2}, ...], "asks": [...]}
+    {"type": "delta", "symbol": "BTCUSD", "seq": 42,
+     "changes": [{"side": "BUY", "price": 65000.0, "quantity": 0.5, "orders": 1}, ...]}
+
+A delta carries the new size of each level (0 = the level is gone). A client
+that sees a sequence number other than the last one + 1 re-subscribes to get
+a fresh snapshot.
+
+Subscriptions are per symbol: `subscribe_orderbook` with {"symbols": [...]}
+joins one room per symbol (no symbols = every symbol with resting orders),
+`unsubscribe_orderbook` leaves them, and a symbol's updates only go to its
+room.
+
+Updates are pushed as commands change the books (see event_bus.py), so an
+idle book costs nothing. The commands only queue the symbol; a publisher
+thread sends each changed symbol once per coalescing window, however many
+commands touched it meanwhile.
+
+Every update is encoded once and the same frame goes to every subscriber
+(snapshots are cached until the symbol's next update). Clients may ask for
+MessagePack frames instead of JSON with {"format": "msgpack"} on subscribe,
+when the msgpack package is installed; those arrive as binary messages.
 """
-from flask_socketio import SocketIO, emit, join_room, leave_room
+from flask_socketio import SocketIO, emit, join_room, leave_room, rooms
 from flask import request
+import json
+import logging
+import os
+import re
 import threading
 import time
-from db_pool import get_db_connection
+from db_pool import get_read_connection
+from event_bus import event_bus, ORDERBOOK_CHANGED
+from fixed_point import lots_to_decimal, ticks_to_decimal
+from helpers import depth_levels
+from order_commands import find_book
+from orderbook import matching_engine
+
+try:
+    import msgpack
+except ImportError:  # binary framing is optional
+    msgpack = None
+
+# changes to a symbol within this window go out as one update (milliseconds)
+WS_COALESCE_WINDOW = float(os.getenv('WS_COALESCE_WINDOW_MS', 25)) / 1000
+
+# Symbols one subscribe_orderbook request may list
+MAX_SUBSCRIBE_SYMBOLS = 50
+SYMBOL_PATTERN = re.compile(r"^[A-Z0-9]{1,10}$")
+
+
+# Wire formats of orderbook_update; JSON is the default
+FORMATS = ('json', 'msgpack')
+
+
+def orderbook_room(symbol, format='json'):
+    if format == 'json':
+        return f'orderbook:{symbol}'
+    return f'orderbook:{symbol}:{format}'
+
+
+class Frame(str):
+    """A payload already encoded as JSON, spliced into the packet as is (see FrameJSON)"""
+
+
+class FrameJSON:
+    """
+    json module for the Socket.IO packets: an event whose payload is a Frame
+    is written around the frame instead of encoding the payload again.
+    """
+
+    @staticmethod
+    def dumps(obj, *args, **kwargs):
+        if isinstance(obj, list) and len(obj) == 2 and isinstance(obj[1], Frame):
+            return '[' + json.dumps(obj[0]) + ',' + obj[1] + ']'
+        return json.dumps(obj, *args, **kwargs)
+
+    @staticmethod
+    def loads(s, *args, **kwargs):
+        return json.loads(s, *args, **kwargs)
+
+
+def encode_update(message):
+    """Encode an orderbook_update message once per available wire format"""
+    frames = {'json': Frame(json.dumps(message, separators=(',', ':')))}
+    if msgpack is not None:
+        frames['msgpack'] = msgpack.packb(message)
+    return frames
+
+
+def parse_format(data):
+    """Wire format asked for in a subscribe request"""
+    format = data.get('format', 'json') if isinstance(data, dict) else 'json'
+    if format not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+    if format == 'msgpack' and msgpack is None:
+        raise ValueError("MessagePack framing is not available on this server")
+    return format
+
+
+def parse_symbols(data):
+    """Symbols listed in a (un)subscribe request, upper-cased; None if none are listed"""
+    symbols = data.get('symbols') if isinstance(data, dict) else None
+    if not symbols:
+        return None
+    if not isinstance(symbols, list) or len(symbols) > MAX_SUBSCRIBE_SYMBOLS:
+        raise ValueError(f"symbols must be a list of at most {MAX_SUBSCRIBE_SYMBOLS} symbols")
+    symbols = [str(symbol).upper() for symbol in symbols]
+    for symbol in symbols:
+        if not SYMBOL_PATTERN.match(symbol):
+            raise ValueError(f"Invalid symbol: {symbol}")
+    return sorted(set(symbols))
 
 class WebSocketManager:
     def __init__(self, app=None):
         self.socketio = None
-        self.last_orderbook_hash = None
-        self.monitoring = False
-        
+        # Per symbol: sequence number of the last message sent, and the book
+        # it was computed from (a reloaded book restarts with a snapshot)
+        self.seqs = {}
+        self.books = {}
+        # Per symbol: (seq, encoded frames) of the latest snapshot
+        self.snapshots = {}
+        self.lock = threading.Lock()
+        # Symbols changed since the publisher's last round
+        self.pending = set()
+        self.pending_condition = threading.Condition()
+        self.publishing = False
+
         if app:
             self.init_app(app)
-    
+
     def init_app(self, app):
         """Initialize SocketIO with Flask app"""
         self.socketio = SocketIO(
-            app, 
+            app,
             cors_allowed_origins="*",
             logger=False,
-            engineio_logger=False
+            engineio_logger=False,
+            json=FrameJSON
         )
         self.setup_events()
-        self.start_monitoring()
-    
+        event_bus.subscribe(ORDERBOOK_CHANGED, self.on_orderbook_changed)
+        self.start_publisher()
+
     def setup_events(self):
         """Setup WebSocket event handlers"""
-        
+
         @self.socketio.on('connect')
         def handle_connect(auth):
             print(f'Client connected: {request.sid}')
-            # Send initial orderbook data
-            self.send_orderbook_update(request.sid)
-        
+
         @self.socketio.on('disconnect')
         def handle_disconnect():
             print(f'Client disconnected: {request.sid}')
-        
+
         @self.socketio.on('subscribe_orderbook')
-        def handle_subscribe():
-            print(f'Client {request.sid} subscribed to orderbook')
-            join_room('orderbook')
-            self.send_orderbook_update(request.sid)
-    
-    def get_orderbook_data(self):
-        """Get current orderbook from database"""
+        def handle_subscribe(data=None):
+            try:
+                format = parse_format(data)
+                symbols = parse_symbols(data) or self.get_orderbook_symbols()
+            except ValueError as e:
+                emit('orderbook_error', {'error': str(e)})
+                return
+            print(f'Client {request.sid} subscribed to orderbook ({format}): {", ".join(symbols)}')
+            for symbol in symbols:
+                if not self.load_orderbook(symbol):
+                    emit('orderbook_error', {'error': f'Unknown symbol: {symbol}', 'symbol': symbol})
+                    continue
+                # One format per symbol and client
+                for other in FORMATS:
+                    if other != format:
+                        leave_room(orderbook_room(symbol, other))
+                join_room(orderbook_room(symbol, format))
+                self.send_orderbook_snapshot(symbol, request.sid, format)
+
+        @self.socketio.on('unsubscribe_orderbook')
+        def handle_unsubscribe(data=None):
+            try:
+                symbols = parse_symbols(data)
+            except ValueError as e:
+                emit('orderbook_error', {'error': str(e)})
+                return
+            if symbols is None:
+                # Every orderbook room this client is in
+                symbols = sorted({
+                    room.split(':')[1]
+                    for room in rooms()
+                    if room.startswith('orderbook:')
+                })
+            print(f'Client {request.sid} unsubscribed from orderbook: {", ".join(symbols)}')
+            for symbol in symbols:
+                for format in FORMATS:
+                    leave_room(orderbook_room(symbol, format))
+
+    def get_orderbook_symbols(self):
+        """Symbols with resting orders, plus any whose book is already in memory"""
+        symbols = set(matching_engine.books)
+        try:
+            with get_read_connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute(
+                    "SELECT DISTINCT symbol FROM orders WHERE status IN ('PENDING', 'PARTIAL')"
+                )
+                symbols.update(row[0] for row in cursor.fetchall())
+                cursor.close()
+        except Exception as e:
+            print(f"Error getting orderbook symbols: {e}")
+        return sorted(symbols)
+
+    def _publish(self, symbol):
+        """Send a symbol's changed levels to all subscribers; call with the lock held"""
+        book = matching_engine.books.get(symbol)
+        if book is None:
+            # Invalidated; the reloaded book will be sent as a snapshot
+            return
+
+        if self.books.get(symbol) is not book:
+            self.books[symbol] = book
+            book.take_changes()
+            self.seqs[symbol] = self.seqs.get(symbol, 0) + 1
+            self._emit_frames(symbol, self._snapshot(symbol, book))
+            return
+
+        changes = book.take_changes()
+        if not changes:
+            return
+        self.seqs[symbol] += 1
+        self._emit_frames(symbol, encode_update({
+            'type': 'delta',
+            'symbol': symbol,
+            'seq': self.seqs[symbol],
+            'changes': [
+                {
+                    'side': side,
+                    'price': float(ticks_to_decimal(price)),
+                    'quantity': float(lots_to_decimal(size)),
+                    'orders': count,
+                }
+                for side, price, size, count in changes
+            ],
+        }))
+
+    def _emit_frames(self, symbol, frames):
+        """Send an encoded update to the symbol's subscribers, each in its format"""
+        for format, frame in frames.items():
+            self.socketio.emit('orderbook_update', frame, room=orderbook_room(symbol, format))
+
+    def _snapshot(self, symbol, book):
+        """Encoded snapshot of a symbol at its current seq; call with the lock held"""
+        seq = self.seqs[symbol]
+        cached = self.snapshots.get(symbol)
+        if cached is not None and cached[0] == seq:
+            return cached[1]
+
+        levels = book.depth()
+        frames = encode_update({
+            'type': 'snapshot',
+            'symbol': symbol,
+            'seq': seq,
+            'bids': depth_levels(levels['BUY']),
+            'asks': depth_levels(levels['SELL']),
+        })
+        self.snapshots[symbol] = (seq, frames)
+        return frames
+
+    def load_orderbook(self, symbol):
+        """Whether a symbol has a book to subscribe to (loading it if needed)"""
         try:
-            with get_db_connection() as connection:
-                cursor = connection.cursor(dictionary=True)
-            
-            query = """
-            SELECT id, user_id, symbol, side, quantity, price, status, 
-                   filled_quantity, created_at, updated_at 
-            FROM orders 
-            WHERE status IN ('PENDING', 'PARTIAL')
-            ORDER BY 
-                CASE WHEN side = 'BUY' THEN price END DESC,
-                CASE WHEN side = 'SELL' THEN price END ASC,
-                created_at ASC
-            """
-            cursor.execute(query)
-            orders = cursor.fetchall()
-            
-            # Convert datetime to string and Decimal to float
-            for order in orders:
-                if order['created_at']:
-                    order['created_at'] = order['created_at'].isoformat()
-                if order['updated_at']:
-                    order['updated_at'] = order['updated_at'].isoformat()
-                # Convert Decimal fields to float for JSON serialization
-                if 'price' in order and order['price'] is not None:
-                    order['price'] = float(order['price'])
-                if 'quantity' in order and order['quantity'] is not None:
-                    order['quantity'] = float(order['quantity'])
-                if 'filled_quantity' in order and order['filled_quantity'] is not None:
-                    order['filled_quantity'] = float(order['filled_quantity'])
-            
-            return orders
+            return find_book(symbol) is not None
         except Exception as e:
-            print(f"Error getting orderbook: {e}")
-            return []
-    
-    def send_orderbook_update(self, sid=None):
-        """Send orderbook update to client(s)"""
+            print(f"Error loading orderbook {symbol}: {e}")
+            return False
+
+    def send_orderbook_snapshot(self, symbol, sid, format='json'):
+        """Send one client the full levels of a loaded symbol"""
         try:
-            orderbook = self.get_orderbook_data()
-            if sid:
-                # Send to specific client
-                self.socketio.emit('orderbook_update', orderbook, room=sid)
-            else:
-                # Broadcast to all clients
-                self.socketio.emit('orderbook_update', orderbook, room='orderbook')
+            with self.lock:
+                # Flush pending changes first, so every delta after this
+                # snapshot has a higher sequence number
+                self._publish(symbol)
+                book = self.books.get(symbol)
+                if book is not None:
+                    self.socketio.emit('orderbook_update', self._snapshot(symbol, book)[format], room=sid)
         except Exception as e:
-            print(f"Error sending orderbook update: {e}")
-    
-    def broadcast_orderbook_change(self):
-        """Broadcast orderbook changes to all subscribed clients"""
-        self.send_orderbook_update()
-    
-    def monitor_orderbook_changes(self):
-        """Monitor database for changes and broadcast updates"""
-        while self.monitoring:
-            try:
-                with get_db_connection() as connection:
-                    cursor = connection.cursor()
-                
-                # Get hash of current orderbook state
-                cursor.execute("""
-                    SELECT COUNT(*), MAX(updated_at) 
-                    FROM orders 
-                    WHERE status IN ('PENDING', 'PARTIAL')
-                """)
-                result = cursor.fetchone()
-                current_hash = str(result) if result else ""
-                
-                # If orderbook changed, broadcast update
-                if current_hash != self.last_orderbook_hash:
-                    self.broadcast_orderbook_change()
-                    self.last_orderbook_hash = current_hash
-                
-            except Exception as e:
-                print(f"Error monitoring orderbook: {e}")
-            
-            time.sleep(0.5)  # Check every 0.5 seconds for faster updates
-    
-    def start_monitoring(self):
-        """Start background monitoring thread"""
-        if not self.monitoring:
-            self.monitoring = True
-            monitor_thread = threading.Thread(target=self.monitor_orderbook_changes, daemon=True)
-            monitor_thread.start()
-            print("Started orderbook monitoring")
-    
-    def stop_monitoring(self):
-        """Stop background monitoring"""
-        self.monitoring = False
+            print(f"Error sending orderbook snapshot: {e}")
+
+    def broadcast_orderbook_change(self, *symbols):
+        """Broadcast the changed levels of the given symbols (all loaded books if none)"""
+        with self.lock:
+            for symbol in symbols or list(matching_engine.books):
+                # One failing symbol must not hold back the others
+                try:
+                    self._publish(symbol)
+                except Exception as e:
+                    logging.error(f"Error sending {symbol} orderbook update: {e}")
+
+    def queue_orderbook_change(self, symbol):
+        """Have the publisher broadcast a symbol's changes at the end of its window"""
+        with self.pending_condition:
+            self.pending.add(symbol)
+            self.pending_condition.notify()
+
+    def on_orderbook_changed(self, data):
+        """Event bus handler: a command changed a symbol's book"""
+        self.queue_orderbook_change(data['symbol'])
+
+    def publish_changes(self):
+        """Publisher loop: wait for a change, let the window fill up, broadcast"""
+        while self.publishing:
+            with self.pending_condition:
+                while not self.pending:
+                    self.pending_condition.wait()
+
+            time.sleep(WS_COALESCE_WINDOW)
+
+            with self.pending_condition:
+                symbols, self.pending = self.pending, set()
+            self.broadcast_orderbook_change(*sorted(symbols))
+
+    def start_publisher(self):
+        """Start background publisher thread"""
+        if not self.publishing:
+            self.publishing = True
+            publisher_thread = threading.Thread(target=self.publish_changes, name="orderbook-publisher", daemon=True)
+            publisher_thread.start()
+            print("Started orderbook publisher")
 
 # Global instance
 ws_manager = WebSocketManager()
@@ -210,6 +210,13 @@ INSERT INTO `transactions` (`buy_order_id`, `sell_order_id`, `symbol`, `price`,
 (22, 25, 'AAPL', 185.60, 40.0000, '2025-08-07 06:50:00'),
 (23, 26, 'AAPL', 185.90, 30.0000, '2025-08-07 07:20:00');
 
+-- Record the buyer and seller of each sample trade
+UPDATE `transactions` t
+JOIN `orders` bo ON t.buy_order_id = bo.id
+JOIN `orders` so ON t.sell_order_id = so.id
+SET t.buyer_user_id = bo.user_id,
+    t.seller_user_id = so.user_id;
+
 -- Create a view for easy market data access (optional)
 CREATE OR REPLACE VIEW `market_summary` AS
 SELECT 
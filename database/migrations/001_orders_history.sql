@@ -0,0 +1,27 @@
+-- terminal orders move to orders_history (see backend/archiver.py), so trades
+-- can no longer reference `orders` through foreign keys
+CREATE TABLE IF NOT EXISTS `orders_history` (
+  `id`         INT                 NOT NULL,
+  `symbol`     VARCHAR(10)         NOT NULL,
+  `side`       ENUM('BUY','SELL')  NOT NULL,
+  `price`      DECIMAL(10,2)       NOT NULL,
+  `quantity`   DECIMAL(10,4)       NOT NULL,
+  `filled_quantity` DECIMAL(10,4)  NOT NULL DEFAULT 0,
+  `status`     ENUM('PENDING','PARTIAL','FILLED','CANCELLED') NOT NULL,
+  `created_at` TIMESTAMP           NOT NULL,
+  `updated_at` TIMESTAMP           NOT NULL,
+  `user_id`    INT                 NOT NULL,
+  `archived_at` TIMESTAMP          NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  INDEX `idx_orders_history_user` (`user_id`, `created_at`),
+  FOREIGN KEY (`user_id`) REFERENCES `users`(`id`)
+    ON DELETE CASCADE
+    ON UPDATE CASCADE
+) ENGINE=InnoDB
+  DEFAULT CHARSET = utf8mb4
+  COLLATE = utf8mb4_0900_ai_ci;
+
+-- names MySQL generated for the two foreign keys of the original schema
+ALTER TABLE `transactions`
+  DROP FOREIGN KEY `transactions_ibfk_1`,
+  DROP FOREIGN KEY `transactions_ibfk_2`;
@@ -0,0 +1,16 @@
+-- indexes for the live-book, history and change-polling queries
+-- (checked with `python migrate.py check`)
+
+-- resting orders of a symbol: book loading, best price per side
+ALTER TABLE `orders` ADD INDEX `idx_orders_book` (`symbol`, `side`, `status`, `price`, `created_at`);
+-- a user's orders, newest first; also serves the user_id foreign key
+ALTER TABLE `orders` ADD INDEX `idx_orders_user_created` (`user_id`, `created_at`);
+-- open-order change polling and the archiver
+ALTER TABLE `orders` ADD INDEX `idx_orders_status_updated` (`status`, `updated_at`);
+
+-- superseded by the indexes above
+ALTER TABLE `orders` DROP INDEX `idx_orders_symbol_side_price`;
+ALTER TABLE `orders` DROP INDEX `idx_orders_user`;
+
+-- recent trades, newest first
+ALTER TABLE `transactions` ADD INDEX `idx_txn_executed` (`executed_at`);
@@ -0,0 +1,18 @@
+-- the buyer and seller of every trade, recorded at execution time so a
+-- user's trades are two index lookups instead of a join through orders
+-- (or orders_history) on both sides
+ALTER TABLE `transactions`
+  ADD COLUMN `buyer_user_id`  INT NULL AFTER `sell_order_id`,
+  ADD COLUMN `seller_user_id` INT NULL AFTER `buyer_user_id`,
+  ADD INDEX `idx_txn_buyer`  (`buyer_user_id`, `executed_at`),
+  ADD INDEX `idx_txn_seller` (`seller_user_id`, `executed_at`);
+
+-- backfill trades written before this migration
+UPDATE `transactions` t
+  LEFT JOIN `orders` bo ON t.buy_order_id = bo.id
+  LEFT JOIN `orders_history` bh ON t.buy_order_id = bh.id
+  LEFT JOIN `orders` so ON t.sell_order_id = so.id
+  LEFT JOIN `orders_history` sh ON t.sell_order_id = sh.id
+SET t.buyer_user_id = COALESCE(bo.user_id, bh.user_id),
+    t.seller_user_id = COALESCE(so.user_id, sh.user_id)
+WHERE t.buyer_user_id IS NULL OR t.seller_user_id IS NULL;
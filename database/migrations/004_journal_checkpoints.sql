@@ -0,0 +1,10 @@
+-- last matching journal sequence number applied to this database, per
+-- symbol (see backend/journal.py)
+CREATE TABLE IF NOT EXISTS `journal_checkpoints` (
+  `symbol`     VARCHAR(10)    NOT NULL,
+  `seq`        BIGINT         NOT NULL,
+  `updated_at` TIMESTAMP      NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`symbol`)
+) ENGINE=InnoDB
+  DEFAULT CHARSET = utf8mb4
+  COLLATE = utf8mb4_0900_ai_ci;
@@ -31,8 +31,32 @@ CREATE TABLE IF NOT EXISTS `orders` (
   `updated_at` TIMESTAMP           NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   `user_id`    INT                 NOT NULL,
   PRIMARY KEY (`id`),
-  INDEX `idx_orders_symbol_side_price` (`symbol`,`side`,`price`),
-  INDEX `idx_orders_user` (`user_id`),
+  INDEX `idx_orders_book` (`symbol`,`side`,`status`,`price`,`created_at`),
+  INDEX `idx_orders_user_created` (`user_id`,`created_at`),
+  INDEX `idx_orders_status_updated` (`status`,`updated_at`),
+  FOREIGN KEY (`user_id`) REFERENCES `users`(`id`)
+    ON DELETE CASCADE
+    ON UPDATE CASCADE
+) ENGINE=InnoDB
+  DEFAULT CHARSET = utf8mb4
+  COLLATE = utf8mb4_0900_ai_ci;
+
+-- terminal (FILLED / CANCELLED) orders moved out of `orders` by the archiver,
+-- so `orders` stays proportional to the live book
+CREATE TABLE IF NOT EXISTS `orders_history` (
+  `id`         INT                 NOT NULL,
+  `symbol`     VARCHAR(10)         NOT NULL,
+  `side`       ENUM('BUY','SELL')  NOT NULL,
+  `price`      DECIMAL(10,2)       NOT NULL,
+  `quantity`   DECIMAL(10,4)       NOT NULL,
+  `filled_quantity` DECIMAL(10,4)  NOT NULL DEFAULT 0,
+  `status`     ENUM('PENDING','PARTIAL','FILLED','CANCELLED') NOT NULL,
+  `created_at` TIMESTAMP           NOT NULL,
+  `updated_at` TIMESTAMP           NOT NULL,
+  `user_id`    INT                 NOT NULL,
+  `archived_at` TIMESTAMP          NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  INDEX `idx_orders_history_user` (`user_id`, `created_at`),
   FOREIGN KEY (`user_id`) REFERENCES `users`(`id`)
     ON DELETE CASCADE
     ON UPDATE CASCADE
@@ -45,15 +69,20 @@ CREATE TABLE IF NOT EXISTS `transactions` (
   `id`             INT NOT NULL AUTO_INCREMENT,
   `buy_order_id`   INT NOT NULL,
   `sell_order_id`  INT NOT NULL,
+  -- written at execution time (see persist_fills)
+  `buyer_user_id`  INT NULL,
+  `seller_user_id` INT NULL,
   `symbol`         VARCHAR(10)         NOT NULL,
   `price`          DECIMAL(10,2)       NOT NULL,
   `quantity`       DECIMAL(10,4)       NOT NULL,
   `executed_at`    TIMESTAMP           NOT NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`id`),
+  -- no foreign keys to orders: filled orders move on to orders_history
   INDEX `idx_txn_buy`  (`buy_order_id`),
   INDEX `idx_txn_sell` (`sell_order_id`),
-  FOREIGN KEY (`buy_order_id`)  REFERENCES `orders`(`id`) ON DELETE RESTRICT ON UPDATE CASCADE,
-  FOREIGN KEY (`sell_order_id`) REFERENCES `orders`(`id`) ON DELETE RESTRICT ON UPDATE CASCADE
+  INDEX `idx_txn_executed` (`executed_at`),
+  INDEX `idx_txn_buyer`  (`buyer_user_id`, `executed_at`),
+  INDEX `idx_txn_seller` (`seller_user_id`, `executed_at`)
 ) ENGINE=InnoDB
   DEFAULT CHARSET = utf8mb4
   COLLATE = utf8mb4_0900_ai_ci;
@@ -72,3 +101,30 @@ CREATE TABLE IF NOT EXISTS `balances` (
 ) ENGINE=InnoDB
   DEFAULT CHARSET = utf8mb4
   COLLATE = utf8mb4_0900_ai_ci;
+
+-- last matching journal sequence number applied to this database, per symbol
+CREATE TABLE IF NOT EXISTS `journal_checkpoints` (
+  `symbol`     VARCHAR(10)    NOT NULL,
+  `seq`        BIGINT         NOT NULL,
+  `updated_at` TIMESTAMP      NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`symbol`)
+) ENGINE=InnoDB
+  DEFAULT CHARSET = utf8mb4
+  COLLATE = utf8mb4_0900_ai_ci;
+
+-- schema version, maintained by backend/migrate.py; this file is already at
+-- the latest migration in database/migrations
+CREATE TABLE IF NOT EXISTS `schema_migrations` (
+  `version`    INT            NOT NULL,
+  `name`       VARCHAR(100)   NOT NULL,
+  `applied_at` TIMESTAMP      NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`version`)
+) ENGINE=InnoDB
+  DEFAULT CHARSET = utf8mb4
+  COLLATE = utf8mb4_0900_ai_ci;
+
+INSERT INTO `schema_migrations` (`version`, `name`) VALUES
+  (1, 'orders_history'),
+  (2, 'hot_query_indexes'),
+  (3, 'transaction_parties'),
+  (4, 'journal_checkpoints');
@@ -17,6 +17,7 @@ const OrderBookContainer = () => {
     spread,
     stats,
     refetch,
+    loadLevelOrders,
     isConnected,
     wsConnected,
     hasData,
@@ -83,6 +84,7 @@ const OrderBookContainer = () => {
           groupedAsks={groupedAsks}
           spread={spread}
           stats={stats}
+          onShowOrders={loadLevelOrders}
         />
       </div>
 
@@ -1,7 +1,7 @@
 import OrderSide from './OrderSide';
 import SpreadSection from './SpreadSection';
 
-const OrderBookGrid = ({ groupedBids, groupedAsks, spread, stats }) => {
+const OrderBookGrid = ({ groupedBids, groupedAsks, spread, stats, onShowOrders }) => {
   return (
     <div className="grid grid-cols-1 lg:grid-cols-3 gap-5 min-h-96">
       {/* Bids Section (Left) */}
@@ -14,6 +14,7 @@ const OrderBookGrid = ({ groupedBids, groupedAsks, spread, stats }) => {
           priceColor="text-green-600"
           headerBg="bg-green-50"
           headerText="text-green-700"
+          onShowOrders={onShowOrders}
         />
       </div>
 
@@ -36,6 +37,7 @@ const OrderBookGrid = ({ groupedBids, groupedAsks, spread, stats }) => {
           priceColor="text-red-600"
           headerBg="bg-red-50"
           headerText="text-red-700"
+          onShowOrders={onShowOrders}
         />
       </div>
     </div>
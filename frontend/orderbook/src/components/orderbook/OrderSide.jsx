@@ -7,7 +7,8 @@ const OrderSide = ({
   count,
   priceColor,
   headerBg,
-  headerText
+  headerText,
+  onShowOrders
 }) => {
   const emptyMessage = type === 'bids' ? 'No buy orders available' : 'No sell orders available';
   
@@ -59,6 +60,7 @@ const OrderSide = ({
               priceLevel={priceLevel}
               priceColor={priceColor}
               type={type}
+              onShowOrders={onShowOrders}
             />
           ))
         ) : (
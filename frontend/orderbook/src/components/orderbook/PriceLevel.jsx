@@ -1,13 +1,17 @@
 import { formatQuantity } from '../../utils/formatters';
 
-const PriceLevel = ({ priceLevel, priceColor, type }) => {
+const PriceLevel = ({ priceLevel, priceColor, type, onShowOrders }) => {
   // Check if any orders at this price level belong to the current user
   const hasUserOrders = priceLevel.orders.some(order => order.is_own_order);
   
+  // Hovering shows the individual orders: have them reloaded if stale
   return (
-    <div className={`grid grid-cols-4 gap-2 px-4 py-2.5 border-b border-gray-100 hover:bg-gray-50 transition-colors duration-150 group relative ${
-      hasUserOrders ? 'bg-yellow-50 border-yellow-200' : ''
-    }`}>
+    <div
+      className={`grid grid-cols-4 gap-2 px-4 py-2.5 border-b border-gray-100 hover:bg-gray-50 transition-colors duration-150 group relative ${
+        hasUserOrders ? 'bg-yellow-50 border-yellow-200' : ''
+      }`}
+      onMouseEnter={onShowOrders}
+    >
       {/* Price */}
       <span className={`${priceColor} font-semibold`}>
         ${priceLevel.price.toFixed(2)}
@@ -26,7 +30,7 @@ const PriceLevel = ({ priceLevel, priceColor, type }) => {
       {/* Order Count Badge with user indicator */}
       <div className="flex items-center gap-1">
         <span className="bg-blue-100 text-blue-800 px-2 py-0.5 rounded-full text-xs font-semibold text-center min-w-fit">
-          {priceLevel.orders.length}
+          {priceLevel.orderCount ?? priceLevel.orders.length}
         </span>
         {hasUserOrders && (
           <span className="bg-yellow-500 text-white px-1.5 py-0.5 rounded-full text-xs font-bold" title="You have orders at this price">
@@ -93,7 +97,7 @@ const PriceLevel = ({ priceLevel, priceColor, type }) => {
 
         {/* Summary for this price level */}
         <div className="mt-2 pt-2 border-t border-gray-200 text-xs text-gray-500">
-          <strong>{priceLevel.orders.length} orders</strong> •
+          <strong>{priceLevel.orderCount ?? priceLevel.orders.length} orders</strong> •
           <strong> {formatQuantity(priceLevel.totalRemainingQuantity || priceLevel.totalQuantity)} remaining</strong> •
           <strong> ${(priceLevel.price * (priceLevel.totalRemainingQuantity || priceLevel.totalQuantity)).toLocaleString()} total value</strong>
           {hasUserOrders && (
@@ -1,68 +1,92 @@
-import { useState, useEffect, useCallback, useMemo } from "react";
-import { fetchOrderBook } from "../services/api";
+import { useState, useEffect, useCallback, useMemo, useRef } from "react";
+import { fetchOrderBook, fetchOrderBookSymbols } from "../services/api";
 import { useWebSocket } from "./useWebSocket";
-import { getCurrentUser } from "../services/authService";
 import {
   groupOrdersByPrice,
+  mergeLevels,
   separateOrdersBySide,
   calculateSpread,
 } from "../utils/orderUtils";
 
 export const useOrderBook = (selectedSymbol = "BTCUSD") => {
+  // Individual orders of the selected symbol, from the last API load
   const [orders, setOrders] = useState([]);
+  const [symbols, setSymbols] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState("");
 
-  // Use WebSocket for real-time data
-  const { connected: wsConnected, orderbook: wsOrderbook } = useWebSocket();
+  // Use WebSocket for real-time price levels
+  const wsSymbols = useMemo(() => [selectedSymbol], [selectedSymbol]);
+  const { connected: wsConnected, books: wsBooks } = useWebSocket(wsSymbols);
+  const wsSeq = wsBooks[selectedSymbol]?.seq;
+
+  // Book seq the loaded orders belong to, and the symbol being loaded
+  const ordersSeqRef = useRef(undefined);
+  const loadingSymbolRef = useRef(null);
+  const wsSeqRef = useRef(wsSeq);
+  wsSeqRef.current = wsSeq;
 
-  // Fallback API fetching when WebSocket is not connected
   const loadOrders = useCallback(async () => {
+    if (loadingSymbolRef.current === selectedSymbol) return;
+    loadingSymbolRef.current = selectedSymbol;
+    const seq = wsSeqRef.current;
     try {
       setError("");
-      const ordersArray = await fetchOrderBook();
-      setOrders(ordersArray);
+      const ordersArray = await fetchOrderBook(selectedSymbol);
+      // Dropped if another symbol was selected meanwhile
+      if (loadingSymbolRef.current === selectedSymbol) {
+        setOrders(ordersArray);
+        ordersSeqRef.current = seq;
+      }
     } catch (err) {
       setError(err.message);
     } finally {
+      if (loadingSymbolRef.current === selectedSymbol) {
+        loadingSymbolRef.current = null;
+      }
       setLoading(false);
     }
+  }, [selectedSymbol]);
+
+  const loadSymbols = useCallback(async () => {
+    try {
+      setSymbols(await fetchOrderBookSymbols());
+    } catch (err) {
+      setError(err.message);
+    }
   }, []);
 
-  // Use WebSocket data when available, fallback to API polling
   useEffect(() => {
-    if (wsConnected && wsOrderbook && Array.isArray(wsOrderbook)) {
-      console.log("📡 Using WebSocket data");
-
-      // Add is_own_order flag to WebSocket data
-      const currentUser = getCurrentUser();
-      const currentUserId = currentUser?.id;
-
-      const ordersWithOwnership = wsOrderbook.map((order) => ({
-        ...order,
-        is_own_order: currentUserId && order.user_id === currentUserId,
-      }));
-
-      setOrders(ordersWithOwnership);
-      setError("");
-      setLoading(false);
-    } else if (!wsConnected) {
-      console.log("🔄 Using API fallback - WebSocket not connected");
-      loadOrders();
-      const interval = setInterval(loadOrders, 5000);
-      return () => clearInterval(interval);
-    }
-  }, [wsConnected, wsOrderbook, loadOrders]);
+    loadSymbols();
+  }, [loadSymbols]);
 
-  // Initial load regardless of WebSocket status
+  // The selected symbol's orders are loaded once; the WebSocket keeps its
+  // levels live from there. Without it, poll the orders instead.
   useEffect(() => {
+    setOrders([]);
+    ordersSeqRef.current = undefined;
     loadOrders();
-  }, [loadOrders]);
+    if (wsConnected) {
+      console.log("📡 Using WebSocket data");
+      return;
+    }
+    console.log("🔄 Using API fallback - WebSocket not connected");
+    const interval = setInterval(loadOrders, 5000);
+    return () => clearInterval(interval);
+  }, [wsConnected, loadOrders]);
+
+  // On demand (e.g. a level's order details are opened): reload the orders
+  // if the book moved since they were loaded
+  const loadLevelOrders = useCallback(() => {
+    if (wsConnected && ordersSeqRef.current !== wsSeqRef.current) {
+      loadOrders();
+    }
+  }, [wsConnected, loadOrders]);
 
   // Get available symbols
   const availableSymbols = useMemo(() => {
-    return [...new Set(orders.map((order) => order.symbol))].sort();
-  }, [orders]);
+    return [...new Set([...symbols, ...Object.keys(wsBooks)])].sort();
+  }, [symbols, wsBooks]);
 
   // Process orders (memoized for performance)
   const processedData = useMemo(() => {
@@ -72,8 +96,29 @@ export const useOrderBook = (selectedSymbol = "BTCUSD") => {
     );
 
     const { bids, asks } = separateOrdersBySide(filteredOrders);
-    const groupedBids = groupOrdersByPrice(bids);
-    const groupedAsks = groupOrdersByPrice(asks);
+    let groupedBids = groupOrdersByPrice(bids);
+    let groupedAsks = groupOrdersByPrice(asks);
+    let stats = {
+      totalOrders: filteredOrders.length,
+      bidCount: bids.length,
+      askCount: asks.length,
+    };
+
+    // Levels come from the WebSocket book; the individual orders of a
+    // level are the ones from the last API load
+    const wsBook = wsConnected && wsBooks[selectedSymbol];
+    if (wsBook) {
+      groupedBids = mergeLevels(wsBook.bids, groupedBids);
+      groupedAsks = mergeLevels(wsBook.asks, groupedAsks);
+      const countOrders = (levels) =>
+        levels.reduce((total, level) => total + level.orderCount, 0);
+      stats = {
+        totalOrders: countOrders(groupedBids) + countOrders(groupedAsks),
+        bidCount: countOrders(groupedBids),
+        askCount: countOrders(groupedAsks),
+      };
+    }
+
     const spread = calculateSpread(groupedBids, groupedAsks);
 
     return {
@@ -82,19 +127,15 @@ export const useOrderBook = (selectedSymbol = "BTCUSD") => {
       groupedBids,
       groupedAsks,
       spread,
-      stats: {
-        totalOrders: filteredOrders.length,
-        bidCount: bids.length,
-        askCount: asks.length,
-      },
+      stats,
     };
-  }, [orders, selectedSymbol]);
+  }, [orders, selectedSymbol, wsConnected, wsBooks]);
 
   // Manual refresh
   const refetch = useCallback(() => {
-    setLoading(true);
+    loadSymbols();
     loadOrders();
-  }, [loadOrders]);
+  }, [loadSymbols, loadOrders]);
 
   return {
     // Raw data
@@ -106,7 +147,8 @@ export const useOrderBook = (selectedSymbol = "BTCUSD") => {
     ...processedData,
 
     // Actions
-    refetch: loadOrders,
+    refetch,
+    loadLevelOrders,
 
     // Status helpers
     isConnected: wsConnected || !error,
@@ -2,10 +2,31 @@ import { useState, useEffect, useRef } from "react";
 import { io } from "socket.io-client";
 import toast from "react-hot-toast";
 
-export const useWebSocket = () => {
+// Replace, add or remove (quantity 0) price levels, keeping best-first order
+const applyLevelChanges = (levels, changes, descending) => {
+  const byPrice = new Map(levels.map((level) => [level.price, level]));
+  changes.forEach(({ price, quantity, orders }) => {
+    if (quantity > 0) {
+      byPrice.set(price, { price, quantity, orders });
+    } else {
+      byPrice.delete(price);
+    }
+  });
+  return [...byPrice.values()].sort((a, b) =>
+    descending ? b.price - a.price : a.price - b.price
+  );
+};
+
+// Keeps the order books of `symbols` (all symbols with resting orders if
+// empty) in sync over the WebSocket
+export const useWebSocket = (symbols = []) => {
   const [connected, setConnected] = useState(false);
-  const [orderbook, setOrderbook] = useState([]);
+  // symbol -> { seq, bids, asks }, levels as { price, quantity, orders }
+  const [books, setBooks] = useState({});
+  const booksRef = useRef({});
   const socketRef = useRef(null);
+  const symbolsRef = useRef(symbols);
+  const symbolsKey = symbols.join(",");
 
   const API_BASE_URL =
     import.meta.env.VITE_API_BASE_URL || "http://localhost:5000";
@@ -20,6 +41,18 @@ export const useWebSocket = () => {
       forceNew: true,
     });
 
+    const setBook = (symbol, book) => {
+      booksRef.current = { ...booksRef.current, [symbol]: book };
+      setBooks(booksRef.current);
+    };
+
+    // Snapshots are sent on subscribe, so re-subscribing resyncs a book
+    const resync = (symbol) => {
+      const { [symbol]: _, ...rest } = booksRef.current;
+      booksRef.current = rest;
+      socket.emit("subscribe_orderbook", { symbols: [symbol] });
+    };
+
     // Connection events
     socket.on("connect", () => {
       console.log("✅ WebSocket connected successfully");
@@ -27,8 +60,9 @@ export const useWebSocket = () => {
       toast.success("Real-time connection established", { duration: 2000 });
 
       // Subscribe to orderbook updates
-      console.log("📡 Subscribing to orderbook updates");
-      socket.emit("subscribe_orderbook");
+      console.log("📡 Subscribing to orderbook updates:", symbolsRef.current);
+      booksRef.current = {};
+      socket.emit("subscribe_orderbook", { symbols: symbolsRef.current });
     });
 
     socket.on("disconnect", (reason) => {
@@ -45,16 +79,39 @@ export const useWebSocket = () => {
       toast.error("Failed to connect to real-time updates", { duration: 3000 });
     });
 
-    // Data events
+    // Data events: one snapshot per symbol, then sequenced level deltas
     socket.on("orderbook_update", (data) => {
-      console.log("📊 Received orderbook update:", data?.length || 0, "orders");
-      if (Array.isArray(data)) {
-        setOrderbook(data);
-      } else {
+      if (!data || !data.symbol) {
         console.warn("⚠️ Invalid orderbook data received:", data);
+        return;
+      }
+
+      const book = booksRef.current[data.symbol];
+      if (data.type === "snapshot") {
+        if (!book || data.seq >= book.seq) {
+          setBook(data.symbol, { seq: data.seq, bids: data.bids, asks: data.asks });
+        }
+      } else if (data.type === "delta") {
+        // Deltas older than our snapshot are already included in it
+        if (!book || data.seq <= book.seq) return;
+        if (data.seq !== book.seq + 1) {
+          console.warn(`⚠️ Missed orderbook updates for ${data.symbol}, resyncing`);
+          resync(data.symbol);
+          return;
+        }
+        const changes = (side) => data.changes.filter((change) => change.side === side);
+        setBook(data.symbol, {
+          seq: data.seq,
+          bids: applyLevelChanges(book.bids, changes("BUY"), true),
+          asks: applyLevelChanges(book.asks, changes("SELL"), false),
+        });
       }
     });
 
+    socket.on("orderbook_error", (data) => {
+      console.warn("⚠️ Orderbook subscription rejected:", data?.error);
+    });
+
     socketRef.current = socket;
 
     // Cleanup on unmount
@@ -63,8 +120,40 @@ export const useWebSocket = () => {
     };
   }, [API_BASE_URL]);
 
+  // Follow changes to the symbol list: leave the old rooms, join the new ones
+  useEffect(() => {
+    const socket = socketRef.current;
+    const previous = symbolsRef.current;
+    symbolsRef.current = symbols;
+    if (!socket || !socket.connected) return;
+
+    // An empty list stands for every symbol, so switching to or from it
+    // starts over
+    if (previous.length === 0 || symbols.length === 0) {
+      socket.emit("unsubscribe_orderbook");
+      booksRef.current = {};
+      setBooks({});
+      socket.emit("subscribe_orderbook", { symbols });
+      return;
+    }
+
+    const removed = previous.filter((symbol) => !symbols.includes(symbol));
+    const added = symbols.filter((symbol) => !previous.includes(symbol));
+    if (removed.length > 0) {
+      socket.emit("unsubscribe_orderbook", { symbols: removed });
+      const kept = { ...booksRef.current };
+      removed.forEach((symbol) => delete kept[symbol]);
+      booksRef.current = kept;
+      setBooks(kept);
+    }
+    if (added.length > 0) {
+      socket.emit("subscribe_orderbook", { symbols: added });
+    }
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [symbolsKey]);
+
   return {
     connected,
-    orderbook,
+    books,
   };
 };
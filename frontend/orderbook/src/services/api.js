@@ -22,6 +22,7 @@ export {
 // Order management services
 export {
   fetchOrderBook,
+  fetchOrderBookSymbols,
   getOrderBookBySymbol,
   placeOrder,
   cancelOrder,
@@ -1,9 +1,12 @@
 import toast from "react-hot-toast";
 import api, { normalizeResponse } from "./apiClient";
 
-export const fetchOrderBook = async () => {
+// Resting orders, of one symbol if given
+export const fetchOrderBook = async (symbol) => {
   try {
-    const response = await api.get("/orders");
+    const response = await api.get("/orders", {
+      params: symbol ? { symbol } : undefined,
+    });
     return normalizeResponse(response.data);
   } catch (error) {
     // Only show error toast for severe errors, not for network issues during polling
@@ -14,6 +17,12 @@ export const fetchOrderBook = async () => {
   }
 };
 
+// Symbols that have resting orders
+export const fetchOrderBookSymbols = async () => {
+  const response = await api.get("/orderbook");
+  return response.data.symbols || [];
+};
+
 export const getOrderBookBySymbol = async (symbol) => {
   try {
     if (!symbol) {
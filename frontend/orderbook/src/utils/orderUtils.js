@@ -51,6 +51,21 @@ export const groupOrdersByPrice = (ordersList) => {
   return result;
 };
 
+// Price levels from the WebSocket book ({ price, quantity, orders }) in the
+// shape of groupOrdersByPrice, with the known orders at each price attached
+export const mergeLevels = (levels, groupedLevels) => {
+  const ordersByPrice = new Map(
+    groupedLevels.map((level) => [level.price, level.orders])
+  );
+  return levels.map((level) => ({
+    price: level.price,
+    totalQuantity: level.quantity,
+    totalRemainingQuantity: level.quantity,
+    orderCount: level.orders,
+    orders: ordersByPrice.get(level.price) || [],
+  }));
+};
+
 export const separateOrdersBySide = (orders) => {
   const bids = orders
     .filter((order) => order.side && order.side.toLowerCase() === "buy")